@@ -0,0 +1,117 @@
+# app/archives.py
+"""
+Subida masiva: un ZIP con muchos comprobantes (PDF/imagen/Excel/CSV).
+
+Las entradas se leen del ZIP una a una en streaming (zipfile.open por bloques), nunca
+se descomprime todo a memoria ni a disco:
+
+  1) hash_entries: sha256 de cada entrada admitida (para deduplicar antes de subir),
+  2) el router descarta las que el tenant ya tiene (documents.sha256) o que se repiten
+     dentro del mismo ZIP,
+  3) upload_entries: sube las nuevas a S3 por partes (S3StreamWriter).
+
+Funciones bloqueantes: desde el router se llaman en el threadpool.
+"""
+import hashlib
+import os
+import uuid
+import zipfile
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from .config import settings
+from .s3_client import S3StreamWriter
+
+# extensión -> (mime, source_format)
+ENTRY_TYPES: Dict[str, Tuple[str, str]] = {
+    ".pdf": ("application/pdf", "pdf"),
+    ".jpg": ("image/jpeg", "jpg"),
+    ".jpeg": ("image/jpeg", "jpg"),
+    ".png": ("image/png", "png"),
+    ".xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    ".csv": ("text/csv", "csv"),
+}
+
+ZIP_MIMES = {"application/zip", "application/x-zip-compressed", "multipart/x-zip"}
+
+
+def is_zip(filename: Optional[str], content_type: Optional[str]) -> bool:
+    return content_type in ZIP_MIMES or (filename or "").lower().endswith(".zip")
+
+
+def _entry_type(name: str) -> Optional[Tuple[str, str]]:
+    base = os.path.basename(name)
+    if not base or base.startswith(".") or name.startswith("__MACOSX/"):
+        return None
+    return ENTRY_TYPES.get(os.path.splitext(base)[1].lower())
+
+
+def hash_entries(fileobj: IO[bytes]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    ([{name, size, sha256, mime, source_format}], [entradas ignoradas]).
+    Corta con 413 si una entrada supera MAX_UPLOAD_MB o el ZIP trae más de ARCHIVE_MAX_ENTRIES.
+    """
+    max_bytes = settings.MAX_UPLOAD_MB * 1024 * 1024
+    chunk_size = settings.UPLOAD_CHUNK_KB * 1024
+    entries: List[Dict[str, Any]] = []
+    skipped: List[str] = []
+    try:
+        zf = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="ZIP inválido")
+    with zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            typ = _entry_type(info.filename)
+            if typ is None:
+                skipped.append(info.filename)
+                continue
+            if len(entries) >= settings.ARCHIVE_MAX_ENTRIES:
+                raise HTTPException(status_code=413, detail=f"ZIP con más de {settings.ARCHIVE_MAX_ENTRIES} archivos")
+            if info.file_size > max_bytes:
+                raise HTTPException(status_code=413, detail=f"{info.filename}: archivo muy grande")
+            hasher = hashlib.sha256()
+            size = 0
+            with zf.open(info) as fh:
+                # el tamaño declarado en el ZIP puede mentir (zip bomb): se cuenta lo leído
+                while True:
+                    chunk = fh.read(chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise HTTPException(status_code=413, detail=f"{info.filename}: archivo muy grande")
+                    hasher.update(chunk)
+            entries.append({
+                "name": info.filename,
+                "size": size,
+                "sha256": hasher.hexdigest(),
+                "mime": typ[0],
+                "source_format": typ[1],
+            })
+    return entries, skipped
+
+
+def upload_entries(fileobj: IO[bytes], entries: List[Dict[str, Any]], tenant_id: str) -> List[Dict[str, Any]]:
+    """Sube cada entrada a S3 (streaming) y le agrega id y storage_key. Devuelve las entradas."""
+    chunk_size = settings.UPLOAD_CHUNK_KB * 1024
+    with zipfile.ZipFile(fileobj) as zf:
+        for e in entries:
+            e["id"] = str(uuid.uuid4())
+            e["filename"] = os.path.basename(e["name"])
+            e["storage_key"] = f"{settings.S3_PREFIX}{tenant_id}/{e['id']}/{e['filename']}"
+            writer = S3StreamWriter(e["storage_key"], content_type=e["mime"])
+            try:
+                with zf.open(e["name"]) as fh:
+                    while True:
+                        chunk = fh.read(chunk_size)
+                        if not chunk:
+                            break
+                        writer.write(chunk)
+                writer.close()
+            except BaseException:
+                writer.abort()
+                raise
+    return entries
@@ -0,0 +1,55 @@
+# app/aws.py
+"""
+Fábrica única de clientes boto3 (S3, Textract, ...).
+Un cliente por (servicio, proceso): se reutiliza su pool de conexiones HTTP/TLS
+entre documentos y se recrea si el proceso hace fork (workers de gunicorn / OCR).
+"""
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from .config import settings
+
+_clients: Dict[Tuple[str, int], Any] = {}
+# endpoints alternativos por servicio (Textract local / stub en pruebas); None = AWS
+_ENDPOINTS: Dict[str, Optional[str]] = {"textract": settings.TEXTRACT_ENDPOINT_URL}
+_lock = threading.Lock()
+
+
+def client_config(service: str):
+    # boto3/botocore (~100 ms) se importan al crear el primer cliente, no al importar la app
+    from botocore.config import Config
+
+    return Config(
+        region_name=settings.AWS_REGION,
+        max_pool_connections=settings.AWS_MAX_POOL_CONNECTIONS,
+        retries={"mode": "adaptive", "max_attempts": settings.AWS_MAX_ATTEMPTS},
+        connect_timeout=settings.AWS_CONNECT_TIMEOUT,
+        # Textract tarda más en responder que S3
+        read_timeout=settings.AWS_READ_TIMEOUT * (3 if service == "textract" else 1),
+        tcp_keepalive=True,
+    )
+
+
+def get_client(service: str):
+    """Cliente cacheado por proceso. Los clientes boto3 son thread-safe; su creación no."""
+    key = (service, os.getpid())
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                import boto3
+
+                # sesión propia: boto3.client() usa una sesión global que no es thread-safe
+                client = boto3.session.Session().client(
+                    service, config=client_config(service), endpoint_url=_ENDPOINTS.get(service),
+                )
+                _clients[key] = client
+    return client
+
+
+def reset_clients() -> None:
+    """Olvida los clientes cacheados (p. ej. tras un fork o en benchmarks)."""
+    with _lock:
+        _clients.clear()
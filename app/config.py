@@ -8,6 +8,12 @@ class Settings:
     S3_BUCKET = os.getenv("S3_BUCKET")
     S3_PREFIX = os.getenv("S3_PREFIX", "uploads/")
 
+    # Clientes AWS (app/aws.py)
+    AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "32"))
+    AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "5"))
+    AWS_CONNECT_TIMEOUT = float(os.getenv("AWS_CONNECT_TIMEOUT", "5"))
+    AWS_READ_TIMEOUT = float(os.getenv("AWS_READ_TIMEOUT", "30"))
+
     # DB
     DB_URL = (
         f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
@@ -16,8 +22,52 @@ class Settings:
 
     # Seguridad / archivos
     MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "15"))
+    # MIME de archivos sueltos; los ZIP se reconocen antes por archives.is_zip (ZIP_MIMES o .zip)
     ALLOWED_MIME = set((os.getenv("ALLOWED_MIME") or
                         "application/pdf,image/jpeg,image/png,"
-                        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet").split(","))
+                        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet,"
+                        "text/csv,application/csv").split(","))
+    # subida masiva (ZIP): máximo de archivos por ZIP y tamaño máximo del ZIP
+    ARCHIVE_MAX_ENTRIES = int(os.getenv("ARCHIVE_MAX_ENTRIES", "2000"))
+    ARCHIVE_MAX_MB = int(os.getenv("ARCHIVE_MAX_MB", "500"))
+    # descargas: hasta este tamaño se procesan en memoria (memfd), por encima van a /tmp
+    DOWNLOAD_SPOOL_MB = int(os.getenv("DOWNLOAD_SPOOL_MB", "32"))
+    # subida por streaming: tamaño de lectura y de parte del multipart upload
+    UPLOAD_CHUNK_KB = int(os.getenv("UPLOAD_CHUNK_KB", "1024"))
+    S3_PART_SIZE_MB = int(os.getenv("S3_PART_SIZE_MB", "8"))
+
+    # OCR: paralelismo por página
+    OCR_PAGE_WORKERS = int(os.getenv("OCR_PAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+    OCR_RASTER_WINDOW = int(os.getenv("OCR_RASTER_WINDOW", "1"))  # páginas rasterizadas por tanda
+    # PDFs digitales: usar la capa de texto si es buena (evita Tesseract)
+    OCR_PDFTEXT = os.getenv("OCR_PDFTEXT", "1").lower() in ("1", "true", "yes")
+    OCR_PDFTEXT_MIN_CHARS = int(os.getenv("OCR_PDFTEXT_MIN_CHARS", "40"))
+    # preprocesamiento de página antes de Tesseract (ver app/ocr_preprocess.py). Vacío =
+    # imagen tal cual; p. ej. "gray,crop,rescale" tras comparar aciertos con bench.suite
+    OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "")
+    OCR_TARGET_GLYPH_PX = int(os.getenv("OCR_TARGET_GLYPH_PX", "32"))
+    # OCR_MODE=roi: pasada rápida para ubicar anclas y OCR solo de esas regiones
+    OCR_MODE = os.getenv("OCR_MODE", "full").lower()  # full | roi
+    OCR_ROI_PROBE_SCALE = float(os.getenv("OCR_ROI_PROBE_SCALE", "0.35"))
+    OCR_ROI_MAX_AREA = float(os.getenv("OCR_ROI_MAX_AREA", "0.6"))    # fracción de la página
+    OCR_ROI_MIN_FIELDS = int(os.getenv("OCR_ROI_MIN_FIELDS", "2"))
+    # OCR_BACKEND: auto (tesserocr si está instalado) | tesserocr | pytesseract
+    OCR_BACKEND = os.getenv("OCR_BACKEND", "auto").lower()
+    OCR_ENGINE_POOL = int(os.getenv("OCR_ENGINE_POOL", "1"))  # motores tesserocr vivos por proceso
+    OCR_EARLY_STOP = os.getenv("OCR_EARLY_STOP", "1").lower() in ("1", "true", "yes")
+    # ítems: OCR con cajas de palabras (layout por columnas) + tabla de detalle. Apagado por
+    # defecto: cambia el texto que ven los extractores de campos y desactiva el early stop
+    OCR_EXTRACT_ITEMS = os.getenv("OCR_EXTRACT_ITEMS", "0").lower() in ("1", "true", "yes")
+    # ruteo de engines (app/engine_router.py): de barato a caro, se escala al siguiente
+    # si la confianza o los campos requeridos no alcanzan. "local" = solo OCR local
+    OCR_ENGINES = os.getenv("OCR_ENGINES", "local")  # p. ej. local,textract
+    OCR_ESCALATE_CONFIDENCE = float(os.getenv("OCR_ESCALATE_CONFIDENCE", "0.8"))
+    OCR_REQUIRED_FIELDS = os.getenv("OCR_REQUIRED_FIELDS", "ruc,numero,fecha,total")
+    # Textract (AnalyzeExpense asíncrono); TEXTRACT_ENDPOINT_URL para un Textract local
+    TEXTRACT_ENDPOINT_URL = os.getenv("TEXTRACT_ENDPOINT_URL") or None
+    TEXTRACT_POLL_SECONDS = float(os.getenv("TEXTRACT_POLL_SECONDS", "1"))
+    TEXTRACT_TIMEOUT = float(os.getenv("TEXTRACT_TIMEOUT", "180"))
+    # índice local de RUCs (python -m app.ruc_registry build ...); vacío = sin índice
+    RUC_REGISTRY_PATH = os.getenv("RUC_REGISTRY_PATH", "")
 
 settings = Settings()
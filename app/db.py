@@ -1,6 +1,76 @@
+from typing import AsyncIterator, Iterator, Optional
+
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
 from app.settings import settings
 
-engine = create_engine(settings.DB_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+# Los engines se crean al primer uso (no al importar): importar la app no valida la URL
+# ni carga los drivers, y un proceso padre que hace fork (gunicorn --preload, app.worker)
+# no deja pools abiertos a sus hijos. Tras un fork llamar dispose_engines().
+_engine: Optional[Engine] = None
+_async_engine: Optional[AsyncEngine] = None
+_session_factory: Optional[sessionmaker] = None
+_async_session_factory: Optional[async_sessionmaker] = None
+
+
+def _pool() -> dict:
+    return dict(
+        pool_pre_ping=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+
+
+def get_engine() -> Engine:
+    """sync (psycopg2): pipeline de OCR, workers y lotes, que corren fuera del event loop."""
+    global _engine, _session_factory
+    if _engine is None:
+        _engine = create_engine(settings.DB_URL, **_pool())
+        _session_factory = sessionmaker(bind=_engine, autoflush=False, autocommit=False)
+    return _engine
+
+
+def get_async_engine() -> AsyncEngine:
+    """async (asyncpg): handlers de los routers."""
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        _async_engine = create_async_engine(settings.ASYNC_DB_URL, **_pool())
+        _async_session_factory = async_sessionmaker(bind=_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+
+def SessionLocal() -> Session:  # noqa: N802 (antes era el sessionmaker; mismo uso)
+    get_engine()
+    return _session_factory()
+
+
+def AsyncSessionLocal() -> AsyncSession:  # noqa: N802
+    get_async_engine()
+    return _async_session_factory()
+
+
+def dispose_engines() -> None:
+    """
+    En un hijo recién forkeado: descarta las conexiones heredadas del padre sin cerrarlas
+    (siguen siendo del padre). Si el padre nunca creó los engines no hay nada que hacer.
+    """
+    if _engine is not None:
+        _engine.dispose(close=False)
+    if _async_engine is not None:
+        _async_engine.sync_engine.dispose(close=False)
+
+
+def get_db() -> Iterator[Session]:
+    """Dependencia FastAPI: sesión sync (solo para handlers `def`, que van al threadpool)."""
+    with SessionLocal() as db:
+        yield db
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Dependencia FastAPI: sesión async para handlers `async def`."""
+    async with AsyncSessionLocal() as db:
+        yield db
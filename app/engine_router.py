@@ -0,0 +1,196 @@
+# app/engine_router.py
+"""
+Ruteo de engines por niveles, de barato a caro (OCR_ENGINES, p. ej. "local,textract").
+
+Se corre el primer engine; si su resultado no alcanza (confianza menor a
+OCR_ESCALATE_CONFIDENCE o falta alguno de OCR_REQUIRED_FIELDS) se escala al siguiente.
+El resultado del nivel superior se completa con los campos que ya tenía el anterior.
+Si un engine falla, se sigue con el siguiente; si fallan todos, se propaga el error.
+Los errores del documento y no del engine (HTTPException 4xx, fallo al descargarlo de
+S3) se propagan de inmediato: otro engine no los arregla y Textract se cobraría igual.
+
+Todos los engines devuelven el mismo esquema (engine, confidence, doc_kind, parsed) que
+consume materialize_invoices. Para agregar uno:
+
+    @register("nombre")
+    def _mi_engine(inp: EngineInput) -> Dict[str, Any]: ...
+
+EngineInput descarga el archivo de S3 solo si algún engine pide 'path' (Textract lee
+directo del bucket).
+
+Los módulos de cada engine (ocr_local: pdf2image, PIL, numpy, pytesseract; textract_client:
+boto3) se importan en su primera llamada, no al importar la app. preload() los importa de
+antemano (gunicorn --preload: una vez en el master, antes del fork).
+"""
+import hashlib
+import importlib
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from .config import settings
+from .field_extract import FieldScanner
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+
+class EngineInput:
+    """Documento a procesar: metadatos del plan y descarga perezosa (context manager)."""
+
+    def __init__(self, plan: Dict[str, Any], bucket: str, fetch: Callable[[], Any]):
+        self.doc_id: str = plan["doc"]["id"]
+        self.bucket = bucket
+        self.key: str = plan["storage_key"]
+        self.kind: Optional[str] = plan["kind"] or None
+        self.sha256: Optional[str] = plan.get("sha256")
+        self._fetch = fetch
+        self._obj = None
+        self.fetch_error: Optional[Exception] = None
+
+    @property
+    def path(self) -> str:
+        if self._obj is None:
+            try:
+                self._obj = self._fetch()
+            except Exception as e:
+                self.fetch_error = e  # route() no escala por esto
+                raise
+        return self._obj.path
+
+    def close(self) -> None:
+        if self._obj is not None:
+            self._obj.close()
+            self._obj = None
+
+    def __enter__(self) -> "EngineInput":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+Engine = Callable[[EngineInput], Dict[str, Any]]
+_ENGINES: Dict[str, Engine] = {}
+# módulos pesados de cada engine (los importa su primera llamada o preload())
+_MODULES: Dict[str, List[str]] = {}
+
+
+def register(name: str, modules: Optional[List[str]] = None) -> Callable[[Engine], Engine]:
+    def deco(fn: Engine) -> Engine:
+        _ENGINES[name] = fn
+        _MODULES[name] = modules or []
+        return fn
+    return deco
+
+
+def preload(names: Optional[List[str]] = None) -> None:
+    """Importa los módulos de los engines de la cadena (o de 'names')."""
+    for name in names or chain():
+        for module in _MODULES.get(name, []):
+            importlib.import_module(module, __package__)
+
+
+@register("local", modules=[".ocr_local"])
+def _local(inp: EngineInput) -> Dict[str, Any]:
+    from .ocr_local import extract_text_with_engine, parse_boleta_local, parse_factura_local
+
+    raw, engine = extract_text_with_engine(inp.path, inp.kind)
+    metrics.set_engine(engine)
+    with metrics.stage("extract"):
+        sc = FieldScanner(raw)  # un solo scanner para autodetección y parseo
+        kind = inp.kind or (sc.kind() or "factura").lower()
+        if kind == "boleta":
+            result = parse_boleta_local(raw, sc)
+        else:
+            result = parse_factura_local(raw, sc)
+            kind = "factura"  # normaliza
+    result["engine"] = engine
+    result["doc_kind"] = kind
+    return result
+
+
+@register("textract", modules=[".textract_client"])
+def _textract(inp: EngineInput) -> Dict[str, Any]:
+    from .textract_client import analyze_expense_async
+
+    # token de idempotencia por objeto: un reintento del mismo documento reusa el job
+    token = hashlib.sha256(f"{inp.bucket}/{inp.key}".encode()).hexdigest()
+    with metrics.stage("textract"):
+        result = analyze_expense_async(inp.bucket, inp.key, token=token)
+    if inp.kind in ("boleta", "factura"):
+        result["doc_kind"] = inp.kind
+    metrics.set_engine(result["engine"])
+    return result
+
+
+def chain() -> List[str]:
+    names = [n.strip().lower() for n in settings.OCR_ENGINES.split(",") if n.strip()] or ["local"]
+    unknown = [n for n in names if n not in _ENGINES]
+    if unknown:
+        raise HTTPException(status_code=500, detail=f"OCR_ENGINES: engines desconocidos {unknown}")
+    return names
+
+
+def family() -> str:
+    """Parte de la clave de la caché de extracciones: cambia si cambia la cadena."""
+    return "+".join(chain())
+
+
+def _values(result: Dict[str, Any]) -> Dict[str, Any]:
+    parsed = result.get("parsed") or {}
+    return dict(parsed.get("invoice") or {}, ruc=(parsed.get("provider") or {}).get("ruc"))
+
+
+def escalation_reasons(result: Dict[str, Any]) -> List[str]:
+    """Por qué el resultado no alcanza (vacío = alcanza)."""
+    values = _values(result)
+    required = [f.strip() for f in settings.OCR_REQUIRED_FIELDS.split(",") if f.strip()]
+    reasons = [f"missing:{f}" for f in required if values.get(f) in (None, "")]
+    if (result.get("confidence") or 0.0) < settings.OCR_ESCALATE_CONFIDENCE:
+        reasons.append("confidence")
+    return reasons
+
+
+def merge(primary: Dict[str, Any], fallback: Dict[str, Any]) -> Dict[str, Any]:
+    """'primary' con los huecos (proveedor, invoice, ítems) completados desde 'fallback'."""
+    out = dict(primary, parsed=dict(primary["parsed"]))
+    p, f = out["parsed"], fallback.get("parsed") or {}
+    for node in ("provider", "invoice"):
+        merged = dict(f.get(node) or {})
+        merged.update({k: v for k, v in (p.get(node) or {}).items() if v not in (None, "")})
+        p[node] = merged
+    if not p.get("items"):
+        p["items"] = f.get("items") or []
+    return out
+
+
+def route(inp: EngineInput) -> Dict[str, Any]:
+    engines = chain()
+    best: Optional[Dict[str, Any]] = None
+    last_error: Optional[Exception] = None
+    reasons: List[str] = []
+    for name in engines:
+        if best is not None:
+            log.info("ocr.escalate doc_id=%s from=%s to=%s reasons=%s", inp.doc_id, best["engine"], name, reasons)
+            metrics.ESCALATIONS.labels(best["engine"], name).inc()
+        try:
+            result = _ENGINES[name](inp)
+        except Exception as e:
+            if inp.fetch_error is not None or (isinstance(e, HTTPException) and e.status_code < 500):
+                raise
+            last_error = e
+            log.warning("ocr.engine failed doc_id=%s engine=%s err=%s", inp.doc_id, name, e)
+            continue
+        if best is not None:
+            result = merge(result, best)
+            result["escalated_from"] = best["engine"]
+            result["escalation_reasons"] = reasons
+        best = result
+        reasons = escalation_reasons(result)
+        if not reasons:
+            break
+    if best is None:
+        raise last_error or HTTPException(status_code=500, detail="ningún engine devolvió resultado")
+    return best
@@ -4,18 +4,22 @@ from io import BytesIO
 def parse_invoice_xlsx(raw: bytes):
     wb = load_workbook(filename=BytesIO(raw), read_only=True, data_only=True)
     ws = wb.worksheets[0]
-    text = {}
-    for r in ws.iter_rows(max_row=min(ws.max_row, 200), max_col=min(ws.max_column, 20)):
+    # una pasada: rótulos (en minúsculas, en orden de lectura) y valores por celda
+    labels = []
+    values = {}
+    for r in ws.iter_rows(max_row=200, max_col=20):
         for c in r:
             v = str(c.value).strip() if c.value is not None else ""
             if v:
-                text[(c.row, c.column)] = v.lower()
+                labels.append((c.row, c.column, v.lower()))
+                values[(c.row, c.column)] = v
+    wb.close()
 
     def find_right(lbl):
-        for (rr, cc), val in text.items():
+        # la celda de la derecha sale del dict (en read_only, ws.cell() relee la hoja)
+        for rr, cc, val in labels:
             if lbl in val:
-                right = ws.cell(rr, cc+1).value
-                return str(right).strip() if right is not None else ""
+                return values.get((rr, cc + 1), "")
         return ""
 
     fields = {}
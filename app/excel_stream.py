@@ -0,0 +1,207 @@
+# app/excel_stream.py
+"""
+Engine local-excel: exportaciones de registro de compras / ventas (una invoice por fila),
+en .xlsx o en CSV (exportaciones de ERPs).
+
+Lee la primera hoja con openpyxl en modo read_only (iter_rows, values_only), o el CSV
+con el módulo csv sobre el file object: la memoria no crece con el número de filas. La cabecera se ubica una sola vez (en las
+primeras EXCEL_HEADER_SCAN filas) y se mapea a campos por alias normalizados; luego
+cada fila se convierte en un resultado con la misma forma que el OCR
+({"engine", "confidence", "parsed", "doc_kind"}), listo para materialize_invoices.
+"""
+import codecs
+import csv
+import io
+import unicodedata
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import IO, Any, Dict, Iterable, Iterator, Optional, Union
+
+from fastapi import HTTPException
+from openpyxl import load_workbook
+
+from .field_extract import parse_date_any, to_decimal
+
+ENGINE_EXCEL = "local-excel"
+EXCEL_HEADER_SCAN = 30
+
+# alias normalizado (sin tildes, espacios ni signos, en mayúsculas) -> campo
+_ALIASES: Dict[str, str] = {}
+for _field, _names in {
+    "ruc": ("RUC", "RUCPROVEEDOR", "RUCEMISOR", "NUMERORUC", "NRORUC"),
+    "razon_social": ("PROVEEDOR", "RAZONSOCIAL", "EMISOR", "RAZONSOCIALPROVEEDOR", "NOMBRE"),
+    "fecha": ("FECHA", "FECHAEMISION", "FECHADEEMISION", "FEMISION", "FECEMISION"),
+    "moneda": ("MONEDA", "MON", "DIVISA"),
+    "total": ("TOTAL", "IMPORTETOTAL", "MONTOTOTAL", "IMPORTE", "TOTALCOMPROBANTE"),
+    "subtotal": ("SUBTOTAL", "BASEIMPONIBLE", "VALORVENTA", "OPGRAVADA"),
+    "igv": ("IGV", "IGVIPM", "IMPUESTO"),
+    "serie": ("SERIE", "SERIECOMPROBANTE"),
+    "numero": ("NUMERO", "NRO", "NUMEROCOMPROBANTE", "NROCOMPROBANTE", "CORRELATIVO", "COMPROBANTE"),
+    "tipo": ("TIPO", "TIPOCOMPROBANTE", "TIPODOC", "TIPODOCUMENTO"),
+}.items():
+    for _n in _names:
+        _ALIASES[_n] = _field
+
+_REQUIRED = ("total",)
+
+
+def _norm(value: Any) -> str:
+    t = unicodedata.normalize("NFKD", str(value))
+    return "".join(ch for ch in t if ch.isalnum()).upper()
+
+
+def _header_map(row: tuple) -> Dict[str, int]:
+    cols: Dict[str, int] = {}
+    for i, v in enumerate(row):
+        if v is None:
+            continue
+        field = _ALIASES.get(_norm(v))
+        if field and field not in cols:
+            cols[field] = i
+    return cols
+
+
+def _text(v: Any) -> Optional[str]:
+    if v is None:
+        return None
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)  # RUC / número leídos como float por Excel
+    s = str(v).strip()
+    return s or None
+
+
+def _amount(v: Any) -> Optional[str]:
+    if v is None or v == "":
+        return None
+    if isinstance(v, (int, float, Decimal)):
+        try:
+            return str(Decimal(str(v)))
+        except InvalidOperation:
+            return None
+    d = to_decimal(str(v))
+    return str(d) if d is not None else None
+
+
+def _date(v: Any) -> Optional[str]:
+    if isinstance(v, datetime):
+        return v.date().isoformat()
+    if isinstance(v, date):
+        return v.isoformat()
+    return parse_date_any(str(v)) if v not in (None, "") else None
+
+
+def _kind(tipo: Optional[str], serie: Optional[str]) -> str:
+    t = (tipo or "").upper()
+    # tabla 10 de SUNAT: 01 factura, 03 boleta
+    if "BOLETA" in t or t in ("03", "3") or (serie or "").upper().startswith("B"):
+        return "boleta"
+    if "FACTURA" in t or t in ("01", "1") or (serie or "").upper().startswith("F"):
+        return "factura"
+    return "excel"
+
+
+def _row_result(row: tuple, cols: Dict[str, int]) -> Optional[Dict[str, Any]]:
+    def get(field: str) -> Any:
+        i = cols.get(field)
+        return row[i] if i is not None and i < len(row) else None
+
+    total = _amount(get("total"))
+    if total is None:
+        return None  # fila vacía o separador
+    serie, numero = _text(get("serie")), _text(get("numero"))
+    ruc, fecha = _text(get("ruc")), _date(get("fecha"))
+    if not (ruc or fecha or serie or numero):
+        return None  # fila de totales del reporte
+    if serie and numero and "-" not in numero:
+        numero = f"{serie}-{numero}"
+    moneda = _text(get("moneda"))
+    return {
+        "engine": ENGINE_EXCEL,
+        "confidence": 0.99,
+        "doc_kind": _kind(_text(get("tipo")), serie or numero),
+        "parsed": {
+            "provider": {"ruc": ruc, "razon_social": _text(get("razon_social"))},
+            "invoice": {
+                "numero": numero or serie,
+                "fecha": fecha,
+                "moneda": moneda.upper() if moneda else None,
+                "total": total,
+                "subtotal": _amount(get("subtotal")),
+                "igv": _amount(get("igv")),
+            },
+            "items": [],
+        },
+    }
+
+
+def _iter_rows_results(rows: Iterable[tuple], fmt: str) -> Iterator[Dict[str, Any]]:
+    """Ubica la cabecera en las primeras filas y emite un resultado por fila con total."""
+    rows = iter(rows)
+    cols: Dict[str, int] = {}
+    for _, row in zip(range(EXCEL_HEADER_SCAN), rows):
+        cols = _header_map(row)
+        if all(f in cols for f in _REQUIRED) and len(cols) >= 2:
+            break
+    else:
+        cols = {}
+    if not cols:
+        raise HTTPException(
+            status_code=422,
+            detail=f"{fmt} sin cabecera reconocible (se requiere al menos {list(_REQUIRED)} y otra columna)",
+        )
+    for row in rows:
+        result = _row_result(row, cols)
+        if result is not None:
+            yield result
+
+
+def iter_excel_invoices(src: Union[str, IO[bytes]]) -> Iterator[Dict[str, Any]]:
+    """
+    Un resultado por fila con total. 'src' es una ruta .xlsx o un file object binario
+    (las descargas en memoria no tienen extensión y openpyxl valida la de las rutas).
+    """
+    wb = load_workbook(src, read_only=True, data_only=True)
+    try:
+        yield from _iter_rows_results(wb.worksheets[0].iter_rows(values_only=True), "Excel")
+    finally:
+        wb.close()
+
+
+def _sniff_csv(fh: IO[bytes]) -> "tuple[str, str]":
+    """(encoding, delimitador) mirando los primeros 64 KB; deja el archivo al inicio."""
+    sample = fh.read(64 * 1024)
+    fh.seek(0)
+    try:
+        # incremental: un carácter multibyte cortado al final de la muestra no es error
+        text = codecs.getincrementaldecoder("utf-8-sig")().decode(sample, final=False)
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        text, encoding = sample.decode("latin-1"), "latin-1"  # ERPs locales exportan en latin-1
+    try:
+        delimiter = csv.Sniffer().sniff(text, delimiters=",;|\t").delimiter
+    except csv.Error:
+        delimiter = ","
+    return encoding, delimiter
+
+
+def iter_csv_invoices(fh: IO[bytes]) -> Iterator[Dict[str, Any]]:
+    """Igual que iter_excel_invoices para un CSV (file object binario, se lee en streaming)."""
+    encoding, delimiter = _sniff_csv(fh)
+    text = io.TextIOWrapper(fh, encoding=encoding, newline="")
+    try:
+        rows = (tuple(c.strip() or None for c in r) for r in csv.reader(text, delimiter=delimiter))
+        yield from _iter_rows_results(rows, "CSV")
+    finally:
+        text.detach()  # el file object es del llamador: no cerrarlo
+
+
+def iter_ledger_invoices(fh: IO[bytes], fmt: str) -> Iterator[Dict[str, Any]]:
+    return iter_csv_invoices(fh) if fmt == "csv" else iter_excel_invoices(fh)
+
+
+def parse_excel_first(src: Union[str, IO[bytes]]) -> Dict[str, Any]:
+    """Primera invoice del archivo (compatibilidad con los parsers de un solo comprobante)."""
+    for result in iter_excel_invoices(src):
+        return result
+    raise HTTPException(status_code=422, detail="Excel sin filas con total")
+
@@ -0,0 +1,168 @@
+# app/extraction_cache.py
+"""
+Caché de extracciones direccionada por contenido.
+Clave: (sha256 del archivo, cache_key = "<familia de engine>:<tipo>:<versión de parser>:<config>").
+<config> es un hash corto de los ajustes de OCR que cambian el resultado (OCR_MODE,
+OCR_PREPROCESS, OCR_EXTRACT_ITEMS, ...) y del padrón de RUCs cargado (elige el RUC):
+cambiarlos no sirve resultados viejos.
+Nivel 1: LRU en memoria del proceso. Nivel 2: extractor.extractions en Postgres.
+Un resultado nuevo entra al LRU recién cuando la transacción que guarda su fila hace
+commit (un rollback lo descarta), igual que provider_cache.
+Un acierto no vuelve a guardar el JSON: queda una fila 'cached' de referencia por
+documento (ninguna si el documento ya tenía su extracción con esa clave).
+"""
+import copy
+import hashlib
+import json
+import uuid
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.settings import settings
+from .config import settings as ocr_settings
+from .lru import LRUCache
+from .models import Extraction
+from .field_extract import PARSER_VERSION
+from . import ruc_registry
+
+_lru = LRUCache(maxsize=settings.EXTRACTION_CACHE_SIZE)
+
+
+# ajustes de app.config que cambian el texto o los campos extraídos
+_OUTPUT_SETTINGS = (
+    "OCR_MODE", "OCR_PREPROCESS", "OCR_TARGET_GLYPH_PX", "OCR_EXTRACT_ITEMS",
+    "OCR_PDFTEXT", "OCR_PDFTEXT_MIN_CHARS",
+    "OCR_ROI_PROBE_SCALE", "OCR_ROI_MAX_AREA", "OCR_ROI_MIN_FIELDS",
+)
+
+
+def config_fingerprint() -> str:
+    raw = "|".join(f"{name}={getattr(ocr_settings, name, None)}" for name in _OUTPUT_SETTINGS)
+    registry = ruc_registry.get_registry()
+    raw += f"|RUC_REGISTRY={registry.path}:{registry.version}" if registry is not None else "|RUC_REGISTRY="
+    return hashlib.sha256(raw.encode()).hexdigest()[:8]
+
+
+def cache_key(engine_family: str, kind: Optional[str]) -> str:
+    # cache_key es VARCHAR(64): familia + tipo + versión + 8 caracteres de hash
+    return f"{engine_family}:{kind or 'auto'}:{PARSER_VERSION}:{config_fingerprint()}"
+
+
+def lookup(db: Session, sha256: Optional[str], key: str) -> Optional[Dict[str, Any]]:
+    """Devuelve el resultado parseado cacheado (copia) o None."""
+    if not settings.EXTRACTION_CACHE or not sha256:
+        return None
+    hit = _lru.get((sha256, key))
+    if hit is None:
+        row = db.execute(
+            text(
+                """
+                SELECT json FROM extractor.extractions
+                WHERE sha256 = :sha AND cache_key = :key AND status = 'ok'
+                ORDER BY created_at DESC
+                LIMIT 1
+                """
+            ),
+            {"sha": sha256, "key": key},
+        ).first()
+        if not row or not row[0]:
+            return None
+        hit = row[0]
+        _lru.put((sha256, key), hit)
+    return copy.deepcopy(hit)
+
+
+def lookup_many(db: Session, pairs: Iterable[Tuple[Optional[str], str]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Versión por lotes de lookup(): LRU primero y una sola consulta para el resto."""
+    out: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    if not settings.EXTRACTION_CACHE:
+        return out
+    wanted = set()
+    for sha, key in pairs:
+        if not sha:
+            continue
+        hit = _lru.get((sha, key))
+        if hit is not None:
+            out[(sha, key)] = copy.deepcopy(hit)
+        else:
+            wanted.add((sha, key))
+    if wanted:
+        rows = db.execute(
+            text(
+                """
+                SELECT DISTINCT ON (sha256, cache_key) sha256, cache_key, json
+                FROM extractor.extractions
+                WHERE sha256 = ANY(:shas) AND status = 'ok'
+                ORDER BY sha256, cache_key, created_at DESC
+                """
+            ),
+            {"shas": sorted({sha for sha, _ in wanted})},
+        ).all()
+        for sha, key, js in rows:
+            if (sha, key) in wanted and js:
+                _lru.put((sha, key), js)
+                out[(sha, key)] = copy.deepcopy(js)
+    return out
+
+
+_RECORD_HIT = text(
+    """
+    INSERT INTO extractor.extractions (id, document_id, engine, json, confidence, status, sha256, cache_key)
+    SELECT :id, :doc, :engine, CAST(:js AS jsonb), :conf, 'cached', :sha, :key
+    WHERE NOT EXISTS (
+        SELECT 1 FROM extractor.extractions WHERE document_id = :doc AND cache_key = :key
+    )
+    """
+)
+
+
+_PENDING = "extraction_cache_pending"
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(db: Session) -> None:
+    for k, result in db.info.pop(_PENDING, {}).items():
+        _lru.put(k, result)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(db: Session) -> None:
+    db.info.pop(_PENDING, None)
+
+
+def store(db: Session, doc_id: str, sha256: Optional[str], key: Optional[str], result: Dict[str, Any],
+          hit: bool = False) -> None:
+    """
+    Registra la extracción del documento (no hace commit); entra al LRU con el commit.
+    Con hit=True (el resultado salió de la caché) no duplica el JSON: deja una fila
+    'cached' de referencia, salvo que el documento ya tenga una con esa clave (replays).
+    """
+    if hit:
+        db.execute(_RECORD_HIT, {
+            "id": str(uuid.uuid4()),
+            "doc": str(doc_id),
+            "engine": result.get("engine"),
+            "js": json.dumps({"cache_hit": True, "sha256": sha256}),
+            "conf": result.get("confidence"),
+            "sha": sha256,
+            "key": key,
+        })
+        return
+    db.add(Extraction(
+        id=uuid.uuid4(),
+        document_id=uuid.UUID(str(doc_id)),
+        engine=result.get("engine"),
+        json=result,
+        confidence=result.get("confidence"),
+        status="ok",
+        sha256=sha256,
+        cache_key=key,
+    ))
+    if settings.EXTRACTION_CACHE and sha256:
+        db.info.setdefault(_PENDING, {})[(sha256, key)] = copy.deepcopy(result)
+
+
+def stats() -> Dict[str, Any]:
+    return _lru.stats()
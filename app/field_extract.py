@@ -0,0 +1,407 @@
+# app/field_extract.py
+"""
+Extracción de campos (RUC, moneda, total, fecha, número) sobre texto OCR.
+
+Todas las regex se compilan una vez al importar (registro RULES). Un FieldScanner
+recorre el texto con cada regla como mucho una vez y guarda los candidatos
+(match + posición); los resolvers de cada campo eligen entre esos candidatos.
+Las posiciones de los literales ancla (RUC, TOTAL, FECHA, ...) se ubican una sola
+vez con str.find, y cada regla arranca en su ancla o se salta si no hay ancla.
+Boleta y factura comparten el mismo scanner, así que parsear ambos tipos no
+vuelve a escanear el texto.
+
+Solo depende de la stdlib: se puede usar (y medir) sin Tesseract ni poppler.
+Si hay índice local de RUCs (app.ruc_registry), el RUC se elige entre los
+candidatos que pasan el checksum prefiriendo los que existen en el padrón.
+"""
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional
+
+from . import ruc_registry
+
+# Versión de los extractores/parsers. Súbela cuando cambie lo que producen:
+# forma parte de la clave de la caché de extracciones (extractor.extractions).
+# Vive aquí (solo stdlib) para que la caché no tenga que importar el OCR.
+PARSER_VERSION = "4"
+
+I = re.IGNORECASE
+
+# ------------ Registro de reglas (compiladas una vez) ------------
+
+RULES: Dict[str, "re.Pattern[str]"] = {
+    # RUC
+    "ruc_label": re.compile(r"(?:\bRUC\b|R\.?U\.?C\.?)\D*?(\d{11})", I),
+    "ruc_any": re.compile(r"\b(\d{11})\b"),
+    # moneda
+    "cur_usd": re.compile(r"\bUSD\b|\bUS?\$\b|\bDOLARES?\b", I),
+    "cur_pen": re.compile(r"\bPEN\b|\bSOLES?\b|\bS\/\.?", I),
+    "cur_s_slash": re.compile(r"S\/"),
+    "cur_dollar": re.compile(r"(?<!US)\$"),
+    # total: en orden de prioridad
+    # (el monto puede venir con su moneda: "IMPORTE TOTAL S/ 1,180.00", "TOTAL US$ 99.90")
+    "total_importe": re.compile(r"IMPORTE\s+TOTAL[:\s]*((?:S\/\.?|US\$|[S\$]*)\s*[\d\.\,]+)", I),
+    "total_a_pagar": re.compile(r"TOTAL\s*A\s*PAGAR[:\s]*((?:S\/\.?|US\$|[S\$]*)\s*[\d\.\,]+)", I),
+    "total_plain": re.compile(r"\bTOTAL\b[:\s]*((?:S\/\.?|US\$|[S\$]*)\s*[\d\.\,]+)", I),
+    "money_any": re.compile(r"([0-9]{1,3}(?:[.,][0-9]{3})*(?:[.,][0-9]{2}))"),
+    # fecha: en orden de prioridad
+    "date_fecha_emision": re.compile(r"FECHA\s*(?:DE\s*)?EMISI[ÓO]N[:\s]*([0-9./-]{8,10})", I),
+    "date_f_emision": re.compile(r"F\.?\s*EMISI[ÓO]N[:\s]*([0-9./-]{8,10})", I),
+    "date_emision": re.compile(r"\bEMISI[ÓO]N[:\s]*([0-9./-]{8,10})", I),
+    "date_fecha": re.compile(r"\bFECHA[:\s]*([0-9./-]{8,10})", I),
+    "date_any": re.compile(r"(\d{2}[./-]\d{2}[./-]\d{4}|\d{4}-\d{2}-\d{2})"),
+    # número de comprobante
+    "num_fb_serie": re.compile(r"\b([FB]\d{3}-\d{1,12})\b", I),
+    "num_serie_digits": re.compile(r"\b(\d{3}-\d{1,12})\b"),
+    "num_ctx_any": re.compile(r"(FACTURA|BOLETA|N[°o]|#)\s*[:\-]?\s*(\d{6,12})", I),
+    "num_fb_near": re.compile(r"\b([FB]\d{3})\b.{0,30}\b(\d{6,12})\b", I | re.DOTALL),
+    "num_b_generic": re.compile(r"\b([A-Z]{1}[A-Z0-9]{2}\d{2}-\d{1,12})\b", I),
+    "num_b_serie": re.compile(r"\b(B\d{3}-\d{1,12})\b", I),
+    "num_ctx_boleta": re.compile(r"(BOLETA|N[°o]|#)\s*[:\-]?\s*(\d{6,12})", I),
+    "num_f_serie": re.compile(r"\b(F\d{3}-\d{1,12})\b", I),
+    "num_ctx_factura": re.compile(r"(FACTURA|N[°o]|#)\s*[:\-]?\s*(\d{6,12})", I),
+    # tipo de comprobante
+    "kind_boleta": re.compile(r"\bBOLETA\b", I),
+    "kind_factura": re.compile(r"\bFACTURA\b", I),
+}
+
+# Literales (en mayúsculas) con los que empieza TODO match de la regla. El scanner busca
+# su primera aparición con str.find sobre el texto en mayúsculas: si no aparece ninguno
+# la regla no puede matchear y no se ejecuta; si aparece, la regex arranca desde ahí
+# en vez de recorrer el texto desde el principio.
+RULE_PREFIXES: Dict[str, tuple] = {
+    "ruc_label": ("RUC", "R.UC", "RU.C", "R.U.C"),
+    "cur_usd": ("USD", "US$", "U$", "DOLAR"),
+    "cur_pen": ("PEN", "SOL", "S/"),
+    "cur_s_slash": ("S/",),
+    "cur_dollar": ("$",),
+    "total_importe": ("IMPORTE",),
+    "total_a_pagar": ("TOTAL",),
+    "total_plain": ("TOTAL",),
+    "date_fecha_emision": ("FECHA",),
+    "date_emision": ("EMISI",),
+    "date_fecha": ("FECHA",),
+    "num_ctx_any": ("FACTURA", "BOLETA", "N°", "NO", "#"),
+    "num_ctx_boleta": ("BOLETA", "N°", "NO", "#"),
+    "num_ctx_factura": ("FACTURA", "N°", "NO", "#"),
+    "kind_boleta": ("BOLETA",),
+    "kind_factura": ("FACTURA",),
+}
+# Literales que deben aparecer en algún lugar del match (no necesariamente al inicio).
+RULE_REQUIRES: Dict[str, tuple] = {
+    "date_f_emision": ("EMISI",),
+}
+
+_TOTAL_RULES = ("total_importe", "total_a_pagar", "total_plain")
+_DATE_RULES = ("date_fecha_emision", "date_f_emision", "date_emision", "date_fecha")
+
+_NON_NUMERIC_RE = re.compile(r"[^\d,.\-]")
+_CURRENCY_NOISE_RE = re.compile(r"US\$|S\/\.?|[S$ ]", I)
+_PEN_MARK_RE = re.compile(r"\s*S\/", I)
+_DATE_FORMATS = ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d.%m.%Y", "%d %m %Y")
+_RUC_WEIGHTS = (5, 4, 3, 2, 7, 6, 5, 4, 3, 2)  # pesos para los 10 primeros
+
+# ------------ Utilidades de normalización ------------
+
+def to_decimal(txt: Optional[str]) -> Optional[Decimal]:
+    if not txt:
+        return None
+    # normaliza separadores decimales: acepta "1.234,56" o "1,234.56" o "1234.56"
+    # elimina espacios y monedas sueltas
+    t = _NON_NUMERIC_RE.sub("", txt.strip())
+    # si hay ambos ',' y '.' decide por el separador final como decimal
+    if "," in t and "." in t:
+        # asume formato LATAM: miles='.' decimal=','
+        t = t.replace(".", "").replace(",", ".")
+    elif "," in t:
+        # si solo hay ',', úsalo como decimal
+        t = t.replace(",", ".")
+    try:
+        return Decimal(t)
+    except InvalidOperation:
+        return None
+
+def to_decimal_amount(txt: Optional[str]) -> Optional[Decimal]:
+    """
+    Monto impreso con separadores de miles (Textract devuelve el texto tal cual):
+    con ',' y '.' el decimal es el último que aparece; con uno solo, es de miles si se
+    repite o si lo siguen exactamente 3 dígitos ("1,234" -> 1234, "1,234,567", "12,50" ->
+    12.50). El resto lo resuelve to_decimal.
+    """
+    if not txt:
+        return None
+    t = _NON_NUMERIC_RE.sub("", txt.strip())
+    if "," in t and "." in t:
+        thousands = "," if t.rfind(".") > t.rfind(",") else "."
+        t = t.replace(thousands, "")
+    else:
+        for sep in (",", "."):
+            if sep in t and (t.count(sep) > 1 or len(t) - t.rfind(sep) - 1 == 3):
+                t = t.replace(sep, "")
+    return to_decimal(t)
+
+def parse_date_any(s: str) -> Optional[str]:
+    s = s.strip()
+    # formatos más comunes: 31/12/2024, 2024-12-31, 31-12-2024, 31.12.2024
+    for f in _DATE_FORMATS:
+        try:
+            return datetime.strptime(s, f).date().isoformat()
+        except Exception:
+            pass
+    return None
+
+# Validador simple de RUC peruano (módulo 11)
+def valid_ruc(ruc: str) -> bool:
+    if len(ruc) != 11 or not ruc.isdecimal():
+        return False
+    s = sum(int(d) * w for d, w in zip(ruc[:10], _RUC_WEIGHTS))
+    r = 11 - (s % 11)
+    dv = 0 if r == 11 else (1 if r == 10 else r)
+    return dv == int(ruc[-1])
+
+# ------------ Scanner ------------
+
+class FieldScanner:
+    """
+    Candidatos por regla sobre un texto. Cada regla se ejecuta solo cuando un resolver
+    la necesita y a lo sumo una vez; los resultados por campo también se memorizan.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        up = text.upper()
+        # las posiciones de 'up' solo valen para 'text' si upper() no cambió la longitud
+        self._upper: Optional[str] = up if len(up) == len(text) else None
+        self._literal_pos: Dict[str, int] = {}
+        self._matches: Dict[str, List["re.Match[str]"]] = {}
+        self._fields: Dict[str, Any] = {}
+
+    # --- acceso a candidatos ---
+    def _find(self, literal: str) -> int:
+        pos = self._literal_pos.get(literal)
+        if pos is None:
+            pos = self._literal_pos[literal] = self._upper.find(literal)
+        return pos
+
+    def _start(self, rule: str) -> Optional[int]:
+        """Desde dónde escanear la regla; None si seguro no matchea."""
+        if self._upper is None:
+            return 0
+        for lit in RULE_REQUIRES.get(rule, ()):
+            if self._find(lit) < 0:
+                return None
+        prefixes = RULE_PREFIXES.get(rule)
+        if not prefixes:
+            return 0
+        found = [p for p in (self._find(lit) for lit in prefixes) if p >= 0]
+        return min(found) if found else None
+
+    def all(self, rule: str) -> List["re.Match[str]"]:
+        ms = self._matches.get(rule)
+        if ms is None:
+            start = self._start(rule)
+            ms = [] if start is None else list(RULES[rule].finditer(self.text, start))
+            self._matches[rule] = ms
+        return ms
+
+    def first(self, rule: str) -> Optional["re.Match[str]"]:
+        # si la regla ya se escaneó entera, reutiliza; si no, basta con search()
+        ms = self._matches.get(rule)
+        if ms is not None:
+            return ms[0] if ms else None
+        key = "first:" + rule
+        if key not in self._fields:
+            start = self._start(rule)
+            self._fields[key] = None if start is None else RULES[rule].search(self.text, start)
+        return self._fields[key]
+
+    def _memo(self, name: str, fn) -> Any:
+        if name not in self._fields:
+            self._fields[name] = fn()
+        return self._fields[name]
+
+    # --- resolvers ---
+    def ruc(self) -> Optional[str]:
+        def _candidates():
+            # 1) preferente: “RUC ... 11 dígitos”
+            m = self.first("ruc_label")
+            if m and valid_ruc(m.group(1)):
+                yield m.group(1)
+            # 2) fallback: cualquier 11 dígitos que pase checksum
+            for m in self.all("ruc_any"):
+                if valid_ruc(m.group(1)):
+                    yield m.group(1)
+
+        def _resolve():
+            registry = ruc_registry.get_registry()
+            if registry is None:
+                return next(_candidates(), None)
+            # con padrón: el primer candidato que existe; si ninguno, el primero válido
+            first = None
+            for ruc in _candidates():
+                if ruc in registry:
+                    return ruc
+                first = first or ruc
+            return first
+        return self._memo("ruc", _resolve)
+
+    def currency(self) -> Optional[str]:
+        def _resolve():
+            # prioridad por tokens inequívocos
+            if self.first("cur_usd"):
+                return "USD"
+            if self.first("cur_pen"):
+                return "PEN"
+            # heurística: si aparece "S/" -> PEN; si "$" sin "US" cerca -> USD
+            s_count = len(self.all("cur_s_slash"))
+            dollar_count = len(self.all("cur_dollar"))
+            if s_count > 0 and dollar_count == 0:
+                return "PEN"
+            if dollar_count > 0:
+                return "USD"
+            return None
+        return self._memo("currency", _resolve)
+
+    def total_labeled(self) -> Optional[Decimal]:
+        def _resolve():
+            # “IMPORTE TOTAL”, “TOTAL A PAGAR”, “TOTAL”
+            for rule in _TOTAL_RULES:
+                m = self.first(rule)
+                if m:
+                    d = to_decimal_amount(_CURRENCY_NOISE_RE.sub("", m.group(1)))
+                    if d is not None:
+                        return d
+            return None
+        return self._memo("total_labeled", _resolve)
+
+    def total(self) -> Optional[Decimal]:
+        def _resolve():
+            d = self.total_labeled()
+            if d is not None:
+                return d
+            # fallback: toma la mayor cifra tipo dinero que aparezca
+            best = None
+            for m in self.all("money_any"):
+                d = to_decimal(m.group(1))
+                if d is not None and (best is None or d > best):
+                    best = d
+            return best
+        return self._memo("total", _resolve)
+
+    def date(self) -> Optional[str]:
+        def _resolve():
+            # vecinos de “FECHA EMISIÓN” / “F. EMISIÓN”
+            for rule in _DATE_RULES:
+                m = self.first(rule)
+                if m:
+                    d = parse_date_any(m.group(1))
+                    if d:
+                        return d
+            # fallback: primera fecha con formato común
+            for m in self.all("date_any"):
+                d = parse_date_any(m.group(1))
+                if d:
+                    return d
+            return None
+        return self._memo("date", _resolve)
+
+    def number(self, kind: Optional[str] = None) -> Optional[str]:
+        """Número de comprobante; 'kind' = boleta | factura | None (genérico)."""
+        return self._memo("number:" + str(kind), lambda: _NUMBER_RESOLVERS.get(kind, _number_generic)(self))
+
+    def kind(self) -> Optional[str]:
+        def _resolve():
+            if self.first("kind_boleta"):
+                return "boleta"
+            if self.first("kind_factura"):
+                return "factura"
+            # por defecto None (el router asumirá factura)
+            return None
+        return self._memo("kind", _resolve)
+
+    def settled(self, kind: Optional[str] = None) -> bool:
+        """
+        True si agregar texto al final (páginas siguientes) ya no puede cambiar ningún
+        campo: cada uno salió de su regla de mayor prioridad. Los resolvers usan el primer
+        match de cada regla, así que ese valor queda fijo; uno de menor prioridad (TOTAL
+        suelto, FECHA) todavía puede perder contra un match posterior.
+        La moneda es la excepción aceptada: PEN cuenta como definitiva si el IMPORTE TOTAL
+        ya salió impreso en soles ("S/"); una mención posterior de USD/DOLARES (un tipo de
+        cambio en otra página) ya no se lee. Sin eso, las boletas y facturas en soles
+        nunca cortarían antes.
+        """
+        if kind is None:
+            # sin tipo declarado, la autodetección solo es definitiva si ya apareció BOLETA
+            if not self.first("kind_boleta"):
+                return False
+            kind = "boleta"
+        m = self.first("ruc_label")
+        if not (m and valid_ruc(m.group(1))):
+            return False
+        registry = ruc_registry.get_registry()
+        if registry is not None and m.group(1) not in registry:
+            return False  # con padrón, un RUC posterior que sí existe ganaría
+        m = self.first(_TOTAL_RULES[0])
+        if not (m and to_decimal_amount(_CURRENCY_NOISE_RE.sub("", m.group(1))) is not None):
+            return False
+        if not (self.first("cur_usd") or (self.first("cur_pen") and _PEN_MARK_RE.match(m.group(1)))):
+            return False
+        m = self.first(_DATE_RULES[0])
+        if not (m and parse_date_any(m.group(1))):
+            return False
+        return self.first(_NUMBER_TOP_RULE.get(kind, "num_fb_serie")) is not None
+
+    def fields(self, kind: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "ruc": self.ruc(),
+            "moneda": self.currency(),
+            "total": self.total(),
+            "fecha": self.date(),
+            "numero": self.number(kind),
+        }
+
+
+def _number_generic(sc: FieldScanner) -> Optional[str]:
+    # 1) Formatos con serie-tipo típicos: F001-123456, B001-654321, 001-123456
+    m = sc.first("num_fb_serie")
+    if m:
+        return m.group(1).upper()
+    m = sc.first("num_serie_digits")
+    if m:
+        return m.group(1)
+    # 2) Número solo dígitos cerca de “FACTURA/BOLETA/N°/No/#”
+    m = sc.first("num_ctx_any")
+    if m:
+        return m.group(2)
+    # 3) otra heurística: tras serie tipo F001 o B001 en ±30 chars
+    m = sc.first("num_fb_near")
+    if m:
+        return f"{m.group(1).upper()}-{m.group(2)}"
+    return None
+
+def _number_boleta(sc: FieldScanner) -> Optional[str]:
+    # EB01-419, B001-123456, etc.
+    for rule in ("num_b_generic", "num_b_serie"):
+        m = sc.first(rule)
+        if m:
+            return m.group(1).upper()
+    # contexto N°, No, # + dígitos
+    m = sc.first("num_ctx_boleta")
+    return m.group(2) if m else None
+
+def _number_factura(sc: FieldScanner) -> Optional[str]:
+    m = sc.first("num_f_serie")
+    if m:
+        return m.group(1).upper()
+    m = sc.first("num_ctx_factura")
+    return m.group(2) if m else None
+
+_NUMBER_RESOLVERS = {"boleta": _number_boleta, "factura": _number_factura}
+# regla de mayor prioridad de cada resolver de número (ver FieldScanner.settled)
+_NUMBER_TOP_RULE = {"boleta": "num_b_generic", "factura": "num_f_serie"}
+
+
+def extract_fields(text: str, kind: Optional[str] = None) -> Dict[str, Any]:
+    """Atajo: todos los campos de un texto en una pasada del scanner."""
+    return FieldScanner(text).fields(kind)
@@ -2,10 +2,11 @@
 import uuid
 from decimal import Decimal, InvalidOperation
 from datetime import date, datetime
-from sqlalchemy import text
+from sqlalchemy import insert, text
 from sqlalchemy.orm import Session
 from .finance_models import Provider, Invoice, InvoiceItem
-from typing import Optional
+from . import provider_cache, ruc_registry
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 
 def _to_decimal(x):
@@ -41,55 +42,200 @@ def _get_doc_row(db: Session, doc_id: str):
         raise ValueError(f"document {doc_id} no existe")
     return dict(row._mapping)
 
-def _get_or_create_provider(db: Session, tenant_id: str, ruc: Optional[str]):
-    prov = None
-    if ruc:
-        prov = db.query(Provider).filter(
-            Provider.tenant_id == uuid.UUID(tenant_id),
-            Provider.ruc == ruc
-        ).one_or_none()
-    if not prov:
-        prov = Provider(
+def doc_kind_or_none(kind: Optional[str]) -> Optional[str]:
+    return kind if kind in ("boleta", "factura", "excel") else None
+
+# ON CONFLICT necesita el índice único ux_providers_tenant_ruc (scripts/unique_providers.sql).
+# DO NOTHING: RETURNING trae solo los insertados y los existentes no se bloquean (un
+# DO UPDATE, aun con WHERE, bloquea cada fila en conflicto hasta el commit y las cargas
+# de Excel del mismo tenant se serializarían). Los existentes salen de _SELECT_PROVIDERS
+# y solo los que no tienen razón social se completan con el padrón (_FILL_PROVIDERS).
+_INSERT_PROVIDERS = text("""
+    INSERT INTO finance.providers (id, tenant_id, ruc, razon_social, estado, metadata)
+    SELECT t.id, t.tenant_id, t.ruc, t.razon_social, COALESCE(t.estado, 'activo'),
+           CASE WHEN t.condicion IS NULL THEN '{}'::jsonb
+                ELSE jsonb_build_object('condicion', t.condicion) END
+    FROM unnest(CAST(:ids AS uuid[]), CAST(:tenants AS uuid[]), CAST(:rucs AS text[]),
+                CAST(:names AS text[]), CAST(:estados AS text[]), CAST(:conds AS text[]))
+         AS t(id, tenant_id, ruc, razon_social, estado, condicion)
+    ON CONFLICT (tenant_id, ruc) DO NOTHING
+    RETURNING id, tenant_id::text AS tenant_id, ruc
+""")
+
+_SELECT_PROVIDERS = text("""
+    SELECT p.id, p.tenant_id::text AS tenant_id, p.ruc, p.razon_social IS NULL AS incomplete
+    FROM finance.providers p
+    JOIN unnest(CAST(:tenants AS uuid[]), CAST(:rucs AS text[])) AS k(tenant_id, ruc)
+      ON p.tenant_id = k.tenant_id AND p.ruc = k.ruc
+""")
+
+# razón social, estado y condición del padrón para proveedores creados sin ellos
+_FILL_PROVIDERS = text("""
+    UPDATE finance.providers p
+    SET razon_social = t.razon_social,
+        estado = COALESCE(t.estado, p.estado),
+        metadata = CASE WHEN t.condicion IS NULL THEN p.metadata
+                        ELSE COALESCE(p.metadata, '{}'::jsonb) || jsonb_build_object('condicion', t.condicion) END
+    FROM unnest(CAST(:ids AS uuid[]), CAST(:names AS text[]), CAST(:estados AS text[]), CAST(:conds AS text[]))
+         AS t(id, razon_social, estado, condicion)
+    WHERE p.id = t.id AND p.razon_social IS NULL
+""")
+
+ProviderKey = Tuple[str, str]
+
+
+def upsert_providers(db: Session, keys: Iterable[Tuple[str, Optional[str]]]) -> Dict[ProviderKey, uuid.UUID]:
+    """
+    Asegura un proveedor por cada (tenant_id, ruc): primero la caché del proceso y,
+    para el resto, un INSERT ... ON CONFLICT DO NOTHING (sin carreras) y un SELECT de
+    los que ya existían; a los existentes sin razón social se les completa la del padrón.
+    Devuelve {(tenant_id, ruc): provider_id}. Los ids del upsert entran a la caché recién
+    cuando la transacción hace commit (provider_cache.put_after_commit): "ya existía"
+    puede ser un insert de esta misma transacción, que un rollback deshace.
+    Los pares sin ruc se ignoran.
+    """
+    found: Dict[ProviderKey, uuid.UUID] = {}
+    missing: List[ProviderKey] = []
+    # ON CONFLICT no admite la misma fila dos veces en una sentencia: deduplicar antes
+    for key in sorted({(str(t), r) for t, r in keys if r}):
+        pid = provider_cache.get(*key)
+        if pid is not None:
+            found[key] = pid
+        else:
+            missing.append(key)
+    if not missing:
+        return found
+    # razón social / estado / condición del padrón local, sin llamadas de red
+    info = {key: ruc_registry.lookup(key[1]) for key in missing}
+    rows = db.execute(_INSERT_PROVIDERS, {
+        "ids": [str(uuid.uuid4()) for _ in missing],
+        "tenants": [t for t, _ in missing],
+        "rucs": [r for _, r in missing],
+        "names": [i.razon_social if i else None for i in info.values()],
+        "estados": [i.estado.lower() if i and i.estado else None for i in info.values()],
+        "conds": [i.condicion if i else None for i in info.values()],
+    }).mappings().all()
+    inserted = {(r["tenant_id"], r["ruc"]) for r in rows}
+    existing = [k for k in missing if k not in inserted]
+    if existing:
+        rows += db.execute(_SELECT_PROVIDERS, {
+            "tenants": [t for t, _ in existing],
+            "rucs": [r for _, r in existing],
+        }).mappings().all()
+    fill = [r for r in rows
+            if r.get("incomplete") and getattr(info[(r["tenant_id"], r["ruc"])], "razon_social", None)]
+    if fill:
+        fill_info = [info[(r["tenant_id"], r["ruc"])] for r in fill]
+        db.execute(_FILL_PROVIDERS, {
+            "ids": [str(r["id"]) for r in fill],
+            "names": [i.razon_social for i in fill_info],
+            "estados": [i.estado.lower() if i.estado else None for i in fill_info],
+            "conds": [i.condicion for i in fill_info],
+        })
+    for r in rows:
+        key, pid = (r["tenant_id"], r["ruc"]), uuid.UUID(str(r["id"]))
+        found[key] = pid
+        provider_cache.put_after_commit(db, *key, pid)
+    return found
+
+
+def _new_provider(tenant_id: str) -> Dict[str, Any]:
+    # sin RUC no hay clave para deduplicar: un proveedor por invoice (como antes)
+    return dict(id=uuid.uuid4(), tenant_id=uuid.UUID(tenant_id), ruc=None,
+                razon_social=None, estado="activo", metadata={})
+
+
+def _items_rows(invoice_id: uuid.UUID, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        dict(
             id=uuid.uuid4(),
-            tenant_id=uuid.UUID(tenant_id),
-            ruc=ruc,
-            razon_social=None,  # ya no usamos razón social
-            estado="activo",
-            meta={}
+            invoice_id=invoice_id,
+            descripcion=it.get("descripcion"),
+            cantidad=_to_decimal(it.get("cantidad")),
+            precio_unit=_to_decimal(it.get("precio_unit")),
+            igv=_to_decimal(it.get("igv")),
+            total=_to_decimal(it.get("total")),
+            category_id=None,
         )
-        db.add(prov)
-        db.flush()
-    return prov
-
-def materialize_invoice(db: Session, doc_id: str, engine: str, result: dict):
-    doc = _get_doc_row(db, doc_id)
-    tenant_id = doc["tenant_id"]
-    doc_uuid = uuid.UUID(doc["id"])
-
-    parsed = (result or {}).get("parsed") or {}
-    prov_in = (parsed.get("provider") or {})
-    inv_in  = (parsed.get("invoice") or {})
-
-    provider = _get_or_create_provider(db, tenant_id, prov_in.get("ruc"))
-
-    inv = Invoice(
-        id = uuid.uuid4(),
-        tenant_id = uuid.UUID(tenant_id),
-        provider_id = provider.id,
-        document_id = doc_uuid,
-        serie = None,  # no lo usamos por ahora
-        numero = inv_in.get("numero"),
-        fecha = _to_date(inv_in.get("fecha")),
-        moneda = inv_in.get("moneda"),
-        subtotal = None,
-        igv = None,
-        total = _to_decimal(inv_in.get("total")),
-        status = "registrada",
-        due_date = None,
-        meta = {"engine": engine, "confidence": result.get("confidence")}
-    )
-    db.add(inv)
-    db.flush()
-
-    db.commit()
-    return inv.id
\ No newline at end of file
+        for it in items or []
+    ]
+
+
+def materialize_invoices(db: Session, entries: Sequence[Tuple[Dict[str, Any], Dict[str, Any]]],
+                         commit: bool = True) -> List[uuid.UUID]:
+    """
+    Materializa muchas invoices de una vez. 'entries' es una lista de (doc, result):
+    doc con al menos id y tenant_id (doc_kind opcional), result con parsed/engine/doc_kind.
+
+    Proveedores: un INSERT ... ON CONFLICT (tenant_id, ruc). Invoices (con doc_kind) e
+    invoice_items: un INSERT multi-fila cada uno. Un solo commit (si commit=True).
+    Devuelve los ids de las invoices en el mismo orden que 'entries'.
+    """
+    if not entries:
+        return []
+
+    parsed_all = []
+    for doc, result in entries:
+        parsed = (result or {}).get("parsed") or {}
+        ruc = (parsed.get("provider") or {}).get("ruc")
+        parsed_all.append((doc, result or {}, parsed, ruc))
+
+    providers = upsert_providers(db, [(doc["tenant_id"], ruc) for doc, _, _, ruc in parsed_all])
+    loose: List[Dict[str, Any]] = []
+    inv_rows: List[Dict[str, Any]] = []
+    item_rows: List[Dict[str, Any]] = []
+    for doc, result, parsed, ruc in parsed_all:
+        tenant_id = str(doc["tenant_id"])
+        provider_id = providers.get((tenant_id, ruc)) if ruc else None
+        if provider_id is None:
+            prov = _new_provider(tenant_id)
+            loose.append(prov)
+            provider_id = prov["id"]
+
+        inv_in = parsed.get("invoice") or {}
+        inv_id = uuid.uuid4()
+        inv_rows.append(dict(
+            id=inv_id,
+            tenant_id=uuid.UUID(tenant_id),
+            provider_id=provider_id,
+            document_id=uuid.UUID(str(doc["id"])),
+            serie=None,  # no lo usamos por ahora
+            numero=inv_in.get("numero"),
+            fecha=_to_date(inv_in.get("fecha")),
+            moneda=inv_in.get("moneda"),
+            subtotal=None,
+            igv=None,
+            total=_to_decimal(inv_in.get("total")),
+            status="registrada",
+            due_date=None,
+            doc_kind=doc_kind_or_none(result.get("doc_kind") or doc.get("doc_kind")),
+            meta={"engine": result.get("engine"), "confidence": result.get("confidence")},
+        ))
+        item_rows.extend(_items_rows(inv_id, parsed.get("items")))
+
+    try:
+        if loose:
+            db.execute(insert(Provider.__table__), loose)
+        db.execute(insert(Invoice.__table__), inv_rows)
+        if item_rows:
+            db.execute(insert(InvoiceItem.__table__), item_rows)
+        if commit:
+            db.commit()
+    except Exception:
+        # p.ej. FK rota por un proveedor cacheado que ya no existe: no volver a usarlos
+        provider_cache.invalidate(providers.keys())
+        raise
+
+    return [r["id"] for r in inv_rows]
+
+
+def materialize_invoice(db: Session, doc_id: str, engine: str, result: dict,
+                        doc: Optional[dict] = None, commit: bool = True):
+    """
+    Crea la invoice (y su proveedor si no existe) a partir del resultado parseado.
+    'doc' evita releer la fila del documento si el llamador ya la tiene (id, tenant_id);
+    con commit=False el llamador agrupa varias invoices en una sola transacción.
+    """
+    if doc is None:
+        doc = _get_doc_row(db, doc_id)
+    return materialize_invoices(db, [(doc, dict(result or {}, engine=engine))], commit=commit)[0]
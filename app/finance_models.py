@@ -17,7 +17,11 @@ class Provider(Base):
     # atributo Python 'meta', columna física 'metadata'
     meta = Column("metadata", JSONB)
 
-    invoices = relationship("Invoice", back_populates="provider", lazy="selectin")
+    # sin carga implícita: "selectin" traía todas las invoices de cada proveedor cargado y
+    # "joined" sumaba un JOIN a cada Invoice. Quien las necesite las pide en la consulta
+    # (selectinload / joinedload / contains_eager); un acceso no previsto falla en vez de
+    # disparar una consulta por fila.
+    invoices = relationship("Invoice", back_populates="provider", lazy="raise_on_sql")
 
 
 class Invoice(Base):
@@ -37,9 +41,10 @@ class Invoice(Base):
     total = Column(Numeric)
     status = Column(Text)
     due_date = Column(Date)
+    doc_kind = Column(String(16))  # boleta | factura | excel
     meta = Column(JSONB)
 
-    provider = relationship("Provider", back_populates="invoices", lazy="joined")
+    provider = relationship("Provider", back_populates="invoices", lazy="raise_on_sql")
 
 
 class InvoiceItem(Base):
@@ -0,0 +1,179 @@
+# app/jobs.py
+"""
+Cola durable de jobs de OCR sobre Postgres (tabla extractor.jobs).
+Los workers reclaman jobs con SELECT ... FOR UPDATE SKIP LOCKED, así varios
+procesos pueden drenar la cola sin pisarse.
+
+Lease: started_at es el último latido del worker que tiene el job. Mientras procesa,
+heartbeat() lo renueva; si pasa JOB_LEASE_SECONDS sin latido, requeue_stale() lo
+devuelve a la cola. Cada reclamo suma 'attempts', que identifica al dueño: latido,
+finish_job y fail_job solo tocan el job si sigue 'running' con ese mismo intento
+(un worker que perdió el lease no pisa al que lo reclamó después).
+"""
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import bindparam
+
+# estados posibles de un job
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+
+
+_ENQUEUE_SQL = text(
+    """
+    INSERT INTO extractor.jobs (id, document_id, status)
+    VALUES (:id, :doc, 'queued')
+    """
+)
+
+_GET_SQL = text(
+    """
+    SELECT id::text AS id, document_id::text AS document_id, status, attempts,
+           result, error_message, created_at, started_at, finished_at
+    FROM extractor.jobs
+    WHERE id = :id
+    """
+)
+
+
+def _job_rows(doc_ids: Iterable[str]) -> List[Dict[str, str]]:
+    return [{"id": str(uuid.uuid4()), "doc": str(d)} for d in doc_ids]
+
+
+def enqueue_jobs(db: Session, doc_ids: Iterable[str]) -> List[str]:
+    """Encola un job por documento. No hace commit (lo decide el llamador)."""
+    rows = _job_rows(doc_ids)
+    if rows:
+        db.execute(_ENQUEUE_SQL, rows)
+    return [r["id"] for r in rows]
+
+
+def enqueue_job(db: Session, doc_id: str) -> str:
+    return enqueue_jobs(db, [doc_id])[0]
+
+
+async def enqueue_jobs_async(db: AsyncSession, doc_ids: Iterable[str]) -> List[str]:
+    """Igual que enqueue_jobs, con sesión async (routers). No hace commit."""
+    rows = _job_rows(doc_ids)
+    if rows:
+        await db.execute(_ENQUEUE_SQL, rows)
+    return [r["id"] for r in rows]
+
+
+def claim_job(db: Session) -> Optional[Dict[str, Any]]:
+    """
+    Toma el job en cola más antiguo y lo marca 'running'.
+    SKIP LOCKED hace que otros workers salten la fila bloqueada en vez de esperar.
+    """
+    row = db.execute(
+        text(
+            """
+            UPDATE extractor.jobs j
+            SET status = 'running', attempts = j.attempts + 1, started_at = now()
+            WHERE j.id = (
+                SELECT id FROM extractor.jobs
+                WHERE status = 'queued' AND run_after <= now()
+                ORDER BY created_at
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING j.id::text AS id, j.document_id::text AS document_id, j.attempts
+            """
+        )
+    ).mappings().first()
+    db.commit()
+    return dict(row) if row else None
+
+
+def heartbeat(db: Session, job_id: str, attempt: int) -> bool:
+    """Renueva el lease del job. False si ya no es nuestro (vencido y reclamado por otro)."""
+    res = db.execute(
+        text(
+            """
+            UPDATE extractor.jobs SET started_at = now()
+            WHERE id = :id AND status = 'running' AND attempts = :attempt
+            """
+        ),
+        {"id": job_id, "attempt": attempt},
+    )
+    db.commit()
+    return bool(res.rowcount)
+
+
+def finish_job(db: Session, job_id: str, attempt: int, result: Dict[str, Any]) -> bool:
+    """Marca el job 'done'. False si el lease de este intento ya se había perdido."""
+    res = db.execute(
+        text(
+            """
+            UPDATE extractor.jobs
+            SET status = 'done', result = :result, error_message = NULL, finished_at = now()
+            WHERE id = :id AND status = 'running' AND attempts = :attempt
+            """
+        ).bindparams(bindparam("result", type_=JSONB)),
+        {"id": job_id, "attempt": attempt, "result": result},
+    )
+    db.commit()
+    return bool(res.rowcount)
+
+
+def fail_job(db: Session, job_id: str, attempt: int, error: str, retry: bool, backoff_seconds: int = 0) -> bool:
+    """
+    Si retry=True el job vuelve a la cola (con backoff); si no, queda en 'error'.
+    False si el lease de este intento ya se había perdido (no se toca el job).
+    """
+    res = db.execute(
+        text(
+            """
+            UPDATE extractor.jobs
+            SET status = CASE WHEN :retry THEN 'queued' ELSE 'error' END,
+                run_after = now() + make_interval(secs => :backoff),
+                error_message = :err,
+                finished_at = CASE WHEN :retry THEN NULL ELSE now() END
+            WHERE id = :id AND status = 'running' AND attempts = :attempt
+            """
+        ),
+        {"id": job_id, "attempt": attempt, "err": error[:2000], "retry": retry, "backoff": backoff_seconds},
+    )
+    db.commit()
+    return bool(res.rowcount)
+
+
+def requeue_stale(db: Session, lease_seconds: int, max_attempts: int) -> int:
+    """
+    Jobs 'running' sin latido en 'lease_seconds' (el worker murió): vuelven a la cola si les quedan
+    intentos; si no, quedan en 'error'. Un documento que tumba al worker (crash, OOM)
+    no debe reencolarse para siempre. 'attempts' ya cuenta el intento que murió.
+    """
+    res = db.execute(
+        text(
+            """
+            UPDATE extractor.jobs
+            SET status = CASE WHEN attempts < :max THEN 'queued' ELSE 'error' END,
+                error_message = CASE WHEN attempts < :max THEN error_message
+                    ELSE 'lease vencido: el worker murió en ' || attempts || ' intentos' END,
+                finished_at = CASE WHEN attempts < :max THEN NULL ELSE now() END
+            WHERE status = 'running'
+              AND started_at < now() - make_interval(secs => :lease)
+            """
+        ),
+        {"lease": lease_seconds, "max": max_attempts},
+    )
+    db.commit()
+    return res.rowcount or 0
+
+
+def get_job(db: Session, job_id: str) -> Optional[Dict[str, Any]]:
+    row = db.execute(_GET_SQL, {"id": job_id}).mappings().first()
+    return dict(row) if row else None
+
+
+async def get_job_async(db: AsyncSession, job_id: str) -> Optional[Dict[str, Any]]:
+    row = (await db.execute(_GET_SQL, {"id": job_id})).mappings().first()
+    return dict(row) if row else None
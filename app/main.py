@@ -1,10 +1,47 @@
-from fastapi import FastAPI
-from .routers import documents, ocr
+import logging
+from contextlib import asynccontextmanager
 
-app = FastAPI(title="OCR Service")
+from fastapi import FastAPI, Response
+from starlette.concurrency import run_in_threadpool
+
+from app.settings import settings
+from .db import SessionLocal
+from .routers import documents, invoices, ocr
+from . import metrics, provider_cache
+from .upload_limit import UploadSizeLimit
+
+log = logging.getLogger(__name__)
+
+
+def _warm_provider_cache() -> None:
+    # sin precarga configurada no hay que abrir sesión (ni exigir la BD en el arranque)
+    if not settings.PROVIDER_CACHE or settings.PROVIDER_CACHE_WARM <= 0:
+        return
+    try:
+        with SessionLocal() as db:
+            provider_cache.warm(db)
+    except Exception:
+        # la caché es opcional: sin precarga igual arranca
+        log.exception("provider_cache warm failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(_warm_provider_cache)
+    yield
+
+
+app = FastAPI(title="OCR Service", lifespan=lifespan)
+app.add_middleware(UploadSizeLimit, paths=["/documents/upload"])
 app.include_router(documents.router)
 app.include_router(ocr.router)
+app.include_router(invoices.router)
 
 @app.get("/health")
 def health():
     return {"ok": True}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,211 @@
+# app/metrics.py
+"""
+Métricas del pipeline (formato Prometheus, expuestas en GET /metrics).
+
+  ocr_stage_seconds{stage}            duración de cada etapa: select, cache, download,
+                                      pdftext, rasterize, ocr_page, extract, materialize
+  ocr_document_seconds{engine,outcome} duración total por documento
+  ocr_document_pages / _bytes         páginas y bytes descargados por documento
+  ocr_document_peak_rss_bytes         pico de RSS del proceso al terminar cada documento
+  ocr_pages_total{source}             páginas resueltas por capa de texto o por OCR
+  ocr_engine_escalations_total        escalamientos local -> textract (app.engine_router)
+
+Uso:
+
+    with metrics.document(doc_id) as rec:    # un registro por documento (contextvar)
+        with metrics.stage("download"):      # histograma + acumulado en el registro
+            ...
+        metrics.add_pages(3, source="ocr")
+
+Las etapas fuera de un documento (p. ej. la materialización de un lote) solo alimentan
+el histograma. Al cerrar el documento se deja una línea "ocr.metrics ..." en el log.
+
+Multiproceso (Gunicorn, app.worker): con PROMETHEUS_MULTIPROC_DIR definido ANTES de
+arrancar, cada proceso escribe sus valores en ese directorio y /metrics los agrega.
+gunicorn_conf.py lo limpia al arrancar y marca los workers muertos (child_exit).
+
+El pico de RSS es el máximo histórico del proceso (getrusage), no se puede reiniciar por
+documento: sirve para dimensionar workers, no para atribuir memoria a un documento puntual.
+"""
+import logging
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    start_http_server,
+)
+from prometheus_client import multiprocess
+
+log = logging.getLogger(__name__)
+
+_STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+_DOC_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+_PAGE_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+_BYTES_BUCKETS = tuple(2 ** k * 1024 for k in range(4, 16, 2))  # 16 KB .. 32 MB
+_RSS_BUCKETS = tuple(m * 1024 * 1024 for m in (128, 256, 384, 512, 768, 1024, 1536, 2048, 4096))
+
+STAGE_SECONDS = Histogram("ocr_stage_seconds", "Duración por etapa del pipeline", ["stage"], buckets=_STAGE_BUCKETS)
+DOC_SECONDS = Histogram(
+    "ocr_document_seconds", "Duración total por documento", ["engine", "outcome"], buckets=_DOC_BUCKETS,
+)
+DOC_PAGES = Histogram("ocr_document_pages", "Páginas por documento", buckets=_PAGE_BUCKETS)
+DOC_BYTES = Histogram("ocr_document_bytes", "Bytes descargados por documento", buckets=_BYTES_BUCKETS)
+DOC_PEAK_RSS = Histogram(
+    "ocr_document_peak_rss_bytes", "Pico de RSS del proceso al terminar el documento", buckets=_RSS_BUCKETS,
+)
+PAGES = Counter("ocr_pages", "Páginas procesadas", ["source"])
+ESCALATIONS = Counter("ocr_engine_escalations", "Escalamientos entre engines", ["from_engine", "to_engine"])
+PROCESS_PEAK_RSS = Gauge(
+    "ocr_process_peak_rss_bytes", "Pico de RSS del proceso", multiprocess_mode="livemax",
+)
+
+# ru_maxrss viene en KB en Linux y en bytes en macOS
+_RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def peak_rss() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT
+
+
+class DocRecord:
+    """Lo medido de un documento: segundos por etapa, páginas y bytes."""
+
+    __slots__ = ("doc_id", "engine", "stages", "pages", "bytes")
+
+    def __init__(self, doc_id: str):
+        self.doc_id = doc_id
+        self.engine: Optional[str] = None
+        self.stages: Dict[str, float] = {}
+        self.pages = 0
+        self.bytes = 0
+
+
+_current: ContextVar[Optional[DocRecord]] = ContextVar("ocr_doc_record", default=None)
+
+
+def current() -> Optional[DocRecord]:
+    return _current.get()
+
+
+def observe(name: str, seconds: float) -> None:
+    """Registra 'seconds' en la etapa 'name' (útil cuando se midió en otro proceso)."""
+    STAGE_SECONDS.labels(name).observe(seconds)
+    rec = _current.get()
+    if rec is not None:
+        rec.stages[name] = rec.stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0)
+
+
+def add_pages(n: int, source: str) -> None:
+    """'source': pdftext (capa de texto) u ocr."""
+    if n <= 0:
+        return
+    PAGES.labels(source).inc(n)
+    rec = _current.get()
+    if rec is not None:
+        rec.pages += n
+
+
+def add_bytes(n: int) -> None:
+    rec = _current.get()
+    if rec is not None:
+        rec.bytes += n
+
+
+def set_engine(engine: Optional[str]) -> None:
+    rec = _current.get()
+    if rec is not None and engine:
+        rec.engine = engine
+
+
+@contextmanager
+def document(doc_id: str) -> Iterator[DocRecord]:
+    """
+    Mide un documento completo. El registro vive en un contextvar: las etapas que corren
+    en el mismo hilo (o contexto) se acumulan aquí. Cada hilo de un lote abre el suyo.
+    """
+    rec = DocRecord(str(doc_id))
+    token = _current.set(rec)
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        yield rec
+        outcome = "ok"
+    finally:
+        _current.reset(token)
+        elapsed = time.perf_counter() - t0
+        rss = peak_rss()
+        DOC_SECONDS.labels(rec.engine or "none", outcome).observe(elapsed)
+        if rec.pages:
+            DOC_PAGES.observe(rec.pages)
+        if rec.bytes:
+            DOC_BYTES.observe(rec.bytes)
+        DOC_PEAK_RSS.observe(rss)
+        PROCESS_PEAK_RSS.set(rss)
+        log.info(
+            "ocr.metrics doc_id=%s outcome=%s engine=%s ms=%.1f pages=%s bytes=%s peak_rss_mb=%.1f stages=%s",
+            rec.doc_id, outcome, rec.engine, elapsed * 1000, rec.pages, rec.bytes, rss / 1e6,
+            {k: round(v * 1000, 1) for k, v in rec.stages.items()},
+        )
+
+
+# ------------ Exposición ------------
+
+def multiprocess_dir() -> Optional[str]:
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.environ.get("prometheus_multiproc_dir")
+
+
+def _registry():
+    if multiprocess_dir():
+        # registro nuevo por request: agrega los archivos de todos los procesos
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render() -> Tuple[bytes, str]:
+    """(cuerpo, content-type) para el endpoint /metrics."""
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+
+def serve(port: int) -> None:
+    """Servidor HTTP propio (procesos sin FastAPI, como app.worker)."""
+    start_http_server(port, registry=_registry())
+    log.info("metrics listening port=%s multiprocess=%s", port, bool(multiprocess_dir()))
+
+
+def reset_multiprocess_dir() -> None:
+    """Vacía PROMETHEUS_MULTIPROC_DIR (al arrancar, antes de crear procesos)."""
+    path = multiprocess_dir()
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+
+
+def mark_process_dead(pid: int) -> None:
+    if multiprocess_dir():
+        multiprocess.mark_process_dead(pid)
@@ -29,6 +29,9 @@ class Extraction(Base):
     confidence: Mapped[float | None] = mapped_column(DOUBLE_PRECISION)
     status: Mapped[str] = mapped_column(String(16), default="ok")
     error_message: Mapped[str | None] = mapped_column(Text)
+    # caché por contenido: sha256 del archivo + "<engine>:<tipo>:<versión parser>"
+    sha256: Mapped[str | None] = mapped_column(String(128))
+    cache_key: Mapped[str | None] = mapped_column(String(64))
 
 
 class DocKind(str, Enum):
@@ -0,0 +1,166 @@
+# app/ocr_backends.py
+"""
+Backends de OCR detrás de _text_from_image / ocr_roi.
+
+- PytesseractBackend: lanza el binario `tesseract` por cada llamada (escribe la
+  imagen a un temporal y recarga el traineddata spa+eng cada vez).
+- TesserocrBackend: motores de la API C de Tesseract (bindings `tesserocr`) que se
+  cargan una vez y quedan vivos en un pool acotado (OCR_ENGINE_POOL por proceso);
+  cada llamada toma un motor libre, lo usa y lo devuelve.
+
+OCR_BACKEND=auto usa tesserocr si está instalado (pip install tesserocr) y si no,
+pytesseract. pytesseract queda siempre como respaldo.
+"""
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import pytesseract
+from PIL import Image
+
+from .config import settings
+
+try:  # dependencia opcional
+    import tesserocr
+except ImportError:  # pragma: no cover - depende del entorno
+    tesserocr = None
+
+log = logging.getLogger(__name__)
+
+DEFAULT_LANG = "spa+eng"
+
+
+class OcrBackend:
+    name = "base"
+
+    def image_to_string(self, img: Image.Image, lang: str = DEFAULT_LANG,
+                        psm: Optional[int] = None, dpi: Optional[int] = None) -> str:
+        raise NotImplementedError
+
+    def image_to_data(self, img: Image.Image, lang: str = DEFAULT_LANG,
+                      psm: Optional[int] = None, dpi: Optional[int] = None) -> Dict[str, List[Any]]:
+        """Cajas por palabra con las claves de pytesseract.Output.DICT (text, conf, left, ...)."""
+        raise NotImplementedError
+
+
+class PytesseractBackend(OcrBackend):
+    name = "pytesseract"
+
+    @staticmethod
+    def _config(psm: Optional[int], dpi: Optional[int]) -> str:
+        parts = []
+        if dpi:
+            parts.append(f"--dpi {dpi}")
+        if psm is not None:
+            parts.append(f"--psm {psm}")
+        return " ".join(parts)
+
+    def image_to_string(self, img, lang=DEFAULT_LANG, psm=None, dpi=None):
+        return pytesseract.image_to_string(img, lang=lang, config=self._config(psm, dpi))
+
+    def image_to_data(self, img, lang=DEFAULT_LANG, psm=None, dpi=None):
+        return pytesseract.image_to_data(img, lang=lang, config=self._config(psm, dpi),
+                                         output_type=pytesseract.Output.DICT)
+
+
+class TesserocrBackend(OcrBackend):
+    """Pool acotado de motores tesserocr.PyTessBaseAPI ya inicializados."""
+    name = "tesserocr"
+
+    def __init__(self, size: int, lang: str = DEFAULT_LANG):
+        if tesserocr is None:
+            raise RuntimeError("tesserocr no está instalado")
+        self.lang = lang
+        self.size = max(1, size)
+        self._free: "queue.Queue[Any]" = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _engine(self, lang: str):
+        if lang != self.lang:
+            # idioma distinto al del pool: motor de un solo uso
+            api = tesserocr.PyTessBaseAPI(lang=lang)
+            try:
+                yield api
+            finally:
+                api.End()
+            return
+        try:
+            api = self._free.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            # cargar el traineddata es lo caro: solo se hace 'size' veces por proceso
+            api = tesserocr.PyTessBaseAPI(lang=self.lang) if create else self._free.get()
+        try:
+            yield api
+        finally:
+            api.Clear()
+            self._free.put(api)
+
+    @staticmethod
+    def _prepare(api, img: Image.Image, psm: Optional[int], dpi: Optional[int]) -> None:
+        api.SetPageSegMode(psm if psm is not None else tesserocr.PSM.AUTO)
+        api.SetImage(img)
+        if dpi:
+            api.SetSourceResolution(int(dpi))
+
+    def image_to_string(self, img, lang=DEFAULT_LANG, psm=None, dpi=None):
+        with self._engine(lang) as api:
+            self._prepare(api, img, psm, dpi)
+            return api.GetUTF8Text()
+
+    def image_to_data(self, img, lang=DEFAULT_LANG, psm=None, dpi=None):
+        out: Dict[str, List[Any]] = {k: [] for k in
+                                     ("text", "conf", "left", "top", "width", "height", "line_num")}
+        with self._engine(lang) as api:
+            self._prepare(api, img, psm, dpi)
+            api.Recognize()
+            ri = api.GetIterator()
+            word_level = tesserocr.RIL.WORD
+            line = 0
+            if ri is not None:
+                while True:
+                    if ri.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                        line += 1
+                    bbox = ri.BoundingBox(word_level)
+                    if bbox is not None:
+                        x0, y0, x1, y1 = bbox
+                        out["text"].append(ri.GetUTF8Text(word_level) or "")
+                        out["conf"].append(ri.Confidence(word_level))
+                        out["left"].append(x0)
+                        out["top"].append(y0)
+                        out["width"].append(x1 - x0)
+                        out["height"].append(y1 - y0)
+                        out["line_num"].append(line)
+                    if not ri.Next(word_level):
+                        break
+        return out
+
+
+_backend: Optional[OcrBackend] = None
+_backend_pid: Optional[int] = None
+
+
+def make_backend(name: str) -> OcrBackend:
+    name = (name or "auto").lower()
+    if name in ("tesserocr", "auto") and tesserocr is not None:
+        return TesserocrBackend(settings.OCR_ENGINE_POOL)
+    if name == "tesserocr":
+        log.warning("OCR_BACKEND=tesserocr pero tesserocr no está instalado; uso pytesseract")
+    return PytesseractBackend()
+
+
+def get_backend() -> OcrBackend:
+    """Backend del proceso (los motores no sobreviven a un fork: se recrean por pid)."""
+    global _backend, _backend_pid
+    if _backend is None or _backend_pid != os.getpid():
+        _backend = make_backend(settings.OCR_BACKEND)
+        _backend_pid = os.getpid()
+    return _backend
@@ -0,0 +1,219 @@
+# app/ocr_items.py
+"""
+Ítems (líneas de detalle) de facturas y boletas.
+
+Dos partes:
+
+  layout_text(data)  arma el texto de una página a partir de las cajas de palabras de
+                     Tesseract (image_to_data), conservando la posición horizontal como
+                     espacios, igual que `pdftotext -layout`. Las filas se agrupan con
+                     NumPy sobre los arreglos de cajas (orden por y, cortes donde el salto
+                     vertical supera media altura de línea), sin bucles por palabra.
+  extract_items(text) reconstruye las filas de la tabla sobre ese texto (o la capa de
+                     texto del PDF): ubica la cabecera (DESCRIPCIÓN, CANT., P. UNIT.,
+                     IGV, IMPORTE...), asigna cada celda a la columna más cercana y corta
+                     en el bloque de totales. Sin cabecera, solo acepta filas
+                     "cant descripción p.unit total" cuyo cant x p.unit cuadra con el total.
+
+Se activa con OCR_EXTRACT_ITEMS=1 (por defecto 0: el OCR usa image_to_string y no se
+extraen ítems). Con ítems activos no hay early stop: el detalle sigue en otras páginas.
+"""
+import re
+import unicodedata
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .field_extract import to_decimal
+
+# ------------ Texto con layout desde cajas de palabras ------------
+
+def layout_text(data: Dict[str, List[Any]]) -> str:
+    """Texto por filas (de arriba a abajo) con las palabras ubicadas por columna de carácter."""
+    words = np.array([str(w).strip() for w in data.get("text", [])], dtype=object)
+    if words.size == 0:
+        return ""
+    conf = np.asarray(data["conf"], dtype=np.float64)
+    left = np.asarray(data["left"], dtype=np.float64)
+    top = np.asarray(data["top"], dtype=np.float64)
+    width = np.asarray(data["width"], dtype=np.float64)
+    height = np.asarray(data["height"], dtype=np.float64)
+    lens = np.fromiter((len(w) for w in words), dtype=np.int64, count=words.size)
+
+    keep = (conf >= 0) & (lens > 0)
+    if not keep.any():
+        return ""
+    words, left, top, width, height, lens = (a[keep] for a in (words, left, top, width, height, lens))
+
+    # 1) filas: cortes donde el centro vertical salta más de media altura de línea
+    line_h = float(np.median(height)) or 1.0
+    yc = top + height / 2
+    order = np.argsort(yc, kind="stable")
+    row = np.concatenate(([0], np.cumsum(np.diff(yc[order]) > 0.5 * line_h)))
+
+    # 2) dentro de cada fila, de izquierda a derecha
+    perm = np.lexsort((left[order], row))
+    order, row = order[perm], row[perm]
+
+    # 3) columna de carácter de cada palabra (ancho de carácter mediano de la página)
+    char_w = float(np.median(width / lens)) or 1.0
+    lo = left[order]
+    col = np.round(lo / char_w).astype(np.int64)
+    end = col + lens[order]
+    starts_row = np.concatenate(([True], row[1:] != row[:-1]))
+    prev_end = np.concatenate(([0], end[:-1]))
+    gap_px = lo - np.concatenate(([0.0], (lo + width[order])[:-1]))
+    # espacio normal entre palabras -> 1; hueco de columna (> 1.5 caracteres) -> al menos 2,
+    # así las celdas quedan separadas por 2+ espacios; la primera de la fila conserva la sangría
+    gap = np.where(gap_px > 1.5 * char_w, np.maximum(col - prev_end, 2), 1)
+    gap = np.where(starts_row, col, gap)
+
+    pieces = [" " * g + w for g, w in zip(gap.tolist(), words[order].tolist())]
+    bounds = np.flatnonzero(starts_row).tolist() + [len(pieces)]
+    return "\n".join("".join(pieces[a:b]) for a, b in zip(bounds[:-1], bounds[1:]))
+
+
+# ------------ Filas de la tabla de ítems ------------
+
+FIELDS = ("descripcion", "cantidad", "precio_unit", "igv", "total")
+_NUMERIC = ("cantidad", "precio_unit", "igv", "total")
+
+# rótulo de cabecera normalizado -> campo (se prueba en orden; None = columna ignorada)
+_HEADER_MAP: Tuple[Tuple[str, Optional[str]], ...] = (
+    ("DESCRIP", "descripcion"),
+    ("DETALLE", "descripcion"),
+    ("PRODUCTO", "descripcion"),
+    ("CONCEPTO", "descripcion"),
+    ("CANT", "cantidad"),
+    ("PUNIT", "precio_unit"),
+    ("PRECIOUNIT", "precio_unit"),
+    ("VUNIT", "precio_unit"),
+    ("VALORUNIT", "precio_unit"),
+    ("PRECIO", "precio_unit"),
+    ("IGV", "igv"),
+    ("IMPORTE", "total"),
+    ("VALORVENTA", "total"),
+    ("SUBTOTAL", "total"),
+    ("TOTAL", "total"),
+    ("CODIGO", None),
+    ("COD", None),
+    ("UNIDAD", None),
+    ("UM", None),
+    ("ITEM", None),
+    ("NRO", None),
+    ("N", None),
+)
+
+# celdas: secuencias de palabras separadas por un solo espacio
+_CELL_RE = re.compile(r"\S+(?: \S+)*")
+_NUM_CELL_RE = re.compile(r"^[S$/.\s]*-?\d[\d.,]*$")
+_STOP_RE = re.compile(
+    r"^\s*(SUB\s*TOTAL|OP\.?\s*GRAVADA|OP\.?\s*EXONERADA|OP\.?\s*INAFECTA|I\.?G\.?V\.?\s|"
+    r"TOTAL|IMPORTE\s+TOTAL|SON\s*:|DESCUENTO|VALOR\s+DE\s+VENTA)",
+    re.I,
+)
+# sin cabecera: cant  descripción  p.unit  total
+_BARE_ROW_RE = re.compile(r"^\s*(\d+(?:[.,]\d+)?)\s+(.*?[A-Za-zÁÉÍÓÚÑáéíóúñ].*?)\s{2,}([\d.,]+)\s+([\d.,]+)\s*$")
+
+
+def _norm(label: str) -> str:
+    t = unicodedata.normalize("NFKD", label)
+    return "".join(ch for ch in t if ch.isalnum()).upper()
+
+
+def _header_field(label: str) -> Optional[str]:
+    n = _norm(label)
+    for key, field in _HEADER_MAP:
+        # rótulos cortos (N°, U.M.) solo por igualdad; el resto por prefijo o contenido
+        if n == key or (len(key) > 2 and (n.startswith(key) or (len(key) > 3 and key in n))):
+            return field
+    return None
+
+
+def _find_header(lines: List[str]) -> Optional[Tuple[int, List[Tuple[float, Optional[str]]]]]:
+    """Índice de la línea de cabecera y sus columnas (centro en caracteres, campo)."""
+    for i, line in enumerate(lines):
+        up = line.upper()
+        if "DESCRIP" not in up and "DETALLE" not in up and "PRODUCTO" not in up and "CONCEPTO" not in up:
+            continue
+        # columnas no reconocidas (código, lote...) se ignoran pero cuentan como columna
+        cols = [((m.start() + m.end()) / 2, _header_field(m.group(0))) for m in _CELL_RE.finditer(line)]
+        fields = {f for _, f in cols}
+        if "descripcion" in fields and fields & {"cantidad", "precio_unit", "total"}:
+            return i, cols
+    return None
+
+
+def _item(cells: Dict[str, List[str]]) -> Dict[str, Any]:
+    item: Dict[str, Any] = {"descripcion": " ".join(cells.get("descripcion", [])) or None}
+    for f in _NUMERIC:
+        val = to_decimal(cells[f][-1]) if cells.get(f) else None
+        item[f] = str(val) if val is not None else None
+    return item
+
+
+def _items_with_header(lines: List[str], header: int, cols: List[Tuple[float, Optional[str]]]) -> List[Dict[str, Any]]:
+    centers = np.array([c for c, _ in cols])
+    fields = [f for _, f in cols]
+    # límites entre columnas: punto medio entre centros vecinos
+    bounds = (centers[1:] + centers[:-1]) / 2
+    items: List[Dict[str, Any]] = []
+    blank = 0
+    for line in lines[header + 1:]:
+        if not line.strip():
+            blank += 1
+            if blank > 2 and items:
+                break
+            continue
+        blank = 0
+        if _STOP_RE.match(line):
+            break
+        matches = list(_CELL_RE.finditer(line))
+        mids = np.array([(m.start() + m.end()) / 2 for m in matches])
+        idx = np.searchsorted(bounds, mids)
+        cells: Dict[str, List[str]] = {}
+        for m, j in zip(matches, idx.tolist()):
+            field = fields[j]
+            val = m.group(0)
+            if field in _NUMERIC and not _NUM_CELL_RE.match(val):
+                field = "descripcion"  # texto corrido bajo una columna numérica
+            if field:
+                cells.setdefault(field, []).append(val)
+        has_amount = any(cells.get(f) for f in ("total", "precio_unit"))
+        if not has_amount:
+            # descripción en varias líneas: se pega al ítem anterior
+            if items and cells.get("descripcion"):
+                prev = items[-1]
+                prev["descripcion"] = " ".join(filter(None, [prev["descripcion"], *cells["descripcion"]]))
+            continue
+        items.append(_item(cells))
+    return items
+
+
+def _items_bare(lines: List[str]) -> List[Dict[str, Any]]:
+    items = []
+    for line in lines:
+        m = _BARE_ROW_RE.match(line)
+        if not m:
+            continue
+        cant, punit, total = (to_decimal(m.group(k)) for k in (1, 3, 4))
+        if cant is None or punit is None or total is None:
+            continue
+        # sin cabecera solo se acepta si los números cuadran (evita falsos positivos)
+        if abs(cant * punit - total) > max(Decimal("0.02"), total * Decimal("0.01")):
+            continue
+        items.append({"descripcion": m.group(2).strip(), "cantidad": str(cant),
+                      "precio_unit": str(punit), "igv": None, "total": str(total)})
+    return items
+
+
+def extract_items(text: str) -> List[Dict[str, Any]]:
+    """Ítems {descripcion, cantidad, precio_unit, igv, total} (montos como str) del texto con layout."""
+    lines = text.splitlines()
+    found = _find_header(lines)
+    if found:
+        items = _items_with_header(lines, *found)
+        if items:
+            return items
+    return _items_bare(lines)
@@ -1,294 +1,352 @@
 # app/ocr_local.py
-import os, re
-from datetime import datetime
-from decimal import Decimal, InvalidOperation
-from typing import List, Dict, Any, Optional, Tuple
-from pdf2image import convert_from_path
+import os
+import logging
+import multiprocessing
+import subprocess
+import tempfile
+import threading
+from collections import deque
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from decimal import Decimal
+from typing import IO, Callable, List, Dict, Any, Optional, Tuple, Iterable, Iterator, Union, Deque
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
-import pytesseract
-from fastapi import HTTPException
+
+from .config import settings
+from .field_extract import PARSER_VERSION, FieldScanner, to_decimal, parse_date_any, valid_ruc  # noqa: F401
+from .ocr_preprocess import preprocess
+from .ocr_roi import roi_text
+from .ocr_backends import get_backend
+from .ocr_items import extract_items, layout_text
+from .excel_stream import parse_excel_first
+from . import metrics
+
+log = logging.getLogger(__name__)
 
 # ------------ Utilidades de normalización ------------
+# (viven en field_extract; se re-exportan con los nombres de siempre)
 
-DEC_SEP_RE = re.compile(r"[.,]")
+_to_decimal = to_decimal
+_parse_date_any = parse_date_any
+_valid_ruc = valid_ruc
 
-def _to_decimal(txt: Optional[str]) -> Optional[Decimal]:
-    if not txt:
-        return None
-    # normaliza separadores decimales: acepta "1.234,56" o "1,234.56" o "1234.56"
-    t = txt.strip()
-    # elimina espacios y monedas sueltas
-    t = re.sub(r"[^\d,.\-]", "", t)
-    # si hay ambos ',' y '.' decide por el separador final como decimal
-    if "," in t and "." in t:
-        # asume formato LATAM: miles='.' decimal=','
-        t = t.replace(".", "").replace(",", ".")
-    else:
-        # si solo hay ',', úsalo como decimal
-        if "," in t and "." not in t:
-            t = t.replace(",", ".")
+# ------------ OCR helpers ------------
+
+def _iter_pdf_pages(pdf_path: str, output_folder: str, window: Optional[int] = None,
+                    pages: Optional[List[int]] = None) -> Iterator[str]:
+    """
+    Rasteriza el PDF de a 'window' páginas (first_page/last_page) y devuelve las rutas
+    de las imágenes en orden. Nunca hay más de una ventana de bitmaps renderizados a la vez,
+    y si el consumidor corta antes (early stop) las páginas restantes ni se rasterizan.
+    'pages' (1-based) limita el render a esas páginas; por defecto, todas.
+    """
+    window = max(1, window or settings.OCR_RASTER_WINDOW)
+    if pages is None:
+        pages = list(range(1, int(pdfinfo_from_path(pdf_path)["Pages"]) + 1))
+    i = 0
+    while i < len(pages):
+        # ventana de páginas consecutivas
+        first = last = pages[i]
+        i += 1
+        while i < len(pages) and pages[i] == last + 1 and last - first + 1 < window:
+            last = pages[i]
+            i += 1
+        with metrics.stage("rasterize"):
+            paths = convert_from_path(
+                pdf_path, dpi=300, first_page=first, last_page=last,
+                output_folder=output_folder, paths_only=True, fmt="ppm",
+            )
+        yield from paths
+
+# ------------ Capa de texto embebida (PDF digitales) ------------
+
+_PDFTEXT_OK_CHARS = set(".,:;-/$%()°#*+&@'\"_")
+
+def _pdf_text_layer(pdf_path: str) -> Optional[List[str]]:
+    """
+    Texto embebido por página vía `pdftotext` (poppler, ya requerido por pdf2image).
+    Devuelve None si no hay pdftotext o el PDF no se puede leer.
+    """
     try:
-        return Decimal(t)
-    except InvalidOperation:
+        proc = subprocess.run(
+            ["pdftotext", "-layout", "-enc", "UTF-8", pdf_path, "-"],
+            capture_output=True, timeout=30, check=True,
+        )
+    except (OSError, subprocess.SubprocessError):
         return None
+    pages = proc.stdout.decode("utf-8", errors="replace").split("\f")
+    if pages and not pages[-1].strip():
+        pages.pop()  # pdftotext termina cada página con \f
+    return pages or None
+
+def _text_layer_ok(page_text: str) -> bool:
+    """Heurística: la capa de texto sirve si tiene suficiente texto y casi nada de basura."""
+    t = page_text.strip()
+    if len(t) < settings.OCR_PDFTEXT_MIN_CHARS:
+        return False
+    good = sum(ch.isalnum() or ch.isspace() or ch in _PDFTEXT_OK_CHARS for ch in t)
+    if good / len(t) < 0.9:
+        return False
+    # fuentes sin ToUnicode suelen salir como U+FFFD o "(cid:123)"
+    if t.count("\ufffd") > 2 or "(cid:" in t:
+        return False
+    return any(ch.isalpha() for ch in t) and any(ch.isdigit() for ch in t)
 
-def _parse_date_any(s: str) -> Optional[str]:
-    s = s.strip()
-    # formatos más comunes: 31/12/2024, 2024-12-31, 31-12-2024, 31.12.2024
-    fmts = ["%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d.%m.%Y", "%d %m %Y"]
-    for f in fmts:
+def _text_from_image(img: Image.Image) -> str:
+    # los pasos (OCR_PREPROCESS) pueden escalar la imagen: se le pasa a Tesseract el DPI efectivo
+    img, timings, dpi = preprocess(img)
+    log.debug("ocr.preprocess %s dpi=%s", {k: round(v * 1000, 1) for k, v in timings.items()}, dpi)
+    backend = get_backend()  # OCR_BACKEND: motores tesserocr persistentes o pytesseract
+    if settings.OCR_MODE == "roi":
+        # solo las zonas con anclas (RUC, TOTAL, FECHA...); None -> página completa
+        txt = roi_text(img, lambda region: backend.image_to_string(region, psm=6, dpi=dpi))
+        if txt is not None:
+            return txt
+    if settings.OCR_EXTRACT_ITEMS:
+        # un solo pase con cajas de palabras: texto con columnas para la tabla de ítems
+        return layout_text(backend.image_to_data(img, dpi=dpi))
+    return backend.image_to_string(img, dpi=dpi)
+
+def _text_from_page(page: Union[str, Image.Image]) -> str:
+    """OCR de una página; si viene como ruta, abre la imagen, la libera y borra el archivo."""
+    if isinstance(page, Image.Image):
+        return _text_from_image(page)
+    try:
+        with Image.open(page) as im:
+            return _text_from_image(im)
+    finally:
         try:
-            dt = datetime.strptime(s, f).date()
-            return dt.isoformat()
-        except Exception:
+            os.remove(page)
+        except OSError:
             pass
-    return None
 
-# Validador simple de RUC peruano (módulo 11)
-def _valid_ruc(ruc: str) -> bool:
-    if not re.fullmatch(r"\d{11}", ruc):
-        return False
-    fac = [5,4,3,2,7,6,5,4,3,2]  # pesos para los 10 primeros
-    s = sum(int(d)*w for d, w in zip(ruc[:10], fac))
-    r = 11 - (s % 11)
-    dv = 0 if r == 11 else (1 if r == 10 else r)
-    return dv == int(ruc[-1])
-
-# ------------ OCR helpers ------------
-
-def _images_from_pdf(pdf_path: str) -> List[Image.Image]:
-    return convert_from_path(pdf_path, dpi=300)
-
-def _text_from_image(img: Image.Image) -> str:
-    return pytesseract.image_to_string(img, lang="spa+eng")
+def _ocr_page_timed(page: Union[str, Image.Image]) -> Tuple[str, float]:
+    """(texto, segundos) de una página; el tiempo lo registra el proceso que pidió el OCR."""
+    t0 = time.perf_counter()
+    txt = _text_from_page(page)
+    return txt, time.perf_counter() - t0
+
+def _collect(out: List[str], timed: Tuple[str, float]) -> None:
+    out.append(timed[0])
+    metrics.observe("ocr_page", timed[1])
+    metrics.add_pages(1, source="ocr")
+
+# pool de procesos para OCR por página (uno por proceso; se recrea tras un fork).
+# Se pide desde threads (run_in_threadpool, lotes): hacer fork de un proceso con threads
+# puede dejar locks tomados en el hijo, así que los workers salen de un forkserver
+# (proceso limpio, sin threads) y la creación va con lock para no abrir dos pools.
+_page_pool: Optional[ProcessPoolExecutor] = None
+_page_pool_pid: Optional[int] = None
+_page_pool_lock = threading.Lock()
+
+def _get_page_pool() -> Optional[ProcessPoolExecutor]:
+    global _page_pool, _page_pool_pid
+    if settings.OCR_PAGE_WORKERS <= 1:
+        return None
+    pool = _page_pool
+    if pool is not None and _page_pool_pid == os.getpid():
+        return pool
+    with _page_pool_lock:
+        if _page_pool is None or _page_pool_pid != os.getpid():
+            _page_pool = ProcessPoolExecutor(
+                max_workers=settings.OCR_PAGE_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+            _page_pool_pid = os.getpid()
+        return _page_pool
+
+def _ocr_pages(pages: Iterable[Union[str, Image.Image]], kind: Optional[str] = None,
+               early_stop: Optional[bool] = None,
+               doc_prefix: Optional[Callable[[List[str]], str]] = None) -> List[str]:
+    """
+    OCR de varias páginas en paralelo; devuelve los textos en el orden de las páginas.
+    'pages' puede ser un generador: solo se piden tantas páginas como workers haya
+    libres, así la memoria no crece con el número de páginas.
+    Con early_stop, deja de pedir páginas en cuanto el texto acumulado (en orden)
+    ya contiene todos los campos que necesita el parser. Si las páginas OCR no son todo
+    el documento, 'doc_prefix' arma con lo OCR-eado hasta ahora el texto del documento
+    en orden hasta la primera página que falta: solo ese prefijo cuenta para cortar.
+    """
+    if early_stop is None:
+        early_stop = settings.OCR_EARLY_STOP
+    # los ítems pueden seguir en las páginas siguientes: sin early stop si se extraen
+    early_stop = early_stop and not settings.OCR_EXTRACT_ITEMS
+    text_so_far = doc_prefix or "\n".join
+    pool = _get_page_pool()
+    out: List[str] = []
+
+    if pool is None:
+        for pg in pages:
+            _collect(out, _ocr_page_timed(pg))
+            if early_stop and _required_fields_found(text_so_far(out), kind):
+                break
+        return out
+
+    it = iter(pages)
+    inflight: Deque[Future] = deque()
+    exhausted = False
+    while True:
+        while not exhausted and len(inflight) < settings.OCR_PAGE_WORKERS:
+            try:
+                inflight.append(pool.submit(_ocr_page_timed, next(it)))
+            except StopIteration:
+                exhausted = True
+        if not inflight:
+            break
+        _collect(out, inflight.popleft().result())
+        more = bool(inflight) or not exhausted
+        if early_stop and more and _required_fields_found(text_so_far(out), kind):
+            for pending in inflight:
+                pending.cancel()
+            break
+    return out
 
 # ------------ Extractores de campos ------------
+# Envoltorios sobre FieldScanner (regex precompiladas, un escaneo por regla).
+# Para varios campos del mismo texto, usar un solo FieldScanner.
 
 def _extract_ruc(text: str) -> Optional[str]:
-    # 1) preferente: “RUC ... 11 dígitos”
-    m = re.search(r"(?:\bRUC\b|R\.?U\.?C\.?)\D*?(\d{11})", text, re.IGNORECASE)
-    if m and _valid_ruc(m.group(1)):
-        return m.group(1)
-    # 2) fallback: cualquier 11 dígitos que pase checksum
-    for m in re.finditer(r"\b(\d{11})\b", text):
-        if _valid_ruc(m.group(1)):
-            return m.group(1)
-    return None
+    return FieldScanner(text).ruc()
 
 def _extract_currency(text: str) -> Optional[str]:
-    # prioridad por tokens inequívocos
-    if re.search(r"\bUSD\b|\bUS?\$\b|\bDOLARES?\b", text, re.IGNORECASE):
-        return "USD"
-    if re.search(r"\bPEN\b|\bSOLES?\b|\bS\/\.?", text, re.IGNORECASE):
-        return "PEN"
-
-    # heurística: si aparece "S/" muchas veces -> PEN; si "$" sin "US" cerca -> USD
-    s_count = len(re.findall(r"S\/", text))
-    dollar_count = len(re.findall(r"(?<!US)\$", text))  # ojo: \$ para el símbolo
-    if s_count > 0 and dollar_count == 0:
-        return "PEN"
-    if dollar_count > 0:
-        return "USD"
-    return None
+    return FieldScanner(text).currency()
+
+def _extract_total_labeled(text: str) -> Optional[Decimal]:
+    return FieldScanner(text).total_labeled()
 
 def _extract_total(text: str) -> Optional[Decimal]:
-    # buscar “IMPORTE TOTAL”, “TOTAL”, “TOTAL A PAGAR”
-    pats = [
-        r"IMPORTE\s+TOTAL[:\s]*([S\$]*\s*[\d\.\,]+)",
-        r"TOTAL\s*A\s*PAGAR[:\s]*([S\$]*\s*[\d\.\,]+)",
-        r"\bTOTAL\b[:\s]*([S\$]*\s*[\d\.\,]+)"
-    ]
-    for p in pats:
-        m = re.search(p, text, re.IGNORECASE)
-        if m:
-            v = re.sub(r"[S$ ]", "", m.group(1))
-            d = _to_decimal(v)
-            if d is not None:
-                return d
-    # fallback: toma la mayor cifra tipo dinero que aparezca
-    candidates = [c for c in re.findall(r"([0-9]{1,3}(?:[.,][0-9]{3})*(?:[.,][0-9]{2}))", text)]
-    best = None
-    for c in candidates:
-        d = _to_decimal(c)
-        if d is not None and (best is None or d > best):
-            best = d
-    return best
+    return FieldScanner(text).total()
 
 def _extract_date(text: str) -> Optional[str]:
-    # vecinos de “FECHA EMISIÓN” / “F. EMISIÓN”
-    pats = [
-        r"FECHA\s*(?:DE\s*)?EMISI[ÓO]N[:\s]*([0-9./-]{8,10})",
-        r"F\.?\s*EMISI[ÓO]N[:\s]*([0-9./-]{8,10})",
-        r"\bEMISI[ÓO]N[:\s]*([0-9./-]{8,10})",
-        r"\bFECHA[:\s]*([0-9./-]{8,10})"
-    ]
-    for p in pats:
-        m = re.search(p, text, re.IGNORECASE)
-        if m:
-            d = _parse_date_any(m.group(1))
-            if d:
-                return d
-    # fallback: primera fecha con formato común
-    for m in re.finditer(r"(\d{2}[./-]\d{2}[./-]\d{4}|\d{4}-\d{2}-\d{2})", text):
-        d = _parse_date_any(m.group(1))
-        if d:
-            return d
-    return None
+    return FieldScanner(text).date()
 
 def _extract_invoice_number(text: str) -> Optional[str]:
-    # 1) Formatos con serie-tipo típicos: F001-123456, B001-654321, 001-123456
-    m = re.search(r"\b([FB]\d{3}-\d{1,12})\b", text, re.IGNORECASE)
-    if m:
-        return m.group(1).upper()
-    m = re.search(r"\b(\d{3}-\d{1,12})\b", text)
-    if m:
-        return m.group(1)
-    # 2) Número solo dígitos cerca de “FACTURA/BOLETA/N°/No/#”
-    ctx = re.search(r"(FACTURA|BOLETA|N[°o]|#)\s*[:\-]?\s*(\d{6,12})", text, re.IGNORECASE)
-    if ctx:
-        return ctx.group(2)
-    # 3) otra heurística: tras serie tipo F001 o B001 en ±30 chars
-    m = re.search(r"\b([FB]\d{3})\b.{0,30}\b(\d{6,12})\b", text, re.IGNORECASE | re.DOTALL)
-    if m:
-        return f"{m.group(1).upper()}-{m.group(2)}"
-    return None
-
-# ------------ Interfaz pública ------------
-
-def analyze_file_local(local_path: str) -> Dict[str, Any]:
-    pages_text: List[str] = []
-    if local_path.lower().endswith(".pdf"):
-        for im in _images_from_pdf(local_path):
-            pages_text.append(_text_from_image(im))
-    else:
-        pages_text.append(_text_from_image(Image.open(local_path)))
-
-    full_text = "\n".join(pages_text)
-
-    ruc = _extract_ruc(full_text)
-    moneda = _extract_currency(full_text)
-    total = _extract_total(full_text)
-    fecha = _extract_date(full_text)
-    numero = _extract_invoice_number(full_text)
+    return FieldScanner(text).number()
 
+def _build_result(sc: FieldScanner, kind: Optional[str]) -> Dict[str, Any]:
+    f = sc.fields(kind)
     parsed = {
-        "provider": {  # mantenemos nodo por compatibilidad, pero sin razón social
-            "ruc": ruc
-        },
+        "provider": {"ruc": f["ruc"]},  # mantenemos nodo por compatibilidad, pero sin razón social
         "invoice": {
-            "numero": numero,
-            "fecha": fecha,
-            "moneda": moneda,
-            "total": str(total) if total is not None else None
+            "numero": f["numero"],
+            "fecha": f["fecha"],
+            "moneda": f["moneda"],
+            "total": str(f["total"]) if f["total"] is not None else None
         },
-        "items": []  # sin extracción de ítems por ahora
+        "items": extract_items(sc.text) if settings.OCR_EXTRACT_ITEMS else [],
     }
-
     # proxy de “confianza” simple
-    signals = sum(x is not None for x in [ruc, moneda, total, fecha, numero])
+    signals = sum(x is not None for x in f.values())
     confidence = 0.3 + 0.14 * signals  # 0.3..1.0 aprox
+    return {"engine": "local-tesseract", "confidence": float(min(confidence, 0.99)), "parsed": parsed}
 
-    return {
-        "engine": "local-tesseract",
-        "confidence": float(min(confidence, 0.99)),
-        "raw_text": full_text[:20000],
-        "parsed": parsed
-    }
+# ------------ Interfaz pública ------------
+
+def analyze_file_local(local_path: str) -> Dict[str, Any]:
+    full_text, engine = extract_text_with_engine(local_path)
+    result = _build_result(FieldScanner(full_text), None)
+    result["engine"] = engine
+    result["raw_text"] = full_text[:20000]
+    return result
 
 # ====== añadir: helpers de OCR de archivo ======
-def extract_text(local_path: str) -> str:
-    """Devuelve texto OCR para PDF o imagen."""
-    buf = []
-    if local_path.lower().endswith(".pdf"):
-        for im in _images_from_pdf(local_path):
-            buf.append(_text_from_image(im))
-    else:
-        buf.append(_text_from_image(Image.open(local_path)))
-    return "\n".join(buf)
+def _is_pdf(path: str) -> bool:
+    """Por extensión o, si no la tiene (p. ej. descargas en memoria), por la cabecera."""
+    if path.lower().endswith(".pdf"):
+        return True
+    try:
+        with open(path, "rb") as fh:
+            return fh.read(5) == b"%PDF-"
+    except OSError:
+        return False
+
+ENGINE_PDFTEXT = "local-pdftext"
+ENGINE_TESSERACT = "local-tesseract"
+ENGINE_MIXED = "local-pdftext+tesseract"
+
+def extract_text_with_engine(local_path: str, kind: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Devuelve (texto, engine) para PDF o imagen.
+    En PDFs usa la capa de texto embebida de cada página cuando es utilizable y solo
+    rasteriza + OCR-ea las páginas que no la tienen. Las páginas OCR se procesan en
+    paralelo; 'kind' (boleta/factura) indica qué campos bastan para cortar antes.
+    El engine indica qué camino corrió: local-pdftext, local-tesseract o ambos.
+    """
+    if not _is_pdf(local_path):
+        with Image.open(local_path) as im, metrics.stage("ocr_page"):
+            txt = _text_from_image(im)
+        metrics.add_pages(1, source="ocr")
+        return txt, ENGINE_TESSERACT
+
+    layer = None
+    if settings.OCR_PDFTEXT:
+        with metrics.stage("pdftext"):
+            layer = _pdf_text_layer(local_path)
+    if layer is None:
+        with tempfile.TemporaryDirectory(prefix="ocr_pages_") as tmp:
+            return "\n".join(_ocr_pages(_iter_pdf_pages(local_path, tmp), kind)), ENGINE_TESSERACT
+
+    texts: List[str] = [t if _text_layer_ok(t) else "" for t in layer]
+    missing = [i + 1 for i, t in enumerate(texts) if not t]
+    metrics.add_pages(len(texts) - len(missing), source="pdftext")
+    if not missing:
+        return "\n".join(texts), ENGINE_PDFTEXT
+
+    def doc_prefix(ocr_done: List[str]) -> str:
+        # páginas en orden de documento hasta la primera que todavía no tiene texto:
+        # una página con capa de texto después de una escaneada pendiente no cuenta,
+        # la escaneada podría traer antes el RUC, el número o el total
+        done = dict(zip(missing, ocr_done))
+        prefix = []
+        for page_no, t in enumerate(texts, start=1):
+            t = t or done.get(page_no)
+            if t is None:
+                break
+            prefix.append(t)
+        return "\n".join(prefix)
+
+    with tempfile.TemporaryDirectory(prefix="ocr_pages_") as tmp:
+        ocr = _ocr_pages(_iter_pdf_pages(local_path, tmp, pages=missing), kind, doc_prefix=doc_prefix)
+    for page_no, page_text in zip(missing, ocr):  # con early stop puede haber menos
+        texts[page_no - 1] = page_text
+    engine = ENGINE_TESSERACT if len(missing) == len(texts) else ENGINE_MIXED
+    return "\n".join(texts), engine
+
+def extract_text(local_path: str, kind: Optional[str] = None) -> str:
+    """Devuelve texto (capa embebida u OCR) para PDF o imagen."""
+    return extract_text_with_engine(local_path, kind)[0]
 
 # ====== añadir: autodetección simple del tipo ======
 def autodetect_kind(text: str) -> Optional[str]:
-    if re.search(r"\bBOLETA\b", text, re.IGNORECASE):
-        return "boleta"
-    if re.search(r"\bFACTURA\b", text, re.IGNORECASE):
-        return "factura"
-    # por defecto None (el router asumirá factura)
-    return None
+    return FieldScanner(text).kind()
+
+def _required_fields_found(text: str, kind: Optional[str] = None) -> bool:
+    """
+    True si las páginas que faltan ya no pueden cambiar el resultado: no basta con que
+    cada campo tenga algún valor (un TOTAL suelto en la página 1 pierde contra un IMPORTE
+    TOTAL en la 2), tiene que venir de la regla de mayor prioridad (FieldScanner.settled).
+    """
+    return FieldScanner(text).settled(kind.lower() if kind else None)
 
 # ====== añadir: número específico por tipo ======
 def _extract_invoice_number_boleta(text: str) -> Optional[str]:
-    # EB01-419, B001-123456, etc.
-    m = re.search(r"\b([A-Z]{1}[A-Z0-9]{2}\d{2}-\d{1,12})\b", text, re.IGNORECASE)
-    if m:
-        return m.group(1).upper()
-    m = re.search(r"\b(B\d{3}-\d{1,12})\b", text, re.IGNORECASE)
-    if m:
-        return m.group(1).upper()
-    # contexto N°, No, # + dígitos
-    ctx = re.search(r"(BOLETA|N[°o]|#)\s*[:\-]?\s*(\d{6,12})", text, re.IGNORECASE)
-    if ctx:
-        return ctx.group(2)
-    return None
+    return FieldScanner(text).number("boleta")
 
 def _extract_invoice_number_factura(text: str) -> Optional[str]:
-    m = re.search(r"\b(F\d{3}-\d{1,12})\b", text, re.IGNORECASE)
-    if m:
-        return m.group(1).upper()
-    ctx = re.search(r"(FACTURA|N[°o]|#)\s*[:\-]?\s*(\d{6,12})", text, re.IGNORECASE)
-    if ctx:
-        return ctx.group(2)
-    return None
+    return FieldScanner(text).number("factura")
 
 # ====== añadir: parseadores por tipo ======
-def parse_boleta_local(text: str) -> Dict[str, Any]:
-    ruc = _extract_ruc(text)
-    moneda = _extract_currency(text)
-    total = _extract_total(text)
-    fecha = _extract_date(text)
-    numero = _extract_invoice_number_boleta(text)
-
-    parsed = {
-        "provider": {"ruc": ruc},
-        "invoice": {
-            "numero": numero,
-            "fecha": fecha,
-            "moneda": moneda,
-            "total": str(total) if total is not None else None
-        },
-        "items": []
-    }
-    signals = sum(x is not None for x in [ruc, moneda, total, fecha, numero])
-    confidence = 0.3 + 0.14 * signals
-    return {"engine": "local-tesseract", "confidence": float(min(confidence, 0.99)), "parsed": parsed}
-
-def parse_factura_local(text: str) -> Dict[str, Any]:
-    ruc = _extract_ruc(text)
-    moneda = _extract_currency(text)
-    total = _extract_total(text)
-    fecha = _extract_date(text)
-    numero = _extract_invoice_number_factura(text)
+def parse_boleta_local(text: str, scanner: Optional[FieldScanner] = None) -> Dict[str, Any]:
+    return _build_result(scanner or FieldScanner(text), "boleta")
 
-    parsed = {
-        "provider": {"ruc": ruc},
-        "invoice": {
-            "numero": numero,
-            "fecha": fecha,
-            "moneda": moneda,
-            "total": str(total) if total is not None else None
-        },
-        "items": []
-    }
-    signals = sum(x is not None for x in [ruc, moneda, total, fecha, numero])
-    confidence = 0.3 + 0.14 * signals
-    return {"engine": "local-tesseract", "confidence": float(min(confidence, 0.99)), "parsed": parsed}
+def parse_factura_local(text: str, scanner: Optional[FieldScanner] = None) -> Dict[str, Any]:
+    return _build_result(scanner or FieldScanner(text), "factura")
 
 
-def parse_excel_local(path: str) -> Dict[str, Any]:
+def parse_excel_local(path: Union[str, IO[bytes]]) -> Dict[str, Any]:
     """
-    Stub de parseo de Excel en local.
-    Por ahora no implementado: simplemente avisa con 501 para que el servicio no reviente al importar.
+    Primera invoice de un Excel (engine local-excel). Para archivos con muchas filas
+    (registros de compras) el pipeline usa excel_stream.iter_excel_invoices.
     """
-    raise HTTPException(
-        status_code=501,
-        detail="parse_excel_local no está implementado en este servicio (Excel no soportado aún).",
-    )
+    return parse_excel_first(path)
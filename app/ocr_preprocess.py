@@ -0,0 +1,171 @@
+# app/ocr_preprocess.py
+"""
+Preprocesamiento de páginas antes de Tesseract (PIL + NumPy).
+
+El tiempo de Tesseract crece con la cantidad de píxeles y con el ruido, así que se
+puede ganar bastante entregándole una imagen en gris, binarizada, derecha, recortada
+al contenido y escalada para que los glifos queden del alto que mejor reconoce.
+
+Pasos (se eligen y ordenan con OCR_PREPROCESS, separados por coma):
+    gray      -> escala de grises (8 bits)
+    binarize  -> umbral de Otsu
+    deskew    -> corrige la inclinación (perfil de proyección horizontal)
+    crop      -> recorta al bounding box del contenido (+ margen)
+    rescale   -> escala según el alto de glifo detectado (OCR_TARGET_GLYPH_PX)
+
+Por defecto no hay pasos (la imagen va tal cual). bench.preprocess mide el tiempo por
+configuración; antes de activar una en producción, comparar los aciertos por campo con
+bench.suite sobre el corpus (OCR_PREPROCESS=... python -m bench.suite ... --baseline).
+
+preprocess() devuelve la imagen, el tiempo de cada paso y el DPI efectivo.
+"""
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .config import settings
+
+STEPS = ("gray", "binarize", "deskew", "crop", "rescale")
+
+
+def parse_steps(spec: Optional[str]) -> List[str]:
+    steps = [s.strip().lower() for s in (spec or "").split(",") if s.strip()]
+    unknown = [s for s in steps if s not in STEPS]
+    if unknown:
+        raise ValueError(f"pasos de preprocesamiento desconocidos: {unknown} (válidos: {list(STEPS)})")
+    return steps
+
+
+def _gray(img: Image.Image) -> Image.Image:
+    return img if img.mode == "L" else img.convert("L")
+
+
+def _otsu_threshold(arr: np.ndarray) -> int:
+    hist = np.bincount(arr.ravel(), minlength=256).astype(np.float64)
+    total = arr.size
+    cum_w = np.cumsum(hist)
+    cum_mu = np.cumsum(hist * np.arange(256))
+    mu_t = cum_mu[-1]
+    w0 = cum_w
+    w1 = total - cum_w
+    valid = (w0 > 0) & (w1 > 0)
+    between = np.zeros(256)
+    between[valid] = (mu_t * w0[valid] - total * cum_mu[valid]) ** 2 / (w0[valid] * w1[valid])
+    return int(np.argmax(between))
+
+
+def _binarize(img: Image.Image) -> Image.Image:
+    g = _gray(img)
+    t = _otsu_threshold(np.asarray(g))
+    return g.point(lambda v: 255 if v > t else 0)
+
+
+def _ink_mask(img: Image.Image, max_side: int = 0) -> np.ndarray:
+    """Máscara booleana de 'tinta' (píxeles oscuros), opcionalmente sobre una miniatura."""
+    g = _gray(img)
+    if max_side and max(g.size) > max_side:
+        g = g.copy()
+        g.thumbnail((max_side, max_side))
+    arr = np.asarray(g)
+    return arr <= min(_otsu_threshold(arr), 200)
+
+
+def _skew_angle(img: Image.Image, max_angle: float = 5.0, step: float = 0.5) -> float:
+    """
+    Ángulo que maximiza la varianza del perfil horizontal (las líneas de texto quedan
+    'afiladas' cuando están derechas). Se estima sobre una miniatura para que sea barato.
+    """
+    mask = _ink_mask(img, max_side=1000)
+    ys, xs = np.nonzero(mask)
+    if ys.size < 50:
+        return 0.0
+    if ys.size > 50_000:  # con una muestra alcanza para el perfil
+        k = ys.size // 50_000 + 1
+        ys, xs = ys[::k], xs[::k]
+    xs = xs - xs.mean()
+    best, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + step / 2, step):
+        # proyección de cada píxel de tinta sobre el eje vertical rotado
+        rows = np.round(ys + xs * np.tan(np.deg2rad(angle))).astype(np.int64)
+        rows -= rows.min()
+        score = np.bincount(rows).astype(np.float64).var()
+        if score > best_score:
+            best, best_score = float(angle), score
+    return best
+
+
+def _deskew(img: Image.Image) -> Image.Image:
+    angle = _skew_angle(img)
+    if abs(angle) < 0.25:
+        return img
+    fill = 255 if img.mode in ("L", "1") else (255, 255, 255)
+    return img.rotate(-angle, resample=Image.BICUBIC, expand=True, fillcolor=fill)
+
+
+def _crop(img: Image.Image, margin: int = 20) -> Image.Image:
+    g = _gray(img)
+    t = min(_otsu_threshold(np.asarray(g)), 200)
+    bbox = g.point(lambda v: 255 if v <= t else 0).getbbox()
+    if not bbox:
+        return img
+    x0, y0, x1, y1 = bbox
+    w, h = img.size
+    return img.crop((max(0, x0 - margin), max(0, y0 - margin), min(w, x1 + margin), min(h, y1 + margin)))
+
+
+def glyph_height(img: Image.Image) -> Optional[float]:
+    """
+    Alto típico de línea de texto en píxeles: mediana de las corridas de filas con tinta
+    en el perfil horizontal. None si no hay texto reconocible.
+    """
+    mask = _ink_mask(img)
+    prof = mask.sum(axis=1)
+    if not prof.any():
+        return None
+    on = prof > max(1, 0.01 * mask.shape[1])
+    # bordes de las corridas de filas "con tinta"
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], on.astype(np.int8), [0]))))
+    runs = edges[1::2] - edges[0::2]
+    runs = runs[runs >= 4]  # descarta líneas de tabla y ruido
+    if runs.size == 0:
+        return None
+    return float(np.median(runs))
+
+
+def _rescale(img: Image.Image, dpi: int) -> Tuple[Image.Image, int]:
+    h = glyph_height(img)
+    if not h:
+        return img, dpi
+    scale = float(np.clip(settings.OCR_TARGET_GLYPH_PX / h, 0.5, 2.0))
+    if abs(scale - 1.0) < 0.15:
+        return img, dpi
+    w0, h0 = img.size
+    resample = Image.LANCZOS if scale < 1 else Image.BICUBIC
+    return img.resize((max(1, int(w0 * scale)), max(1, int(h0 * scale))), resample), int(dpi * scale)
+
+
+def preprocess(img: Image.Image, steps: Optional[List[str]] = None,
+               dpi: int = 300) -> Tuple[Image.Image, Dict[str, float], int]:
+    """
+    Aplica los pasos en orden. Devuelve (imagen, {paso: segundos}, dpi efectivo).
+    Sin pasos devuelve la imagen tal cual.
+    """
+    if steps is None:
+        steps = parse_steps(settings.OCR_PREPROCESS)
+    timings: Dict[str, float] = {}
+    for step in steps:
+        t0 = time.perf_counter()
+        if step == "gray":
+            img = _gray(img)
+        elif step == "binarize":
+            img = _binarize(img)
+        elif step == "deskew":
+            img = _deskew(img)
+        elif step == "crop":
+            img = _crop(img)
+        elif step == "rescale":
+            img, dpi = _rescale(img, dpi)
+        timings[step] = time.perf_counter() - t0
+    return img, timings, dpi
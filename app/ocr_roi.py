@@ -0,0 +1,100 @@
+# app/ocr_roi.py
+"""
+OCR por regiones de interés (OCR_MODE=roi).
+
+Facturas y boletas peruanas tienen los campos en zonas previsibles (recuadro de
+RUC/serie arriba a la derecha, totales abajo a la derecha, fecha de emisión en la
+cabecera). En vez de OCR-ear la página entera a resolución completa:
+
+  1. pasada rápida a baja resolución con image_to_data (cajas de palabras),
+  2. se ubican anclas: RUC, TOTAL, IMPORTE, FECHA, EMISIÓN, FACTURA, BOLETA, SERIE...,
+  3. se re-OCR-ean solo esas franjas a resolución completa y se concatena el texto
+     de arriba hacia abajo, que luego pasa por los mismos extractores.
+
+Si no aparecen anclas, si las regiones cubren casi toda la página o si el texto de
+las regiones no trae suficientes campos, se devuelve None y el llamador hace OCR
+de la página completa.
+"""
+import unicodedata
+from typing import Callable, List, Optional, Tuple
+
+from PIL import Image
+
+from .config import settings
+from .ocr_backends import get_backend
+from .field_extract import FieldScanner
+
+ANCHORS = {"RUC", "TOTAL", "IMPORTE", "FECHA", "EMISION", "FACTURA", "BOLETA", "SERIE", "VENCIMIENTO", "MONEDA"}
+
+Box = Tuple[int, int, int, int]  # left, top, right, bottom
+
+
+def _norm(word: str) -> str:
+    w = unicodedata.normalize("NFKD", word)
+    return "".join(ch for ch in w if ch.isalnum()).upper()
+
+
+def find_anchor_boxes(probe: Image.Image) -> Tuple[List[Box], float]:
+    """Cajas de las palabras ancla en la imagen de prueba y alto mediano de palabra."""
+    data = get_backend().image_to_data(probe, psm=11)
+    boxes: List[Box] = []
+    heights: List[int] = []
+    for word, conf, l, t, w, h in zip(data["text"], data["conf"], data["left"], data["top"],
+                                      data["width"], data["height"]):
+        if float(conf) < 0 or not word.strip():
+            continue
+        heights.append(h)
+        if _norm(word) in ANCHORS:
+            boxes.append((l, t, l + w, t + h))
+    heights.sort()
+    return boxes, float(heights[len(heights) // 2]) if heights else 0.0
+
+
+def _expand(box: Box, line_h: float, page_w: int, page_h: int) -> Box:
+    # el valor suele estar a la derecha del rótulo o en las 1-2 líneas de abajo
+    l, t, r, b = box
+    return (
+        max(0, int(l - 2 * line_h)),
+        max(0, int(t - line_h)),
+        page_w,
+        min(page_h, int(b + 2.5 * line_h)),
+    )
+
+
+def merge_boxes(boxes: List[Box]) -> List[Box]:
+    """Une cajas que se solapan (para no OCR-ear dos veces la misma franja)."""
+    merged: List[Box] = []
+    for box in sorted(boxes, key=lambda b: (b[1], b[0])):
+        for i, m in enumerate(merged):
+            if box[0] <= m[2] and box[2] >= m[0] and box[1] <= m[3] and box[3] >= m[1]:
+                merged[i] = (min(m[0], box[0]), min(m[1], box[1]), max(m[2], box[2]), max(m[3], box[3]))
+                break
+        else:
+            merged.append(box)
+    # una unión puede crear nuevos solapes: repetir hasta que no cambie
+    return merged if len(merged) == len(boxes) else merge_boxes(merged)
+
+
+def roi_text(img: Image.Image, ocr: Callable[[Image.Image], str]) -> Optional[str]:
+    """
+    Texto de las regiones con anclas, OCR-eadas con 'ocr' a resolución completa.
+    None si conviene OCR de página completa.
+    """
+    w, h = img.size
+    scale = settings.OCR_ROI_PROBE_SCALE
+    probe = img.resize((max(1, int(w * scale)), max(1, int(h * scale))), Image.BILINEAR)
+    anchors, line_h = find_anchor_boxes(probe)
+    if not anchors:
+        return None
+
+    inv = 1.0 / scale
+    full = [tuple(int(v * inv) for v in a) for a in anchors]
+    regions = merge_boxes([_expand(a, line_h * inv, w, h) for a in full])
+    area = sum((r - l) * (b - t) for l, t, r, b in regions)
+    if area > settings.OCR_ROI_MAX_AREA * w * h:
+        return None
+
+    text = "\n".join(ocr(img.crop(r)) for r in regions)
+    sc = FieldScanner(text)
+    found = sum(x is not None for x in (sc.ruc(), sc.date(), sc.total_labeled(), sc.number()))
+    return text if found >= settings.OCR_ROI_MIN_FIELDS else None
@@ -0,0 +1,52 @@
+# app/pagination.py
+"""
+Paginación por keyset para las APIs de lectura (/invoices, /documents).
+
+El cursor es la clave de orden de la última fila devuelta, (valor, id), en JSON y
+base64url; es opaco para el cliente. La siguiente página se pide con
+"WHERE (col, id) < (:valor, :id)", que recorre el índice desde ese punto:
+el costo no crece con la profundidad como con OFFSET.
+"""
+import base64
+import json
+from typing import Any, List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+
+from app.settings import settings
+
+
+def encode_cursor(value: Any, row_id: Any) -> str:
+    raw = json.dumps([value, str(row_id)], separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[Any, str]]:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, row_id = json.loads(raw)
+        UUID(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="cursor inválido")
+    return value, row_id
+
+
+def page_limit(limit: Optional[int]) -> int:
+    return max(1, min(limit or settings.API_PAGE_SIZE, settings.API_PAGE_MAX))
+
+
+def check_uuid(value: Optional[str], name: str) -> None:
+    if value is None:
+        return
+    try:
+        UUID(str(value))
+    except Exception:
+        raise HTTPException(status_code=400, detail=f"{name} no es un UUID válido")
+
+
+def split_page(rows: List[Any], limit: int) -> Tuple[List[Any], bool]:
+    """Se piden limit + 1 filas: si vino la extra, hay página siguiente."""
+    return rows[:limit], len(rows) > limit
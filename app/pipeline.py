@@ -0,0 +1,375 @@
+# app/pipeline.py
+"""
+Pipeline de procesamiento de un documento: metadatos -> S3 -> OCR/parse -> invoice.
+Lo usan el endpoint síncrono (/ocr/process), los workers de la cola de jobs y el
+procesamiento por lotes (/ocr/process-batch).
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import logging
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.settings import settings
+from .storage import download_object
+from .finance_mapper import materialize_invoices
+from . import engine_router, extraction_cache, metrics
+
+
+log = logging.getLogger(__name__)
+
+
+def resolve_bucket() -> str:
+    # Bucket: usa S3_BUCKET (variable real de entorno)
+    s3_bucket = getattr(settings, "S3_BUCKET", None)
+    if not s3_bucket:
+        # fallback por si quieres soportar ambos nombres de env
+        s3_bucket = os.getenv("S3_BUCKET") or os.getenv("INGEST_BUCKET")
+    if not s3_bucket:
+        raise HTTPException(
+            status_code=500,
+            detail="S3_BUCKET no está configurado (define la variable de entorno o usa settings.py)",
+        )
+    return s3_bucket
+
+
+_DOC_SELECT = """
+    SELECT id::text AS id, tenant_id::text AS tenant_id, storage_key, doc_kind, source_format, sha256
+    FROM documents.documents
+"""
+
+# estado del documento: 'uploaded' -> 'processed' (en la misma transacción que sus
+# invoices) o 'error' (lotes); así un lote por status=uploaded no reprocesa nada
+_SET_STATUS = text("UPDATE documents.documents SET status = :st WHERE id = ANY(CAST(:ids AS uuid[]))")
+
+
+def _set_status(db: Session, doc_ids: List[str], status: str) -> None:
+    if doc_ids:
+        db.execute(_SET_STATUS, {"st": status, "ids": [str(d) for d in doc_ids]})
+
+
+def _plan(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Decide tipo/engine a partir de los metadatos (sin descargar nada)."""
+    storage_key = (doc.get("storage_key") or "").strip()
+    if not storage_key:
+        raise HTTPException(status_code=422, detail="documento sin storage_key")
+
+    kind = (doc.get("doc_kind") or "").lower()
+    fmt = (doc.get("source_format") or "").lower()
+    # heurística extra: por extensión
+    ext = os.path.splitext(storage_key)[1].lower().lstrip(".")
+    is_csv = fmt == "csv" or ext == "csv"
+    # Excel y CSV (registros de compras): una invoice por fila
+    is_excel = is_csv or (kind == "excel") or (fmt in {"xls", "xlsx"}) or (ext in {"xls", "xlsx"})
+    return {
+        "doc": doc,
+        "storage_key": storage_key,
+        "kind": kind,
+        "is_excel": is_excel,
+        "ledger_format": "csv" if is_csv else "xlsx",
+        "sha256": doc.get("sha256"),
+        "cache_key": extraction_cache.cache_key("local-excel" if is_excel else engine_router.family(), kind),
+    }
+
+
+def _download(plan: Dict[str, Any], s3_bucket: str):
+    # en memoria si es chico, a /tmp si no
+    try:
+        with metrics.stage("download"):
+            obj = download_object(s3_bucket, plan["storage_key"])
+        metrics.add_bytes(obj.size)
+        return obj
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Fallo al descargar de S3: {e}")
+
+
+def _extract(plan: Dict[str, Any], s3_bucket: str) -> Dict[str, Any]:
+    """Descarga + OCR/parse de un documento. No toca la BD (se puede correr en threads)."""
+    try:
+        if plan["is_excel"]:
+            from .excel_stream import parse_excel_first  # openpyxl: solo si llega un Excel
+
+            with _download(plan, s3_bucket) as obj:
+                result = parse_excel_first(obj.open())  # openpyxl valida la extensión de las rutas
+            result["doc_kind"] = plan["kind"]
+            return result
+        # OCR local y, si no alcanza, el siguiente engine de OCR_ENGINES (p. ej. Textract);
+        # la descarga ocurre solo si algún engine la necesita y se libera al salir
+        with engine_router.EngineInput(plan, s3_bucket, lambda: _download(plan, s3_bucket)) as inp:
+            return engine_router.route(inp)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"OCR/parse failed: {e}")
+
+
+def _extract_measured(plan: Dict[str, Any], s3_bucket: str) -> Dict[str, Any]:
+    # en un lote cada hilo mide su documento (descarga + OCR; la materialización va por grupo)
+    with metrics.document(plan["doc"]["id"]):
+        return _extract(plan, s3_bucket)
+
+
+def _process_excel(db: Session, plan: Dict[str, Any], s3_bucket: str) -> Dict[str, Any]:
+    """
+    Excel / CSV de registro de compras: una invoice por fila. Las filas se leen en streaming y
+    se insertan por tandas de EXCEL_BATCH_ROWS (memoria constante); un solo commit al
+    final, así un fallo a mitad no deja el archivo cargado a medias.
+    """
+    from .excel_stream import ENGINE_EXCEL, iter_ledger_invoices  # openpyxl: solo si llega un Excel
+
+    doc = plan["doc"]
+    metrics.set_engine(ENGINE_EXCEL)
+    obj = _download(plan, s3_bucket)
+    count, first_id = 0, None
+    chunk: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+
+    def _flush() -> None:
+        nonlocal count, first_id
+        with metrics.stage("materialize"):
+            ids = materialize_invoices(db, chunk, commit=False)
+        first_id = first_id or ids[0]
+        count += len(ids)
+        chunk.clear()
+
+    try:
+        with obj:
+            for result in iter_ledger_invoices(obj.open(), plan["ledger_format"]):
+                chunk.append((doc, result))
+                if len(chunk) >= settings.EXCEL_BATCH_ROWS:
+                    _flush()
+            if chunk:
+                _flush()
+        if not count:
+            raise HTTPException(status_code=422, detail="archivo sin filas con total")
+        # registro de la extracción (resumen; no entra a la caché por contenido)
+        summary = {"engine": ENGINE_EXCEL, "doc_kind": "excel", "confidence": 0.99, "rows": count}
+        extraction_cache.store(db, doc["id"], None, None, summary)
+        _set_status(db, [doc["id"]], "processed")
+        with metrics.stage("materialize"):
+            db.commit()
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Excel parse failed: {e}")
+
+    log.info("ocr.process ok doc_id=%s engine=%s kind=excel invoices=%s", doc["id"], ENGINE_EXCEL, count)
+    return {
+        "engine": ENGINE_EXCEL,
+        "doc_kind": "excel",
+        "invoice_id": str(first_id),
+        "invoices": count,
+        "confidence": 0.99,
+        "cached": False,
+    }
+
+
+def process_document_id(db: Session, doc_id: str) -> Dict[str, Any]:
+    """
+    Procesa un documento subido a S3 (clave en storage_key).
+    Lo descarga (en memoria o /tmp), detecta tipo (boleta/factura/excel) y persiste la invoice.
+    Si el mismo contenido (sha256) ya se extrajo con el mismo engine y versión de
+    parser, reutiliza ese resultado sin descargar ni OCR-ear.
+    Lanza HTTPException con el código adecuado si algo falla.
+    """
+    with metrics.document(doc_id):
+        return _process_document(db, doc_id)
+
+
+def _process_document(db: Session, doc_id: str) -> Dict[str, Any]:
+    s3_bucket = resolve_bucket()
+
+    # 1) Metadatos del documento
+    with metrics.stage("select"):
+        doc = db.execute(text(_DOC_SELECT + " WHERE id = :id"), {"id": doc_id}).mappings().first()
+    if not doc:
+        raise HTTPException(status_code=404, detail="document not found")
+    doc = dict(doc)
+    plan = _plan(doc)
+    if plan["is_excel"]:
+        return _process_excel(db, plan, s3_bucket)
+
+    # 2) Caché por contenido; si no, descarga + OCR
+    with metrics.stage("cache"):
+        result = extraction_cache.lookup(db, plan["sha256"], plan["cache_key"])
+    cached = result is not None
+    if not cached:
+        result = _extract(plan, s3_bucket)
+    kind = result.get("doc_kind") or plan["kind"]
+    engine = result.get("engine")
+    metrics.set_engine("cache" if cached else engine)
+
+    try:
+        extraction_cache.store(db, doc_id, plan["sha256"], plan["cache_key"], result, hit=cached)
+        _set_status(db, [doc_id], "processed")
+
+        # 3) Persistir invoice con su doc_kind (el commit también guarda la extracción y el estado)
+        with metrics.stage("materialize"):
+            inv_id = materialize_invoices(db, [(doc, dict(result, doc_kind=kind))])[0]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"OCR/parse failed: {e}")
+
+    # log mínimo para trazabilidad
+    log.info("ocr.process ok doc_id=%s engine=%s kind=%s cached=%s", doc_id, engine, kind, cached)
+
+    return {
+        "engine": engine,
+        "doc_kind": kind,
+        "invoice_id": str(inv_id),
+        "confidence": (result or {}).get("confidence"),
+        "cached": cached,
+    }
+
+
+# ------------ Procesamiento por lotes ------------
+
+def _batch_error(doc_id: str, status_code: int, detail: Any) -> Dict[str, Any]:
+    return {"doc_id": doc_id, "ok": False, "status_code": status_code, "error": str(detail)}
+
+
+def _flush_batch(db: Session, pending: List[Tuple[Dict[str, Any], Dict[str, Any], bool]],
+                 failed: List[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Materializa un grupo de resultados en UNA transacción y emite el resultado de cada doc.
+    En la misma transacción marca los documentos 'processed' y los de 'failed' (los que
+    fallaron al extraer) 'error'.
+    """
+    if not pending and not failed:
+        return
+    out: List[Dict[str, Any]] = []
+    done = [plan["doc"]["id"] for plan, _, _ in pending]
+    try:
+        entries = []
+        for plan, result, cached in pending:
+            doc = plan["doc"]
+            extraction_cache.store(db, doc["id"], plan["sha256"], plan["cache_key"], result, hit=cached)
+            entries.append((doc, dict(result, doc_kind=result.get("doc_kind") or plan["kind"])))
+        _set_status(db, done, "processed")
+        _set_status(db, failed, "error")
+        with metrics.stage("materialize"):
+            # proveedores, invoices e items en bloque
+            inv_ids = materialize_invoices(db, entries, commit=False)
+            db.commit()
+        for (plan, result, cached), (doc, res), inv_id in zip(pending, entries, inv_ids):
+            out.append({
+                "doc_id": doc["id"],
+                "ok": True,
+                "engine": res.get("engine"),
+                "doc_kind": res["doc_kind"],
+                "invoice_id": str(inv_id),
+                "confidence": res.get("confidence"),
+                "cached": cached,
+            })
+    except Exception as e:
+        db.rollback()
+        log.exception("ocr.batch flush failed size=%s", len(pending))
+        out = [_batch_error(plan["doc"]["id"], 500, f"persist failed: {e}") for plan, _, _ in pending]
+        try:
+            _set_status(db, done + failed, "error")
+            db.commit()
+        except Exception:
+            db.rollback()
+            log.exception("ocr.batch status update failed size=%s", len(done) + len(failed))
+    pending.clear()
+    failed.clear()
+    yield from out
+
+
+def process_batch(
+    db: Session,
+    doc_ids: Optional[List[str]] = None,
+    tenant_id: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Procesa muchos documentos: una consulta de metadatos, caché en bloque, descargas y
+    OCR concurrentes (BATCH_CONCURRENCY) y materialización en transacciones de
+    BATCH_COMMIT_SIZE documentos. Emite un dict por documento a medida que termina.
+    """
+    s3_bucket = resolve_bucket()
+    limit = min(limit or settings.BATCH_MAX_DOCS, settings.BATCH_MAX_DOCS)
+
+    # 1) Metadatos de todos los documentos en una sola consulta
+    with metrics.stage("select"):
+        if doc_ids:
+            rows = db.execute(
+                text(_DOC_SELECT + " WHERE id = ANY(CAST(:ids AS uuid[]))"),
+                {"ids": list(doc_ids)[:limit]},
+            ).mappings().all()
+        else:
+            rows = db.execute(
+                text(_DOC_SELECT + " WHERE tenant_id = :t AND (CAST(:st AS text) IS NULL OR status = :st)"
+                     " ORDER BY created_at LIMIT :lim"),
+                {"t": tenant_id, "st": status, "lim": limit},
+            ).mappings().all()
+    docs = [dict(r) for r in rows]
+    db.rollback()  # no dejar la transacción abierta mientras se hace OCR
+
+    if doc_ids:
+        found = {d["id"] for d in docs}
+        for d in list(doc_ids)[:limit]:
+            if str(d) not in found:
+                yield _batch_error(str(d), 404, "document not found")
+
+    plans = []
+    failed: List[str] = []  # se marcan 'error' en el próximo flush
+    for d in docs:
+        try:
+            plan = _plan(d)
+        except HTTPException as e:
+            failed.append(d["id"])
+            yield _batch_error(d["id"], e.status_code, e.detail)
+            continue
+        if not plan["is_excel"]:
+            plans.append(plan)
+            continue
+        # Excel: cada archivo ya es un lote de filas; se procesa aquí con la sesión
+        try:
+            with metrics.document(d["id"]):
+                res = _process_excel(db, plan, s3_bucket)
+        except HTTPException as e:
+            failed.append(d["id"])
+            yield _batch_error(d["id"], e.status_code, e.detail)
+            continue
+        yield {"doc_id": d["id"], "ok": True, **res}
+
+    # 2) Caché en bloque
+    with metrics.stage("cache"):
+        hits = extraction_cache.lookup_many(db, [(p["sha256"], p["cache_key"]) for p in plans])
+    pending: List[Tuple[Dict[str, Any], Dict[str, Any], bool]] = []
+    to_extract = []
+    for p in plans:
+        hit = hits.get((p["sha256"], p["cache_key"])) if p["sha256"] else None
+        if hit is not None:
+            pending.append((p, hit, True))
+        else:
+            to_extract.append(p)
+
+    # 3) Descarga + OCR concurrentes; se persiste por grupos
+    ex = ThreadPoolExecutor(max_workers=max(1, settings.BATCH_CONCURRENCY))
+    try:
+        futures = {ex.submit(_extract_measured, p, s3_bucket): p for p in to_extract}
+        for fut in as_completed(futures):
+            p = futures[fut]
+            try:
+                pending.append((p, fut.result(), False))
+            except HTTPException as e:
+                failed.append(p["doc"]["id"])
+                yield _batch_error(p["doc"]["id"], e.status_code, e.detail)
+            except Exception as e:
+                failed.append(p["doc"]["id"])
+                yield _batch_error(p["doc"]["id"], 500, e)
+            if len(pending) >= settings.BATCH_COMMIT_SIZE:
+                yield from _flush_batch(db, pending, failed)
+        yield from _flush_batch(db, pending, failed)
+    finally:
+        ex.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,104 @@
+# app/provider_cache.py
+"""
+Caché de proveedores por proceso: (tenant_id, ruc) -> provider_id.
+
+Unos pocos proveedores concentran la mayoría de las invoices; con la caché
+materialize_invoices se salta el upsert de finance.providers para ellos.
+LRU con TTL (PROVIDER_CACHE_SIZE / PROVIDER_CACHE_TTL). Solo se cachean ids ya
+confirmados en la BD: put_after_commit() los deja pendientes en la sesión y entran
+cuando esa transacción hace commit (un rollback los descarta). Esto vale también para
+los que el upsert encontró "ya existentes": pueden ser de una tanda anterior de la
+misma transacción abierta (commit=False), todavía sin confirmar.
+"""
+import logging
+import uuid
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.settings import settings
+from .lru import LRUCache
+
+log = logging.getLogger(__name__)
+
+Key = Tuple[str, str]
+
+_lru = LRUCache(maxsize=settings.PROVIDER_CACHE_SIZE, ttl=settings.PROVIDER_CACHE_TTL)
+
+
+def get(tenant_id: str, ruc: Optional[str]) -> Optional[uuid.UUID]:
+    if not settings.PROVIDER_CACHE or not ruc:
+        return None
+    return _lru.get((str(tenant_id), ruc))
+
+
+def put(tenant_id: str, ruc: Optional[str], provider_id: uuid.UUID) -> None:
+    if settings.PROVIDER_CACHE and ruc:
+        # un insert puede reemplazar lo que hubiera para la clave: invalidar y volver a poner
+        _lru.invalidate((str(tenant_id), ruc))
+        _lru.put((str(tenant_id), ruc), provider_id)
+
+
+_PENDING = "provider_cache_pending"
+
+
+def put_after_commit(db: Session, tenant_id: str, ruc: Optional[str], provider_id: uuid.UUID) -> None:
+    """Cachea (tenant_id, ruc) cuando la transacción actual de 'db' haga commit."""
+    if settings.PROVIDER_CACHE and ruc:
+        db.info.setdefault(_PENDING, {})[(str(tenant_id), ruc)] = provider_id
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(db: Session) -> None:
+    for (t, r), pid in db.info.pop(_PENDING, {}).items():
+        put(t, r, pid)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(db: Session) -> None:
+    db.info.pop(_PENDING, None)
+
+
+def invalidate(keys: Iterable[Key]) -> None:
+    for t, r in keys:
+        _lru.invalidate((str(t), r))
+
+
+def clear() -> None:
+    _lru.clear()
+
+
+def warm(db: Session, top: Optional[int] = None, tenant_id: Optional[str] = None) -> int:
+    """
+    Precarga los 'top' proveedores con más invoices de cada tenant (o de uno solo).
+    Devuelve cuántos se cargaron.
+    """
+    top = settings.PROVIDER_CACHE_WARM if top is None else top
+    if not settings.PROVIDER_CACHE or top <= 0:
+        return 0
+    rows = db.execute(
+        text(
+            """
+            SELECT tenant_id, ruc, id FROM (
+                SELECT p.tenant_id::text AS tenant_id, p.ruc, p.id,
+                       row_number() OVER (PARTITION BY p.tenant_id ORDER BY count(*) DESC) AS rn
+                FROM finance.providers p
+                JOIN finance.invoices i ON i.provider_id = p.id
+                WHERE p.ruc IS NOT NULL
+                  AND (CAST(:t AS uuid) IS NULL OR p.tenant_id = CAST(:t AS uuid))
+                GROUP BY p.tenant_id, p.ruc, p.id
+            ) ranked
+            WHERE rn <= :top
+            """
+        ),
+        {"t": tenant_id, "top": top},
+    ).mappings().all()
+    for r in rows:
+        _lru.put((r["tenant_id"], r["ruc"]), uuid.UUID(str(r["id"])))
+    log.info("provider_cache warm loaded=%s", len(rows))
+    return len(rows)
+
+
+def stats() -> Dict[str, Any]:
+    return _lru.stats()
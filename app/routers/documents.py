@@ -1,71 +1,250 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from ..config import settings
-from ..db import SessionLocal
+from ..db import get_async_db
 from ..models import Document
-from ..s3_client import put_file, sha256_bytes
-import uuid, io
+from ..s3_client import S3StreamWriter
+from ..pagination import check_uuid, decode_cursor, encode_cursor, page_limit, split_page
+from .. import archives, jobs
+from datetime import date, datetime, timedelta
+import uuid, hashlib
 from sqlalchemy import text
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
+_INSERT_DOC = text("""
+    INSERT INTO documents.documents
+      (id, tenant_id, user_id, filename, storage_key, mime, size, sha256, status, doc_kind, source_format)
+    VALUES
+      (:id, :tenant, :user, :fn, :key, :mime, :size, :sha, 'uploaded', :kind, :fmt)
+""")
+
+
+def _source_format(filename: str | None) -> str:
+    # deducir formato fuente
+    name = (filename or "").lower()
+    if name.endswith(".xlsx") or name.endswith(".xls"):
+        return "xlsx"
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith(".pdf"):
+        return "pdf"
+    if name.endswith((".jpg", ".jpeg")):
+        return "jpg"
+    if name.endswith(".png"):
+        return "png"
+    return "bin"
+
+
+async def _upload_archive(file: UploadFile, tenant_id: str, user_id: str | None,
+                          doc_kind: str, db: AsyncSession) -> dict:
+    """
+    ZIP con muchos comprobantes: registra cada archivo como documento (salvo los que el
+    tenant ya tiene, por sha256) y encola todos los jobs en la misma transacción.
+    La subida a S3 (hasta ARCHIVE_MAX_MB) corre entre la lectura de duplicados y esa
+    transacción, sin ninguna abierta: no retiene una conexión del pool mientras sube.
+    """
+    # el UploadFile ya está en un SpooledTemporaryFile (en disco si es grande): zipfile lo lee con seek
+    size = await run_in_threadpool(lambda: file.file.seek(0, 2))
+    if size > settings.ARCHIVE_MAX_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail="ZIP muy grande")
+    entries, skipped = await run_in_threadpool(archives.hash_entries, file.file)
+
+    # duplicados: ya registrados en el tenant o repetidos dentro del ZIP
+    shas = sorted({e["sha256"] for e in entries})
+    existing = set()
+    if shas:
+        rows = await db.execute(
+            text("SELECT sha256 FROM documents.documents WHERE tenant_id = :t AND sha256 = ANY(:shas)"),
+            {"t": str(tenant_id), "shas": shas},
+        )
+        existing = {r[0] for r in rows}
+        await db.rollback()  # cierra la transacción de lectura y devuelve la conexión al pool
+    new, duplicates, seen = [], [], set(existing)
+    for e in entries:
+        if e["sha256"] in seen:
+            duplicates.append(e["name"])
+        else:
+            seen.add(e["sha256"])
+            new.append(e)
+
+    uploaded = await run_in_threadpool(archives.upload_entries, file.file, new, str(tenant_id))
+    if uploaded:
+        await db.execute(_INSERT_DOC, [
+            dict(
+                id=e["id"],
+                tenant=str(tenant_id),
+                user=str(user_id) if user_id else None,
+                fn=e["filename"],
+                key=e["storage_key"],
+                mime=e["mime"],
+                size=e["size"],
+                sha=e["sha256"],
+                # planillas -> excel; el resto con el tipo declarado (o autodetección)
+                kind="excel" if e["source_format"] in ("xlsx", "csv") else (doc_kind if doc_kind in ("boleta", "factura") else None),
+                fmt=e["source_format"],
+            )
+            for e in uploaded
+        ])
+    job_ids = await jobs.enqueue_jobs_async(db, [e["id"] for e in uploaded])
+    await db.commit()
+
+    return {
+        "documents": [
+            {"id": e["id"], "filename": e["name"], "storage_key": e["storage_key"], "job_id": j}
+            for e, j in zip(uploaded, job_ids)
+        ],
+        "duplicates": duplicates,
+        "skipped": skipped,
+    }
+
+
 @router.post("/upload")
 async def upload_document(
     file: UploadFile = File(...),
     tenant_id: str = Form(...),
     user_id: str | None = Form(None),
     doc_kind: str = Form(...),  # 'boleta' | 'factura' | 'excel'
+    db: AsyncSession = Depends(get_async_db),
 ):
+    """
+    Sube un comprobante (o un ZIP) a S3 y lo registra. El cuerpo ya llega acotado por
+    app.upload_limit (antes del parseo del multipart); el 413 de MAX_UPLOAD_MB de aquí
+    es el tope por archivo de lo que se sube a S3.
+    """
+    # ZIP: subida masiva (un documento + job por archivo contenido). Va antes del filtro de
+    # MIME: los navegadores mandan .zip como application/octet-stream o multipart/x-zip,
+    # y el contenido se valida entrada por entrada (archives.ENTRY_TYPES)
+    if archives.is_zip(file.filename, file.content_type):
+        return await _upload_archive(file, tenant_id, user_id, doc_kind, db)
+
     if file.content_type not in settings.ALLOWED_MIME:
         raise HTTPException(status_code=415, detail="MIME no permitido")
 
-    raw = await file.read()
-    if len(raw) > settings.MAX_UPLOAD_MB * 1024 * 1024:
-        raise HTTPException(status_code=413, detail="Archivo muy grande")
-
-    # deducir formato fuente
-    name = (file.filename or "").lower()
-    if name.endswith(".xlsx") or name.endswith(".xls"):
-        source_format = "xlsx"
-    elif name.endswith(".pdf"):
-        source_format = "pdf"
-    elif name.endswith((".jpg", ".jpeg")):
-        source_format = "jpg"
-    elif name.endswith(".png"):
-        source_format = "png"
-    else:
-        source_format = "bin"
+    source_format = _source_format(file.filename)
 
     doc_id = uuid.uuid4()
     key = f"{settings.S3_PREFIX}{tenant_id}/{doc_id}/{file.filename}"
-    put_file(io.BytesIO(raw), key)
-
-    with SessionLocal() as db:
-        # si usas ORM:
-        # d = Document(..., doc_kind=doc_kind, source_format=source_format)
-        # db.add(d)
-        # db.commit()
-
-        # versión SQL cruda (funciona igual aunque el modelo no tenga las columnas todavía):
-        db.execute(
-    text("""
-        INSERT INTO documents.documents
-          (id, tenant_id, user_id, filename, storage_key, mime, size, sha256, status, doc_kind, source_format)
-        VALUES
-          (:id, :tenant, :user, :fn, :key, :mime, :size, :sha, 'uploaded', :kind, :fmt)
-    """),
-    dict(
-        id=str(doc_id),
-        tenant=str(tenant_id),
-        user=str(user_id) if user_id else None,
-        fn=file.filename,
-        key=key,
-        mime=file.content_type,
-        size=len(raw),
-        sha=sha256_bytes(raw),
-        kind=doc_kind,
-        fmt=source_format,
-    ),
-)
-        db.commit()
+
+    # subida por streaming: se hashea y se sube por partes sin tener el archivo entero en memoria
+    max_bytes = settings.MAX_UPLOAD_MB * 1024 * 1024
+    chunk_size = settings.UPLOAD_CHUNK_KB * 1024
+    hasher = hashlib.sha256()
+    size = 0
+    writer = S3StreamWriter(key, content_type=file.content_type)
+
+    def _consume(chunk: bytes) -> None:
+        # hash + subida de la parte fuera del event loop (sha256 suelta el GIL en bloques grandes)
+        hasher.update(chunk)
+        writer.write(chunk)
+
+    try:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail="Archivo muy grande")
+            await run_in_threadpool(_consume, chunk)
+        await run_in_threadpool(writer.close)
+    except BaseException:
+        await run_in_threadpool(writer.abort)
+        raise
+
+    # si usas ORM:
+    # d = Document(..., doc_kind=doc_kind, source_format=source_format)
+    # db.add(d)
+    # await db.commit()
+
+    # versión SQL cruda (funciona igual aunque el modelo no tenga las columnas todavía):
+    await db.execute(
+        _INSERT_DOC,
+        dict(
+            id=str(doc_id),
+            tenant=str(tenant_id),
+            user=str(user_id) if user_id else None,
+            fn=file.filename,
+            key=key,
+            mime=file.content_type,
+            size=size,
+            sha=hasher.hexdigest(),
+            kind=doc_kind,
+            fmt=source_format,
+        ),
+    )
+    await db.commit()
 
     return {"id": str(doc_id), "storage_key": key}
+
+
+@router.get("")
+async def list_documents(
+    tenant_id: str = Query(...),
+    desde: date | None = Query(None, description="created_at >= desde"),
+    hasta: date | None = Query(None, description="created_at < hasta + 1 día"),
+    doc_kind: str | None = Query(None),
+    status: str | None = Query(None),
+    cursor: str | None = Query(None, description="next_cursor de la página anterior"),
+    limit: int | None = Query(None, ge=1),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Documentos del tenant, del más reciente al más antiguo (created_at, id).
+    Paginación por keyset: pasar next_cursor; usa ix_docs_tenant_created_id.
+    """
+    check_uuid(tenant_id, "tenant_id")
+    lim = page_limit(limit)
+    where = ["tenant_id = :t"]
+    params = {"t": str(tenant_id), "lim": lim + 1}
+    if desde:
+        where.append("created_at >= :desde")
+        params["desde"] = datetime.combine(desde, datetime.min.time())
+    if hasta:
+        where.append("created_at < :hasta")
+        params["hasta"] = datetime.combine(hasta + timedelta(days=1), datetime.min.time())
+    if doc_kind:
+        where.append("doc_kind = :kind")
+        params["kind"] = doc_kind.lower()
+    if status:
+        where.append("status = :status")
+        params["status"] = status
+    after = decode_cursor(cursor)
+    if after:
+        try:
+            params["c_created"] = datetime.fromisoformat(after[0])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="cursor inválido")
+        params["c_id"] = after[1]
+        where.append("(created_at, id) < (:c_created, CAST(:c_id AS uuid))")
+
+    rows = (await db.execute(
+        text(f"""
+            SELECT id, filename, mime, size, status, doc_kind, source_format, created_at
+            FROM documents.documents
+            WHERE {" AND ".join(where)}
+            ORDER BY created_at DESC, id DESC
+            LIMIT :lim
+        """),
+        params,
+    )).mappings().all()
+    page, more = split_page(rows, lim)
+
+    last = page[-1] if page else None
+    return {
+        "items": [
+            {
+                "id": str(r["id"]),
+                "filename": r["filename"],
+                "mime": r["mime"],
+                "size": r["size"],
+                "status": r["status"],
+                "doc_kind": r["doc_kind"],
+                "source_format": r["source_format"],
+                "created_at": r["created_at"].isoformat(),
+            }
+            for r in page
+        ],
+        "next_cursor": encode_cursor(last["created_at"].isoformat(), last["id"]) if more and last else None,
+    }
@@ -0,0 +1,104 @@
+# app/routers/invoices.py
+from datetime import date
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import get_async_db
+from ..pagination import check_uuid, decode_cursor, encode_cursor, page_limit, split_page
+
+router = APIRouter(prefix="/invoices", tags=["invoices"])
+
+# invoices sin fecha van al final (orden descendente): la misma expresión está en el
+# índice ix_inv_tenant_fecha_id (scripts/add_read_api_indexes.sql)
+_FECHA = "COALESCE(i.fecha, DATE '1900-01-01')"
+_NO_DATE = date(1900, 1, 1)
+
+
+@router.get("")
+async def list_invoices(
+    tenant_id: str = Query(...),
+    fecha_desde: Optional[date] = Query(None),
+    fecha_hasta: Optional[date] = Query(None),
+    ruc: Optional[str] = Query(None, description="RUC del proveedor"),
+    doc_kind: Optional[str] = Query(None, description="boleta | factura | excel"),
+    status: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    limit: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_async_db),
+) -> Dict[str, Any]:
+    """
+    Invoices del tenant, de la más reciente a la más antigua (fecha, id), con el
+    proveedor en la misma consulta. Paginación por keyset: pasar next_cursor.
+    """
+    check_uuid(tenant_id, "tenant_id")
+    lim = page_limit(limit)
+    where = ["i.tenant_id = :t"]
+    params: Dict[str, Any] = {"t": tenant_id, "lim": lim + 1}
+    if fecha_desde:
+        where.append(f"{_FECHA} >= :desde")
+        params["desde"] = fecha_desde
+    if fecha_hasta:
+        where.append(f"{_FECHA} <= :hasta AND i.fecha IS NOT NULL")
+        params["hasta"] = fecha_hasta
+    if ruc:
+        # por el índice único (tenant_id, ruc) de providers y luego (tenant_id, provider_id, fecha)
+        where.append("i.provider_id IN (SELECT id FROM finance.providers WHERE tenant_id = :t AND ruc = :ruc)")
+        params["ruc"] = ruc.strip()
+    if doc_kind:
+        where.append("i.doc_kind = :kind")
+        params["kind"] = doc_kind.lower()
+    if status:
+        where.append("i.status = :status")
+        params["status"] = status
+    after = decode_cursor(cursor)
+    if after:
+        where.append(f"({_FECHA}, i.id) < (:c_fecha, CAST(:c_id AS uuid))")
+        try:
+            params["c_fecha"] = date.fromisoformat(after[0])
+        except (TypeError, ValueError):
+            params["c_fecha"] = _NO_DATE
+        params["c_id"] = after[1]
+
+    rows = (await db.execute(
+        text(
+            f"""
+            SELECT i.id, i.fecha, {_FECHA} AS sort_fecha, i.serie, i.numero, i.moneda, i.total,
+                   i.status, i.doc_kind, i.document_id, i.provider_id, p.ruc, p.razon_social
+            FROM finance.invoices i
+            LEFT JOIN finance.providers p ON p.id = i.provider_id
+            WHERE {" AND ".join(where)}
+            ORDER BY {_FECHA} DESC, i.id DESC
+            LIMIT :lim
+            """
+        ),
+        params,
+    )).mappings().all()
+    page, more = split_page(rows, lim)
+
+    items = [
+        {
+            "id": str(r["id"]),
+            "fecha": r["fecha"].isoformat() if r["fecha"] else None,
+            "serie": r["serie"],
+            "numero": r["numero"],
+            "moneda": r["moneda"],
+            "total": str(r["total"]) if r["total"] is not None else None,  # sin pasar por float
+            "status": r["status"],
+            "doc_kind": r["doc_kind"],
+            "document_id": str(r["document_id"]) if r["document_id"] else None,
+            "provider": {
+                "id": str(r["provider_id"]) if r["provider_id"] else None,
+                "ruc": r["ruc"],
+                "razon_social": r["razon_social"],
+            },
+        }
+        for r in page
+    ]
+    last = page[-1] if page else None
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(last["sort_fecha"].isoformat(), last["id"]) if more and last else None,
+    }
@@ -1,147 +1,117 @@
 # app/routers/ocr.py
-from uuid import UUID
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+import json
 import logging
-import os
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from app.settings import settings
-from ..db import SessionLocal
-from ..storage import download_to_tmp
-from ..finance_mapper import materialize_invoice
-# from ..textract_client import analyze_expense_s3  # futuro
-
-from ..ocr_local import (
-    parse_excel_local,
-    extract_text,
-    autodetect_kind,
-    parse_boleta_local,
-    parse_factura_local,
-)
+from ..db import AsyncSessionLocal, SessionLocal, get_async_db
+from ..pagination import check_uuid
+from ..pipeline import process_document_id, process_batch
+from .. import jobs, extraction_cache, provider_cache
 
 router = APIRouter(prefix="/ocr", tags=["ocr"])
 log = logging.getLogger(__name__)
 
 
+def _process_sync(doc_id: str) -> Dict[str, Any]:
+    # descarga + OCR + persistencia son bloqueantes: corren en el threadpool con sesión sync
+    with SessionLocal() as db:
+        return process_document_id(db, doc_id)
+
+
 @router.post("/process/{doc_id}")
-def process_document(doc_id: str) -> Dict[str, Any]:
+async def process_document(
+    doc_id: str,
+    async_mode: bool = Query(False, alias="async", description="Encolar y responder con job_id"),
+) -> Dict[str, Any]:
     """
     Procesa un documento subido a S3 (clave en storage_key).
-    Descarga a /tmp, detecta tipo (boleta/factura/excel) y persiste la invoice.
+    Descarga (en memoria o /tmp), detecta tipo (boleta/factura/excel) y persiste la invoice.
+    Con ?async=true solo encola el job y responde 202; el estado se consulta en /ocr/jobs/{id}.
+    La sesión async se abre solo para encolar: el camino sync usa su propia sesión en el
+    threadpool.
     """
 
     # 0) Validaciones tempranas
-    try:
-        UUID(str(doc_id))
-    except Exception:
-        raise HTTPException(status_code=400, detail="doc_id no es un UUID válido")
-
-    # Bucket: usa S3_BUCKET (variable real de entorno)
-    s3_bucket = getattr(settings, "S3_BUCKET", None)
-    if not s3_bucket:
-        # fallback por si quieres soportar ambos nombres de env
-        s3_bucket = os.getenv("S3_BUCKET") or os.getenv("INGEST_BUCKET")
-    if not s3_bucket:
-        raise HTTPException(
-            status_code=500,
-            detail="S3_BUCKET no está configurado (define la variable de entorno o usa settings.py)",
+    check_uuid(doc_id, "doc_id")
+
+    if async_mode:
+        async with AsyncSessionLocal() as db:
+            exists = (await db.execute(
+                text("SELECT 1 FROM documents.documents WHERE id = :id"), {"id": doc_id}
+            )).first()
+            if not exists:
+                raise HTTPException(status_code=404, detail="document not found")
+            job_ids = await jobs.enqueue_jobs_async(db, [doc_id])
+            await db.commit()
+        log.info("ocr.enqueue doc_id=%s job_id=%s", doc_id, job_ids[0])
+        return JSONResponse(
+            status_code=202,
+            content={"job_id": job_ids[0], "status": jobs.QUEUED, "document_id": doc_id},
         )
 
-    local_path: Optional[str] = None
+    return await run_in_threadpool(_process_sync, doc_id)
 
-    with SessionLocal() as db:
-        # 1) Metadatos del documento
-        doc = db.execute(
-            text(
-                """
-                SELECT id::text, tenant_id::text, storage_key, doc_kind, source_format
-                FROM documents.documents
-                WHERE id = :id
-                """
-            ),
-            {"id": doc_id},
-        ).mappings().first()
-
-        if not doc:
-            raise HTTPException(status_code=404, detail="document not found")
-
-        storage_key = (doc.get("storage_key") or "").strip()
-        if not storage_key:
-            raise HTTPException(status_code=422, detail="documento sin storage_key")
-
-        # 2) Descargar desde S3 a /tmp
-        try:
-            local_path = download_to_tmp(s3_bucket, storage_key)
-        except HTTPException:
-            raise
-        except Exception as e:
-            raise HTTPException(status_code=502, detail=f"Fallo al descargar de S3: {e}")
-
-        try:
-            # 3) Determinar tipo y parsear
-            kind = (doc.get("doc_kind") or "").lower()
-            fmt = (doc.get("source_format") or "").lower()
-
-            # heurística extra: por extensión
-            ext = os.path.splitext(storage_key)[1].lower().lstrip(".")
-
-            is_excel = (kind == "excel") or (fmt in {"xls", "xlsx"}) or (ext in {"xls", "xlsx"})
-            if is_excel:
-                result = parse_excel_local(local_path)
-                engine = "local-excel"
-            else:
-                raw = extract_text(local_path)
-                if not kind:
-                    kind = (autodetect_kind(raw) or "factura").lower()
-
-                if kind == "boleta":
-                    result = parse_boleta_local(raw)
-                else:
-                    result = parse_factura_local(raw)
-                    kind = "factura"  # normaliza
-
-                engine = "local-tesseract"
-
-            # 4) Persistir invoice
-            inv_id = materialize_invoice(db, doc_id, engine, result)
-
-            # 5) Guardar tipo en la invoice (si aplica)
-            db.execute(
-                text(
-                    """
-                    UPDATE finance.invoices
-                    SET doc_kind = :k
-                    WHERE id = :inv_id
-                    """
-                ),
-                {
-                    "k": kind if kind in ("boleta", "factura", "excel") else None,
-                    "inv_id": str(inv_id),
-                },
-            )
-            db.commit()
-
-            # log mínimo para trazabilidad
-            log.info("ocr.process ok doc_id=%s engine=%s kind=%s", doc_id, engine, kind)
-
-            return {
-                "engine": engine,
-                "doc_kind": kind,
-                "invoice_id": str(inv_id),
-                "confidence": (result or {}).get("confidence"),
-            }
-
-        except HTTPException:
-            raise
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"OCR/parse failed: {e}")
-        finally:
-            # 6) Limpieza de /tmp
-            if local_path:
-                try:
-                    if os.path.exists(local_path):
-                        os.remove(local_path)
-                except Exception:
-                    pass
+
+class BatchRequest(BaseModel):
+    doc_ids: Optional[List[str]] = None
+    # alternativa a doc_ids: todos los documentos del tenant en ese estado
+    tenant_id: Optional[str] = None
+    status: Optional[str] = "uploaded"
+    limit: Optional[int] = None
+
+
+@router.post("/process-batch")
+def process_document_batch(req: BatchRequest) -> StreamingResponse:
+    """
+    Procesa muchos documentos en una llamada. Responde NDJSON: una línea por documento
+    (ok/invoice_id o error) a medida que cada grupo se persiste.
+    """
+    if not req.doc_ids and not req.tenant_id:
+        raise HTTPException(status_code=400, detail="indica doc_ids o tenant_id")
+    for d in req.doc_ids or []:
+        check_uuid(d, "doc_id")
+    if req.tenant_id:
+        check_uuid(req.tenant_id, "tenant_id")
+
+    # generador sync: Starlette lo itera en el threadpool, no bloquea el event loop
+    def _stream():
+        with SessionLocal() as db:
+            n = 0
+            for item in process_batch(db, req.doc_ids, req.tenant_id, req.status, req.limit):
+                n += 1
+                yield json.dumps(item, default=str) + "\n"
+            log.info("ocr.batch done docs=%s", n)
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str, db: AsyncSession = Depends(get_async_db)) -> Dict[str, Any]:
+    check_uuid(job_id, "job_id")
+    job = await jobs.get_job_async(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="job not found")
+    return {
+        "job_id": job["id"],
+        "document_id": job["document_id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "result": job["result"],
+        "error": job["error_message"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+
+
+@router.get("/cache-stats")
+def cache_stats() -> Dict[str, Any]:
+    """Hits/misses de las cachés en memoria de ESTE proceso (cada worker tiene las suyas)."""
+    return {"extractions": extraction_cache.stats(), "providers": provider_cache.stats()}
@@ -0,0 +1,281 @@
+# app/ruc_registry.py
+"""
+Índice local de RUCs (padrón reducido de SUNAT o integrations.ruc_cache).
+
+Archivo binario de solo lectura que se abre con mmap (las páginas se cargan bajo
+demanda, el proceso no tiene que traer millones de filas a memoria):
+
+    magic "RUCIDX1\\0" | largo header (u32) | header JSON {n, estados, condiciones}
+    keys     u64[n]     RUCs ordenados              -> búsqueda binaria O(log n)
+    codes    u8[n, 2]   (estado, condición) como índice en las tablas del header
+    offsets  u64[n+1]   inicio de cada razón social en 'names'
+    names    bytes      razones sociales en UTF-8, concatenadas
+
+Construcción (usa NumPy para ordenar; la búsqueda solo usa la stdlib):
+
+    python -m app.ruc_registry build --padron padron_reducido_ruc.zip --out /data/ruc.idx
+    python -m app.ruc_registry build --from-db --out /data/ruc.idx
+    python -m app.ruc_registry get 20100070970 --index /data/ruc.idx
+
+La app lo usa si RUC_REGISTRY_PATH apunta a un índice existente.
+"""
+import argparse
+import io
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import zipfile
+from array import array
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .config import settings
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"RUCIDX1\0"
+_ALIGN = 8
+
+
+class RucInfo(NamedTuple):
+    ruc: str
+    razon_social: Optional[str]
+    estado: Optional[str]
+    condicion: Optional[str]
+
+
+class RucRegistry:
+    """Índice abierto con mmap. Thread-safe (solo lectura)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # identifica el archivo mapeado (reemplazar el índice cambia la versión)
+        self.version = f"{st.st_size}:{st.st_mtime_ns}"
+        mm = self._mm
+        if mm[:8] != MAGIC:
+            raise ValueError(f"{path} no es un índice de RUCs")
+        (hlen,) = struct.unpack_from("<I", mm, 8)
+        header = json.loads(mm[12:12 + hlen])
+        self.n: int = header["n"]
+        self._estados: List[str] = header["estados"]
+        self._condiciones: List[str] = header["condiciones"]
+        self._keys = _aligned(12 + hlen)
+        self._codes = self._keys + 8 * self.n
+        self._offsets = _aligned(self._codes + 2 * self.n)
+        self._names = self._offsets + 8 * (self.n + 1)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def _key(self, i: int) -> int:
+        return struct.unpack_from("<Q", self._mm, self._keys + 8 * i)[0]
+
+    def _index(self, ruc: str) -> int:
+        if len(ruc) != 11 or not ruc.isdecimal():
+            return -1
+        target = int(ruc)
+        lo, hi = 0, self.n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.n and self._key(lo) == target else -1
+
+    def __contains__(self, ruc: str) -> bool:
+        return self._index(ruc) >= 0
+
+    def get(self, ruc: str) -> Optional[RucInfo]:
+        i = self._index(ruc)
+        if i < 0:
+            return None
+        est, cond = self._mm[self._codes + 2 * i], self._mm[self._codes + 2 * i + 1]
+        start, end = struct.unpack_from("<QQ", self._mm, self._offsets + 8 * i)
+        name = self._mm[self._names + start:self._names + end].decode("utf-8") or None
+        return RucInfo(ruc, name, self._estados[est] or None, self._condiciones[cond] or None)
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+def _aligned(pos: int) -> int:
+    return (pos + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+# ------------ Instancia del proceso ------------
+
+_registry: Optional[RucRegistry] = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def get_registry() -> Optional[RucRegistry]:
+    """Índice configurado en RUC_REGISTRY_PATH (se abre una vez); None si no hay."""
+    global _registry, _loaded
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                path = settings.RUC_REGISTRY_PATH
+                if path and os.path.exists(path):
+                    try:
+                        _registry = RucRegistry(path)
+                        log.info("ruc_registry loaded path=%s n=%s", path, _registry.n)
+                    except Exception:
+                        log.exception("ruc_registry no se pudo abrir path=%s", path)
+                elif path:
+                    log.warning("ruc_registry: no existe %s", path)
+                _loaded = True
+    return _registry
+
+
+def lookup(ruc: Optional[str]) -> Optional[RucInfo]:
+    reg = get_registry()
+    return reg.get(ruc) if reg is not None and ruc else None
+
+
+# ------------ Construcción ------------
+
+Row = Tuple[str, Optional[str], Optional[str], Optional[str]]  # ruc, razón social, estado, condición
+
+
+def iter_padron(path: str) -> Iterator[Row]:
+    """
+    Padrón reducido de SUNAT: texto '|' separado en latin-1 (o el .zip tal cual se
+    descarga), columnas RUC|NOMBRE O RAZÓN SOCIAL|ESTADO|CONDICIÓN|...
+    """
+    if path.lower().endswith(".zip"):
+        zf = zipfile.ZipFile(path)
+        member = next(n for n in zf.namelist() if n.lower().endswith(".txt"))
+        raw = zf.open(member)
+    else:
+        zf, raw = None, open(path, "rb")
+    try:
+        with io.TextIOWrapper(raw, encoding="latin-1", newline="") as f:
+            next(f, None)  # cabecera
+            for line in f:
+                parts = line.rstrip("\r\n").split("|")
+                if len(parts) < 4 or len(parts[0]) != 11 or not parts[0].isdecimal():
+                    continue
+                yield parts[0], parts[1].strip() or None, parts[2].strip() or None, parts[3].strip() or None
+    finally:
+        if zf is not None:
+            zf.close()
+
+
+def iter_ruc_cache() -> Iterator[Row]:
+    """Filas de integrations.ruc_cache (cursor del lado del servidor)."""
+    from sqlalchemy import text
+    from .db import SessionLocal
+
+    with SessionLocal() as db:
+        result = db.execute(
+            text("SELECT ruc, razon_social, estado, condicion FROM integrations.ruc_cache ORDER BY updated_at NULLS FIRST")
+            .execution_options(stream_results=True, yield_per=10_000)
+        )
+        for ruc, name, estado, cond in result:
+            ruc = (ruc or "").strip()
+            if len(ruc) == 11 and ruc.isdecimal():
+                yield ruc, name, estado, cond
+
+
+def _code(table: dict, value: Optional[str]) -> int:
+    value = (value or "").strip().upper()
+    code = table.get(value)
+    if code is None:
+        if len(table) >= 255:
+            raise ValueError("demasiados valores distintos de estado/condición (máx. 255)")
+        code = table[value] = len(table)
+    return code
+
+
+def build(rows: Iterable[Row], out_path: str) -> int:
+    """
+    Escribe el índice. Si un RUC se repite gana la última fila. Devuelve cuántos RUCs quedaron.
+    Memoria de la construcción: ~11 bytes por fila + NumPy para ordenar; las razones
+    sociales van a un temporal en disco.
+    """
+    import numpy as np
+
+    keys = array("Q")
+    codes = bytearray()
+    lengths = array("Q")
+    estados, condiciones = {"": 0}, {"": 0}
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    with tempfile.TemporaryFile(dir=out_dir) as names_tmp:
+        for ruc, name, estado, cond in rows:
+            enc = (name or "").strip().encode("utf-8")
+            keys.append(int(ruc))
+            codes += bytes((_code(estados, estado), _code(condiciones, cond)))
+            lengths.append(len(enc))
+            names_tmp.write(enc)
+        names_tmp.flush()
+
+        k = np.frombuffer(keys, dtype=np.uint64)
+        order = np.argsort(k, kind="stable")
+        sk = k[order]
+        # con orden estable, la última de cada RUC repetido es la que no tiene igual a su derecha
+        keep = np.ones(len(sk), dtype=bool)
+        keep[:-1] = sk[:-1] != sk[1:]
+        order, sk = order[keep], sk[keep]
+        n = int(len(order))
+
+        lens = np.frombuffer(lengths, dtype=np.uint64)
+        src_off = np.zeros(len(lens) + 1, dtype=np.uint64)
+        np.cumsum(lens, out=src_off[1:])
+        dst_off = np.zeros(n + 1, dtype=np.uint64)
+        np.cumsum(lens[order], out=dst_off[1:])
+        c = np.frombuffer(bytes(codes), dtype=np.uint8).reshape(-1, 2)[order]
+
+        header = json.dumps({
+            "n": n,
+            "estados": sorted(estados, key=estados.get),
+            "condiciones": sorted(condiciones, key=condiciones.get),
+        }).encode()
+        tmp_out = out_path + ".tmp"
+        with open(tmp_out, "wb") as out:
+            out.write(MAGIC + struct.pack("<I", len(header)) + header)
+            out.write(b"\0" * (_aligned(out.tell()) - out.tell()))
+            out.write(sk.astype("<u8").tobytes())
+            out.write(c.tobytes())
+            out.write(b"\0" * (_aligned(out.tell()) - out.tell()))
+            out.write(dst_off.astype("<u8").tobytes())
+            if len(lens):
+                names_tmp.seek(0, os.SEEK_END)
+                if names_tmp.tell():
+                    with mmap.mmap(names_tmp.fileno(), 0, access=mmap.ACCESS_READ) as src:
+                        for i in order.tolist():
+                            out.write(src[int(src_off[i]):int(src_off[i + 1])])
+        os.replace(tmp_out, out_path)
+    return n
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Índice local de RUCs")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="construir el índice")
+    src = b.add_mutually_exclusive_group(required=True)
+    src.add_argument("--padron", help="padron_reducido_ruc.txt o .zip de SUNAT")
+    src.add_argument("--from-db", action="store_true", help="leer integrations.ruc_cache")
+    b.add_argument("--out", default=settings.RUC_REGISTRY_PATH, required=not settings.RUC_REGISTRY_PATH)
+    g = sub.add_parser("get", help="consultar un RUC")
+    g.add_argument("ruc")
+    g.add_argument("--index", default=settings.RUC_REGISTRY_PATH, required=not settings.RUC_REGISTRY_PATH)
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        rows = iter_padron(args.padron) if args.padron else iter_ruc_cache()
+        n = build(rows, args.out)
+        print(f"{n} RUCs -> {args.out} ({os.path.getsize(args.out) / 1e6:.1f} MB)")
+    else:
+        print(RucRegistry(args.index).get(args.ruc))
+
+
+if __name__ == "__main__":
+    main()
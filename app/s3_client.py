@@ -1,15 +1,81 @@
-import boto3, hashlib
+import hashlib
+from typing import List, Optional
+from .aws import get_client
 from .config import settings
 
-s3 = boto3.client("s3", region_name=settings.AWS_REGION)
+_SSE = {"ServerSideEncryption": "AES256"}
 
 def put_file(fp, key):
-    s3.upload_fileobj(fp, settings.S3_BUCKET, key, ExtraArgs={"ServerSideEncryption": "AES256"})
+    get_client("s3").upload_fileobj(fp, settings.S3_BUCKET, key, ExtraArgs=_SSE)
     return f"s3://{settings.S3_BUCKET}/{key}"
 
 def get_object_bytes(key) -> bytes:
-    obj = s3.get_object(Bucket=settings.S3_BUCKET, Key=key)
+    obj = get_client("s3").get_object(Bucket=settings.S3_BUCKET, Key=key)
     return obj["Body"].read()
 
 def sha256_bytes(b: bytes) -> str:
     return hashlib.sha256(b).hexdigest()
+
+
+class S3StreamWriter:
+    """
+    Sube un objeto a S3 por partes a medida que llegan los bytes.
+    Solo mantiene en memoria una parte (S3_PART_SIZE_MB); si el archivo entero cabe
+    en una parte, hace un único put_object en vez de un multipart upload.
+    Los métodos son bloqueantes: desde código async llamarlos en un threadpool.
+    """
+
+    def __init__(self, key: str, content_type: Optional[str] = None, part_size: Optional[int] = None):
+        self.key = key
+        self.content_type = content_type
+        # S3 exige partes de al menos 5 MB (salvo la última)
+        self.part_size = max(5, part_size or settings.S3_PART_SIZE_MB) * 1024 * 1024
+        self._buf = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts: List[dict] = []
+        self._s3 = get_client("s3")
+
+    def _extra(self) -> dict:
+        extra = dict(_SSE)
+        if self.content_type:
+            extra["ContentType"] = self.content_type
+        return extra
+
+    def _flush_part(self) -> None:
+        if self._upload_id is None:
+            resp = self._s3.create_multipart_upload(Bucket=settings.S3_BUCKET, Key=self.key, **self._extra())
+            self._upload_id = resp["UploadId"]
+        n = len(self._parts) + 1
+        resp = self._s3.upload_part(
+            Bucket=settings.S3_BUCKET, Key=self.key, UploadId=self._upload_id,
+            PartNumber=n, Body=bytes(self._buf),
+        )
+        self._parts.append({"ETag": resp["ETag"], "PartNumber": n})
+        self._buf.clear()
+
+    def write(self, data: bytes) -> None:
+        self._buf += data
+        if len(self._buf) >= self.part_size:
+            self._flush_part()
+
+    def close(self) -> str:
+        if self._upload_id is None:
+            self._s3.put_object(Bucket=settings.S3_BUCKET, Key=self.key, Body=bytes(self._buf), **self._extra())
+            self._buf.clear()
+        else:
+            if self._buf:
+                self._flush_part()
+            self._s3.complete_multipart_upload(
+                Bucket=settings.S3_BUCKET, Key=self.key, UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts},
+            )
+        return f"s3://{settings.S3_BUCKET}/{self.key}"
+
+    def abort(self) -> None:
+        self._buf.clear()
+        if self._upload_id is not None:
+            try:
+                self._s3.abort_multipart_upload(Bucket=settings.S3_BUCKET, Key=self.key, UploadId=self._upload_id)
+            except Exception:
+                pass
+            self._upload_id = None
@@ -9,17 +9,69 @@ class Settings:
     DB_PORT = os.getenv("DB_PORT") or "5432"
     DB_NAME = os.getenv("DB_NAME")
 
-    # opcional: permitir DB_URL directa si ya viene definida
-    DB_URL = os.getenv("DB_URL")
-    if not DB_URL:
-        if not all([DB_USER, DB_PASSWORD, DB_HOST, DB_NAME]):
+    # La URL se valida al primer uso (al crear el engine), no al importar: así se puede
+    # importar la app (gunicorn --preload, benchmarks, /health) sin la BD configurada.
+    @property
+    def DB_URL(self) -> str:
+        # opcional: permitir DB_URL directa si ya viene definida
+        url = os.getenv("DB_URL")
+        if url:
+            return url
+        if not all([self.DB_USER, self.DB_PASSWORD, self.DB_HOST, self.DB_NAME]):
             raise RuntimeError("Variables DB_USER, DB_PASSWORD, DB_HOST, DB_NAME son requeridas")
-        DB_URL = (
-            f"postgresql+psycopg2://{quote_plus(DB_USER)}:{quote_plus(DB_PASSWORD)}"
-            f"@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+        return (
+            f"postgresql+psycopg2://{quote_plus(self.DB_USER)}:{quote_plus(self.DB_PASSWORD)}"
+            f"@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
         )
 
+    # misma BD con el driver asyncpg (engine async de los routers)
+    @property
+    def ASYNC_DB_URL(self) -> str:
+        url = os.getenv("ASYNC_DB_URL")
+        if url:
+            return url
+        url = self.DB_URL
+        if url.startswith("postgresql+psycopg2://"):
+            return url.replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+    # Pools de conexiones (por proceso; cada engine, sync y async, tiene el suyo)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
     S3_BUCKET = os.getenv("S3_BUCKET")
     AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 
+    # Cola de jobs de OCR (extractor.jobs) y workers
+    OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+    JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    # sin latido en este tiempo un job 'running' se reencola (el worker late cada lease/3)
+    JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "900"))
+    # puerto de /metrics del pool de workers (0 = sin servidor de métricas)
+    WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+    # Caché de extracciones por sha256 (LRU local delante de extractor.extractions)
+    EXTRACTION_CACHE = os.getenv("EXTRACTION_CACHE", "1").lower() in ("1", "true", "yes")
+    EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", "1024"))
+
+    # Caché de proveedores (tenant_id, ruc) -> provider_id
+    PROVIDER_CACHE = os.getenv("PROVIDER_CACHE", "1").lower() in ("1", "true", "yes")
+    PROVIDER_CACHE_SIZE = int(os.getenv("PROVIDER_CACHE_SIZE", "10000"))
+    PROVIDER_CACHE_TTL = float(os.getenv("PROVIDER_CACHE_TTL", "3600"))
+    PROVIDER_CACHE_WARM = int(os.getenv("PROVIDER_CACHE_WARM", "0"))  # top N por tenant al arrancar
+
+    # Procesamiento por lotes (/ocr/process-batch)
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+    BATCH_COMMIT_SIZE = int(os.getenv("BATCH_COMMIT_SIZE", "50"))
+    BATCH_MAX_DOCS = int(os.getenv("BATCH_MAX_DOCS", "5000"))
+    # Excel de registro de compras: filas por INSERT multi-fila
+    EXCEL_BATCH_ROWS = int(os.getenv("EXCEL_BATCH_ROWS", "1000"))
+
+    # APIs de lectura (/invoices, /documents): tamaño de página por defecto y máximo
+    API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", "50"))
+    API_PAGE_MAX = int(os.getenv("API_PAGE_MAX", "500"))
+
 settings = Settings()
@@ -2,21 +2,16 @@
 import os
 import uuid
 import tempfile
-import boto3
 from botocore.exceptions import ClientError
 from sqlalchemy import text
 from fastapi import HTTPException
 
-# Si tienes settings, úsalo para región; si no, ignóralo sin romper
-try:
-    from app.settings import settings
-    _REGION = getattr(settings, "AWS_REGION", None)
-except Exception:
-    settings = None
-    _REGION = None
+from .aws import get_client
+from .config import settings
 
 def s3_client():
-    return boto3.client("s3", region_name=_REGION) if _REGION else boto3.client("s3")
+    # cliente compartido por proceso (pool de conexiones reutilizado entre descargas)
+    return get_client("s3")
 
 def download_to_tmp(bucket: str, key: str) -> str:
     if not bucket or not key:
@@ -26,14 +21,99 @@ def download_to_tmp(bucket: str, key: str) -> str:
     try:
         s3_client().download_file(bucket, key, local_path)
     except ClientError as e:
-        code = e.response.get("Error", {}).get("Code")
-        if code in ("NoSuchKey", "404"):
-            raise HTTPException(status_code=404, detail=f"S3 key no encontrada: s3://{bucket}/{key}")
-        raise HTTPException(status_code=502, detail=f"Fallo descargando de S3: {e}")
+        _raise_s3_error(e, bucket, key)
     if not os.path.exists(local_path) or os.path.getsize(local_path) == 0:
         raise HTTPException(status_code=500, detail="Descarga S3 vacía o corrupta")
     return local_path
 
+def _raise_s3_error(e: ClientError, bucket: str, key: str):
+    code = e.response.get("Error", {}).get("Code")
+    if code in ("NoSuchKey", "404"):
+        raise HTTPException(status_code=404, detail=f"S3 key no encontrada: s3://{bucket}/{key}")
+    raise HTTPException(status_code=502, detail=f"Fallo descargando de S3: {e}")
+
+class S3Object:
+    """
+    Objeto de S3 descargado para procesarlo localmente.
+    Hasta DOWNLOAD_SPOOL_MB vive en un archivo anónimo en memoria (memfd, sin tocar disco);
+    por encima, o donde no hay memfd, se vuelca a un archivo temporal como antes.
+    'path' sirve igual para PIL y para poppler (pdftoppm/pdftotext corren en otro proceso,
+    por eso la ruta apunta a /proc/<pid>/fd/<n> del proceso dueño y no a /proc/self).
+    Usar como context manager: al salir se libera la memoria o se borra el archivo.
+    """
+
+    def __init__(self, key: str, size: int):
+        self.key = key
+        self.size = size
+        self.ext = os.path.splitext(key)[1].lower()
+        self.in_memory = False
+        fd = None
+        if size <= settings.DOWNLOAD_SPOOL_MB * 1024 * 1024 and hasattr(os, "memfd_create"):
+            try:
+                fd = os.memfd_create(f"ocr{self.ext}")
+            except OSError:
+                fd = None
+        if fd is not None and os.path.isdir(f"/proc/{os.getpid()}/fd"):
+            self._fh = os.fdopen(fd, "w+b")
+            self.path = f"/proc/{os.getpid()}/fd/{fd}"
+            self.in_memory = True
+        else:
+            if fd is not None:
+                os.close(fd)
+            self._fh = tempfile.NamedTemporaryFile(prefix="ocr_", suffix=self.ext, delete=False)
+            self.path = self._fh.name
+
+    def write(self, data: bytes) -> None:
+        self._fh.write(data)
+
+    def open(self):
+        """File object binario posicionado al inicio (para librerías que no aceptan ruta)."""
+        self._fh.flush()
+        self._fh.seek(0)
+        return self._fh
+
+    def close(self) -> None:
+        try:
+            self._fh.close()
+        except Exception:
+            pass
+        if not self.in_memory:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def __enter__(self) -> "S3Object":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def download_object(bucket: str, key: str) -> S3Object:
+    """Descarga en streaming a un S3Object (memoria o disco según el tamaño)."""
+    if not bucket or not key:
+        raise ValueError("bucket y key son obligatorios")
+    try:
+        resp = s3_client().get_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        _raise_s3_error(e, bucket, key)
+    size = int(resp.get("ContentLength") or 0)
+    if size == 0:
+        resp["Body"].close()
+        raise HTTPException(status_code=500, detail="Descarga S3 vacía o corrupta")
+
+    obj = S3Object(key, size)
+    try:
+        for chunk in resp["Body"].iter_chunks(1024 * 1024):
+            obj.write(chunk)
+        obj.open()
+    except Exception as e:
+        obj.close()
+        raise HTTPException(status_code=502, detail=f"Fallo descargando de S3: {e}")
+    finally:
+        resp["Body"].close()
+    return obj
+
 def _looks_like_uuid(value: str) -> bool:
     try:
         uuid.UUID(str(value))
@@ -1,27 +1,186 @@
-import boto3
+# app/textract_client.py
+"""
+Textract AnalyzeExpense.
+
+  analyze_expense_s3     API síncrona (una página; PDFs multipágina fallan)
+  analyze_expense_async  StartExpenseAnalysis + GetExpenseAnalysis: sirve para PDFs de
+                         varias páginas; sondea con backoff hasta TEXTRACT_TIMEOUT y
+                         recorre todas las páginas de resultados (NextToken)
+
+Ambas devuelven el mismo esquema que el OCR local ({"engine", "confidence",
+"parsed": {"provider", "invoice", "items"}, "doc_kind"}), listo para materialize_invoices.
+Con TEXTRACT_ENDPOINT_URL el cliente apunta a otro endpoint. Para correr sin AWS,
+bench.textract_stub arma las respuestas del flujo asíncrono con botocore Stubber
+(moto no implementa StartExpenseAnalysis).
+"""
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+
+from .aws import get_client
 from .config import settings
+from .field_extract import FieldScanner, parse_date_any, to_decimal_amount, valid_ruc
+
+log = logging.getLogger(__name__)
+
+ENGINE_TEXTRACT = "textract"
+
+# tipos normalizados de AnalyzeExpense -> campo
+_SUMMARY = {
+    "VENDOR_NAME": "razon_social",
+    "NAME": "razon_social",
+    "TAX_PAYER_ID": "ruc",
+    "VENDOR_VAT_NUMBER": "ruc",
+    "INVOICE_RECEIPT_ID": "numero",
+    "INVOICE_RECEIPT_DATE": "fecha",
+    "TOTAL": "total",
+    "AMOUNT_DUE": "total",
+    "SUBTOTAL": "subtotal",
+    "TAX": "igv",
+}
+_LINE = {
+    "ITEM": "descripcion",
+    "QUANTITY": "cantidad",
+    "UNIT_PRICE": "precio_unit",
+    "PRICE": "total",
+}
+
+
+def _client():
+    return get_client("textract")
+
+
+def _text(node: Optional[Dict[str, Any]]) -> str:
+    return ((node or {}).get("Text") or "").strip()
+
 
-tx = boto3.client("textract", region_name=settings.AWS_REGION)
+def _amount(value: str) -> Optional[str]:
+    # Textract devuelve el monto tal como está impreso, con separadores de miles
+    d = to_decimal_amount(value)
+    return str(d) if d is not None else None
 
-def analyze_expense_s3(bucket: str, key: str) -> dict:
-    resp = tx.analyze_expense(Document={"S3Object": {"Bucket": bucket, "Name": key}})
-    fields, items, confidences = {}, [], []
-    for doc in resp.get("ExpenseDocuments", []):
+
+def normalize_expense(documents: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    ExpenseDocuments -> resultado con el esquema del OCR local. Un PDF puede traer varios
+    ExpenseDocuments (uno por comprobante detectado): gana el primer valor de cada campo
+    y los ítems se concatenan. Lo que Textract no tipifica (RUC, moneda, tipo) se busca
+    con FieldScanner sobre el texto de etiquetas y valores.
+    """
+    fields: Dict[str, Any] = {}
+    confs: List[float] = []
+    items: List[Dict[str, Any]] = []
+    lines: List[str] = []
+    currency: Optional[str] = None
+    for doc in documents:
         for f in doc.get("SummaryFields", []):
-            label = (f.get("LabelDetection") or {}).get("Text") or (f.get("Type") or {}).get("Text") or ""
-            value = (f.get("ValueDetection") or {}).get("Text") or ""
-            conf  = (f.get("ValueDetection") or {}).get("Confidence") or 0.0
-            if label:
-                fields[label.strip().lower()] = value
-                confidences.append(conf)
+            ftype = _text(f.get("Type"))
+            label, value = _text(f.get("LabelDetection")), _text(f.get("ValueDetection"))
+            if label or value:
+                lines.append(f"{label} {value}".strip())
+            field = _SUMMARY.get(ftype)
+            if not field or not value or field in fields:
+                continue
+            fields[field] = value
+            confs.append(float((f.get("ValueDetection") or {}).get("Confidence") or 0.0))
+            if field == "total" and not currency:
+                currency = ((f.get("Currency") or {}).get("Code") or "").upper() or None
         for group in doc.get("LineItemGroups", []):
             for line in group.get("LineItems", []):
-                row = {}
+                row: Dict[str, Any] = {}
                 for fe in line.get("LineItemExpenseFields", []):
-                    k = (fe.get("LabelDetection") or {}).get("Text") or (fe.get("Type") or {}).get("Text") or ""
-                    v = (fe.get("ValueDetection") or {}).get("Text") or ""
-                    if k:
-                        row[k.strip().lower()] = v
-                if row: items.append(row)
-    conf = sum(confidences)/len(confidences) if confidences else None
-    return {"fields": fields, "items": items, "confidence": conf}
+                    key = _LINE.get(_text(fe.get("Type")))
+                    if key and key not in row:
+                        row[key] = _text(fe.get("ValueDetection")) or None
+                if row.get("descripcion") or row.get("total"):
+                    items.append({
+                        "descripcion": row.get("descripcion"),
+                        "cantidad": _amount(row.get("cantidad") or ""),
+                        "precio_unit": _amount(row.get("precio_unit") or ""),
+                        "igv": None,
+                        "total": _amount(row.get("total") or ""),
+                    })
+
+    sc = FieldScanner("\n".join(lines))
+    ruc = "".join(ch for ch in fields.get("ruc", "") if ch.isdigit())
+    if not valid_ruc(ruc):
+        ruc = sc.ruc()
+    kind = (sc.kind() or "factura").lower()
+    total = _amount(fields.get("total", ""))
+    parsed = {
+        "provider": {"ruc": ruc, "razon_social": fields.get("razon_social")},
+        "invoice": {
+            "numero": (fields.get("numero") or "").upper() or sc.number(kind),
+            # fecha ilegible para parse_date_any ("15-MAR-2024", ...): la del texto
+            "fecha": (parse_date_any(fields["fecha"]) if fields.get("fecha") else None) or sc.date(),
+            "moneda": currency if currency in ("PEN", "USD") else sc.currency(),
+            "total": total,
+            "subtotal": _amount(fields.get("subtotal", "")),
+            "igv": _amount(fields.get("igv", "")),
+        },
+        "items": items,
+    }
+    confidence = (sum(confs) / len(confs) / 100) if confs else 0.0
+    return {
+        "engine": ENGINE_TEXTRACT,
+        "confidence": round(min(confidence, 0.99), 4),
+        "doc_kind": kind,
+        "parsed": parsed,
+    }
+
+
+def analyze_expense_s3(bucket: str, key: str) -> Dict[str, Any]:
+    """AnalyzeExpense síncrono (imágenes y PDFs de una página)."""
+    resp = _client().analyze_expense(Document={"S3Object": {"Bucket": bucket, "Name": key}})
+    return normalize_expense(resp.get("ExpenseDocuments", []))
+
+
+def start_expense_analysis(bucket: str, key: str, token: Optional[str] = None) -> str:
+    """Lanza el job y devuelve su JobId. 'token' (p. ej. el sha256) hace idempotente el Start."""
+    kwargs: Dict[str, Any] = {"DocumentLocation": {"S3Object": {"Bucket": bucket, "Name": key}}}
+    if token:
+        kwargs["ClientRequestToken"] = token[:64]
+    return _client().start_expense_analysis(**kwargs)["JobId"]
+
+
+def get_expense_documents(job_id: str, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Espera el job (sondeo con backoff: TEXTRACT_POLL_SECONDS, x1.5, tope 5 s) y devuelve
+    los ExpenseDocuments de todas las páginas de resultados.
+    """
+    client = _client()
+    deadline = time.monotonic() + (timeout or settings.TEXTRACT_TIMEOUT)
+    delay = settings.TEXTRACT_POLL_SECONDS
+    while True:
+        resp = client.get_expense_analysis(JobId=job_id, MaxResults=20)
+        status = resp.get("JobStatus")
+        if status in ("SUCCEEDED", "PARTIAL_SUCCESS"):
+            break
+        if status == "FAILED":
+            raise HTTPException(status_code=502, detail=f"Textract job {job_id} falló: {resp.get('StatusMessage')}")
+        if time.monotonic() + delay > deadline:
+            raise HTTPException(status_code=504, detail=f"Textract job {job_id} no terminó a tiempo")
+        time.sleep(delay)
+        delay = min(delay * 1.5, 5.0)
+
+    if status == "PARTIAL_SUCCESS":
+        log.warning("textract partial job_id=%s warnings=%s", job_id, resp.get("Warnings"))
+    docs = list(resp.get("ExpenseDocuments", []))
+    token = resp.get("NextToken")
+    while token:
+        resp = client.get_expense_analysis(JobId=job_id, MaxResults=20, NextToken=token)
+        docs.extend(resp.get("ExpenseDocuments", []))
+        token = resp.get("NextToken")
+    return docs
+
+
+def analyze_expense_async(bucket: str, key: str, token: Optional[str] = None) -> Dict[str, Any]:
+    """AnalyzeExpense asíncrono (multipágina). Bloquea hasta el resultado: llamar fuera del event loop."""
+    t0 = time.perf_counter()
+    job_id = start_expense_analysis(bucket, key, token)
+    docs = get_expense_documents(job_id)
+    result = normalize_expense(docs)
+    log.info("textract ok job_id=%s docs=%s ms=%.0f", job_id, len(docs), (time.perf_counter() - t0) * 1000)
+    return result
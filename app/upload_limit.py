@@ -0,0 +1,58 @@
+# app/upload_limit.py
+"""
+Tope del cuerpo de las subidas, antes de que Starlette lo parsee.
+
+FastAPI parsea el multipart (y lo vuelca a un SpooledTemporaryFile, en disco si es
+grande) antes de llamar al handler: el chequeo de MAX_UPLOAD_MB en upload_document
+llega tarde para acotar memoria o disco. Este middleware ASGI corta antes:
+
+  - con Content-Length mayor al tope responde 413 sin leer el cuerpo,
+  - sin Content-Length (chunked) cuenta los bytes recibidos y corta con 413 al pasarlo.
+
+El tope es por request, no por archivo: el mayor entre MAX_UPLOAD_MB (archivo suelto)
+y ARCHIVE_MAX_MB (ZIP), más un margen para los campos y cabeceras del multipart.
+Los topes por archivo siguen en el router y en app.archives.
+"""
+from typing import Iterable
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+
+_MULTIPART_SLACK = 64 * 1024
+
+
+def upload_max_bytes() -> int:
+    return max(settings.MAX_UPLOAD_MB, settings.ARCHIVE_MAX_MB) * 1024 * 1024 + _MULTIPART_SLACK
+
+
+class UploadSizeLimit:
+    def __init__(self, app: ASGIApp, paths: Iterable[str]):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        max_bytes = upload_max_bytes()
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > max_bytes:
+            await JSONResponse({"detail": "Archivo muy grande"}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # FastAPI re-lanza el HTTPException del parseo del cuerpo: sale como 413
+                    raise HTTPException(status_code=413, detail="Archivo muy grande")
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,139 @@
+# app/worker.py
+"""
+Pool de workers que drena la cola extractor.jobs.
+
+Uso:
+    python -m app.worker --workers 4
+"""
+import argparse
+import logging
+import multiprocessing as mp
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from fastapi import HTTPException
+
+from app.settings import settings
+from .db import SessionLocal, dispose_engines
+from . import aws, engine_router, jobs, metrics
+from .pipeline import process_document_id
+
+log = logging.getLogger(__name__)
+
+
+@contextmanager
+def _lease_heartbeat(job_id: str, attempt: int) -> Iterator[None]:
+    """
+    Renueva el lease del job cada JOB_LEASE_SECONDS/3 mientras se procesa (Textract,
+    OCR multipágina largo), con su propia sesión: la del job puede estar en medio de
+    una transacción. Sin esto requeue_stale reencola un job vivo y otro worker lo duplica.
+    """
+    done = threading.Event()
+
+    def _beat() -> None:
+        while not done.wait(max(1.0, settings.JOB_LEASE_SECONDS / 3)):
+            try:
+                with SessionLocal() as db:
+                    if not jobs.heartbeat(db, job_id, attempt):
+                        log.warning("ocr.job lease lost job_id=%s attempt=%s", job_id, attempt)
+                        return
+            except Exception:
+                log.exception("ocr.job heartbeat failed job_id=%s", job_id)
+
+    t = threading.Thread(target=_beat, name=f"lease-{job_id}", daemon=True)
+    t.start()
+    try:
+        yield
+    finally:
+        done.set()
+        t.join()
+
+
+def _handle_one(job: dict) -> None:
+    job_id, doc_id, attempts = job["id"], job["document_id"], job["attempts"]
+    with SessionLocal() as db:
+        try:
+            with _lease_heartbeat(job_id, attempts):
+                result = process_document_id(db, doc_id)
+        except Exception as e:
+            db.rollback()
+            # 4xx = error del documento, reintentar no sirve
+            permanent = isinstance(e, HTTPException) and e.status_code < 500
+            retry = (not permanent) and attempts < settings.JOB_MAX_ATTEMPTS
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            owned = jobs.fail_job(db, job_id, attempts, str(detail), retry=retry, backoff_seconds=2 ** attempts)
+            log.warning("ocr.job fail job_id=%s doc_id=%s retry=%s owned=%s err=%s",
+                        job_id, doc_id, retry, owned, detail)
+            return
+        if jobs.finish_job(db, job_id, attempts, result):
+            log.info("ocr.job ok job_id=%s doc_id=%s", job_id, doc_id)
+        else:
+            log.warning("ocr.job ok but lease lost job_id=%s doc_id=%s attempt=%s", job_id, doc_id, attempts)
+
+
+def run_worker(stop: "mp.synchronize.Event") -> None:
+    """Bucle de un worker: reclama un job, lo procesa, repite hasta 'stop'."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # el padre coordina el apagado
+    dispose_engines()  # no reutilizar conexiones heredadas del padre tras el fork
+    aws.reset_clients()
+    last_sweep = 0.0
+    while not stop.is_set():
+        try:
+            now = time.monotonic()
+            if now - last_sweep > settings.JOB_LEASE_SECONDS / 4:
+                with SessionLocal() as db:
+                    jobs.requeue_stale(db, settings.JOB_LEASE_SECONDS, settings.JOB_MAX_ATTEMPTS)
+                last_sweep = now
+
+            with SessionLocal() as db:
+                job = jobs.claim_job(db)
+            if not job:
+                stop.wait(settings.JOB_POLL_SECONDS)
+                continue
+            _handle_one(job)
+        except Exception:
+            log.exception("ocr.worker loop error")
+            stop.wait(settings.JOB_POLL_SECONDS)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Workers de la cola de OCR")
+    parser.add_argument("--workers", type=int, default=settings.OCR_WORKERS)
+    parser.add_argument("--metrics-port", type=int, default=settings.WORKER_METRICS_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+
+    # los workers escriben en PROMETHEUS_MULTIPROC_DIR; el padre expone el agregado
+    metrics.reset_multiprocess_dir()
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+
+    # los engines de OCR se importan una vez aquí y los hijos los heredan por fork
+    engine_router.preload()
+
+    stop = mp.Event()
+
+    def _shutdown(signum, frame):
+        log.info("ocr.worker shutdown signal=%s", signum)
+        stop.set()
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    procs = [
+        mp.Process(target=run_worker, args=(stop,), name=f"ocr-worker-{i}")
+        for i in range(max(1, args.workers))
+    ]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+        metrics.mark_process_dead(p.pid)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Benchmarks offline del servicio de OCR. Cada módulo se corre con `python -m bench.<nombre>`."""
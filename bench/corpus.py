@@ -0,0 +1,332 @@
+# bench/corpus.py
+"""
+Corpus sintético y reproducible de comprobantes para los benchmarks (misma --seed,
+mismos archivos).
+
+Genera facturas y boletas con RUC, serie-número, fecha, moneda, ítems y total conocidos:
+
+  *.png / *.jpg    una página escaneada (PIL) a 150-300 dpi, con inclinación, ruido y blur
+  *.pdf            escaneo multipágina (imágenes; fuerza rasterizado + OCR)
+  *.text.pdf       PDF digital con capa de texto (camino rápido de pdftotext)
+  ledger_*.xlsx    registro de compras (una invoice por fila) y su versión .csv
+
+Junto a cada archivo va un .json con la verdad (mismo nombre), en el formato de bench.preprocess:
+{"kind", "ruc", "numero", "fecha", "moneda", "total", "items", ...}; en los registros,
+{"kind": "ledger", "rows", "total_sum", "first"}. manifest.json lista todo.
+
+    python -m bench.corpus --out corpus/ --docs 60 --ledger-rows 5000 --seed 7
+"""
+import argparse
+import csv
+import json
+import random
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from bench.field_extract import _ruc
+
+CENT = Decimal("0.01")
+A4_IN = (8.27, 11.69)
+ITEMS_PER_PAGE = 22
+
+_NAMES = ["COMERCIAL EL SOL", "DISTRIBUIDORA ANDINA", "INVERSIONES PACIFICO", "FERRETERIA LIMA NORTE",
+          "SERVICIOS GENERALES MIRAFLORES", "GRUPO TEXTIL AREQUIPA", "MINIMARKET SANTA ROSA"]
+_SUFFIX = ["S.A.C.", "S.A.", "E.I.R.L.", "S.R.L."]
+_PRODUCTS = ["ARROZ EXTRA 5KG", "ACEITE VEGETAL 1L", "AZUCAR RUBIA 1KG", "PAPEL BOND A4 X500",
+             "TONER HP 85A", "CABLE UTP CAT6 X M", "SERVICIO DE TRANSPORTE", "MANTENIMIENTO PREVENTIVO",
+             "LECHE EVAPORADA X6", "DETERGENTE 2KG", "GUANTES NITRILO X100", "CEMENTO SOL 42.5KG"]
+
+
+def _money(x: Decimal) -> str:
+    return f"{x:,.2f}"
+
+
+def _font(px: int, bold: bool = False) -> ImageFont.ImageFont:
+    name = "DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf"
+    for path in (name, f"/usr/share/fonts/truetype/dejavu/{name}"):
+        try:
+            return ImageFont.truetype(path, px)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=px)
+
+
+# ------------ Comprobante (verdad) ------------
+
+def make_invoice(rng: random.Random, i: int, max_items: Optional[int] = None) -> Dict[str, Any]:
+    kind = rng.choice(["factura", "boleta"])
+    serie = ("F" if kind == "factura" else "B") + f"{rng.randint(1, 20):03d}"
+    fecha = date(2024, 1, 1) + timedelta(days=rng.randint(0, 600))
+    moneda = rng.choices(["PEN", "USD"], weights=[4, 1])[0]
+    n_items = rng.choice([1, 2, 3, 5, 8, 12]) if rng.random() < 0.85 else rng.randint(25, 45)
+    n_items = min(n_items, max_items or n_items)
+    items = []
+    for _ in range(n_items):
+        qty = Decimal(rng.randint(1, 24))
+        unit = (Decimal(rng.randint(150, 250000)) / 100).quantize(CENT)
+        items.append({
+            "descripcion": rng.choice(_PRODUCTS),
+            "cantidad": str(qty),
+            "precio_unit": str(unit),
+            "total": str((qty * unit).quantize(CENT)),
+        })
+    subtotal = sum(Decimal(it["total"]) for it in items)
+    igv = (subtotal * Decimal("0.18")).quantize(CENT, ROUND_HALF_UP)
+    return {
+        "id": f"{kind}_{i:04d}",
+        "kind": kind,
+        "ruc": _ruc(rng),
+        "razon_social": f"{rng.choice(_NAMES)} {rng.choice(_SUFFIX)}",
+        "numero": f"{serie}-{rng.randint(1, 99999):08d}",
+        "fecha": fecha.isoformat(),
+        "moneda": moneda,
+        "subtotal": str(subtotal),
+        "igv": str(igv),
+        "total": str(subtotal + igv),
+        "items": items,
+    }
+
+
+def invoice_pages(inv: Dict[str, Any]) -> List[List[Tuple[str, Tuple[str, ...]]]]:
+    """Páginas como listas de líneas (estilo, celdas); los totales van en la última."""
+    sym = "S/" if inv["moneda"] == "PEN" else "US$"
+    titulo = "FACTURA ELECTRÓNICA" if inv["kind"] == "factura" else "BOLETA DE VENTA ELECTRÓNICA"
+    fecha = date.fromisoformat(inv["fecha"]).strftime("%d/%m/%Y")
+    head = [
+        ("title", (inv["razon_social"],)),
+        ("text", ("AV. JAVIER PRADO ESTE 1234 - SAN ISIDRO - LIMA",)),
+        ("title", (f"R.U.C. N° {inv['ruc']}",)),
+        ("title", (titulo,)),
+        ("title", (inv["numero"],)),
+        ("text", (f"Fecha de Emisión: {fecha}",)),
+        ("text", (f"Moneda: {'SOLES' if inv['moneda'] == 'PEN' else 'DÓLARES AMERICANOS'}",)),
+        ("text", ("",)),
+        ("row", ("CANT.", "DESCRIPCIÓN", "P. UNIT.", "IMPORTE")),
+    ]
+    rows = [("row", (it["cantidad"], it["descripcion"], _money(Decimal(it["precio_unit"])),
+                     _money(Decimal(it["total"])))) for it in inv["items"]]
+    totals = [
+        ("text", ("",)),
+        ("total", (f"OP. GRAVADA {sym}", _money(Decimal(inv["subtotal"])))),
+        ("total", (f"I.G.V. 18% {sym}", _money(Decimal(inv["igv"])))),
+        ("total", (f"IMPORTE TOTAL {sym}", _money(Decimal(inv["total"])))),
+        ("text", ("",)),
+        ("text", (f"Representación impresa de la {titulo.lower()}",)),
+    ]
+    chunks = [rows[k:k + ITEMS_PER_PAGE] for k in range(0, len(rows), ITEMS_PER_PAGE)] or [[]]
+    pages = []
+    for n, chunk in enumerate(chunks):
+        page = (head if n == 0 else [("text", (f"{inv['numero']} - página {n + 1}",)), head[-1]]) + chunk
+        if n == len(chunks) - 1:
+            page += totals
+        pages.append(page)
+    return pages
+
+
+# ------------ Render a imagen ------------
+
+_COLS = (0.08, 0.18, 0.64, 0.80)  # x de cada columna de la tabla (fracción del ancho)
+
+
+def render_page(lines, dpi: int) -> Image.Image:
+    w, h = int(A4_IN[0] * dpi), int(A4_IN[1] * dpi)
+    img = Image.new("L", (w, h), 255)
+    d = ImageDraw.Draw(img)
+    pt = dpi / 72
+    regular, bold = _font(int(10 * pt)), _font(int(12 * pt), bold=True)
+    y = int(0.6 * dpi)
+    for style, cells in lines:
+        if style == "title":
+            d.text((int(0.08 * w), y), cells[0], font=bold, fill=0)
+            y += int(17 * pt)
+        elif style == "row":
+            for x, cell in zip(_COLS, cells):
+                d.text((int(x * w), y), cell, font=regular, fill=0)
+            y += int(14 * pt)
+        elif style == "total":
+            d.text((int(0.50 * w), y), cells[0], font=regular, fill=0)
+            d.text((int(0.80 * w), y), cells[1], font=regular, fill=0)
+            y += int(14 * pt)
+        else:
+            d.text((int(0.08 * w), y), cells[0], font=regular, fill=0)
+            y += int(14 * pt)
+    return img
+
+
+def degrade(img: Image.Image, rng: random.Random, skew: float, noise: float, blur: float) -> Image.Image:
+    """Escaneo imperfecto: inclinación, blur y ruido gaussiano + sal y pimienta."""
+    if skew:
+        img = img.rotate(skew, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    if blur:
+        img = img.filter(ImageFilter.GaussianBlur(blur))
+    if noise:
+        nrng = np.random.default_rng(rng.randrange(2 ** 32))
+        a = np.asarray(img, dtype=np.float32)
+        a = a + nrng.normal(0, noise, a.shape)
+        specks = nrng.random(a.shape)
+        a[specks < 0.0008] = 0
+        a[specks > 0.9995] = 255
+        img = Image.fromarray(np.clip(a, 0, 255).astype(np.uint8))
+    return img
+
+
+# ------------ PDF con capa de texto (sin dependencias) ------------
+
+def _pdf_str(s: str) -> str:
+    b = s.encode("cp1252", errors="replace").decode("latin-1")
+    return "(" + b.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def write_text_pdf(path: Path, pages) -> None:
+    """PDF mínimo con Helvetica (WinAnsi): pdftotext recupera el texto tal cual."""
+    W, H = 595, 842
+    objs: List[bytes] = []
+    kids = []
+    font_id, pages_id = 3, 2
+    next_id = 4
+    for lines in pages:
+        ops = ["BT"]
+        y = H - 50
+        for style, cells in lines:
+            size = 12 if style == "title" else 9
+            xs = ([0.08] if style in ("title", "text") else _COLS if style == "row" else (0.50, 0.80))
+            for x, cell in zip(xs, cells):
+                ops.append(f"/F1 {size} Tf 1 0 0 1 {x * W:.1f} {y} Tm {_pdf_str(cell)} Tj")
+            y -= 16 if style == "title" else 13
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        page_id, content_id = next_id, next_id + 1
+        next_id += 2
+        kids.append(page_id)
+        objs.append(f"{page_id} 0 obj << /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {W} {H}] "
+                    f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >> endobj\n".encode())
+        objs.append(f"{content_id} 0 obj << /Length {len(stream)} >> stream\n".encode() + stream + b"\nendstream endobj\n")
+    head = [
+        b"1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n",
+        f"2 0 obj << /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >> endobj\n".encode(),
+        b"3 0 obj << /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >> endobj\n",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for obj in head + objs:
+        offsets.append(len(out))
+        out += obj
+    xref = len(out)
+    out += f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{o:010d} 00000 n \n".encode() for o in offsets)
+    out += f"trailer << /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(bytes(out))
+
+
+# ------------ Registros de compras (Excel / CSV) ------------
+
+LEDGER_HEADER = ("Fecha Emisión", "Tipo", "Serie", "Número", "RUC", "Razón Social", "Moneda",
+                 "Base Imponible", "IGV", "Total")
+
+
+def ledger_rows(rng: random.Random, n: int):
+    for i in range(n):
+        inv = make_invoice(rng, i)
+        serie, num = inv["numero"].split("-")
+        yield (date.fromisoformat(inv["fecha"]), "01" if inv["kind"] == "factura" else "03", serie, num,
+               inv["ruc"], inv["razon_social"], inv["moneda"], Decimal(inv["subtotal"]),
+               Decimal(inv["igv"]), Decimal(inv["total"]))
+
+
+def write_ledgers(out: Path, rng: random.Random, rows: int) -> List[str]:
+    from openpyxl import Workbook
+
+    data = list(ledger_rows(rng, rows))
+    total_sum = sum(r[-1] for r in data)
+    first = data[0]
+    truth = {
+        "kind": "ledger",
+        "rows": rows,
+        "total_sum": str(total_sum),
+        "first": {"ruc": first[4], "numero": f"{first[2]}-{first[3]}", "fecha": first[0].isoformat(),
+                  "moneda": first[6], "total": str(first[9])},
+    }
+    name = f"ledger_{rows}"
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Registro de Compras")
+    ws.append(["REGISTRO DE COMPRAS - PERIODO 2024"])  # la cabecera real no está en la primera fila
+    ws.append([])
+    ws.append(list(LEDGER_HEADER))
+    for r in data:
+        ws.append([r[0], r[1], r[2], r[3], r[4], r[5], r[6], float(r[7]), float(r[8]), float(r[9])])
+    ws.append([None, None, None, None, None, "TOTAL", None, None, None, float(total_sum)])
+    wb.save(out / f"{name}.xlsx")
+    with open(out / f"{name}.csv", "w", encoding="utf-8", newline="") as fh:
+        w = csv.writer(fh, delimiter=";")
+        w.writerow(LEDGER_HEADER)
+        for r in data:
+            w.writerow([r[0].strftime("%d/%m/%Y"), *r[1:7], *(f"{x:.2f}" for x in r[7:])])
+    (out / f"{name}.json").write_text(json.dumps(truth, indent=2), encoding="utf-8")  # vale para ambos
+    return [f"{name}.xlsx", f"{name}.csv"]
+
+
+# ------------ Generación ------------
+
+def write_invoice(out: Path, inv: Dict[str, Any], rng: random.Random, fmt: str) -> Tuple[str, Dict[str, Any]]:
+    pages = invoice_pages(inv)
+    dpi = rng.choice([150, 200, 300])
+    skew = round(rng.uniform(-2.5, 2.5), 2) if rng.random() < 0.6 else 0.0
+    noise = round(rng.uniform(4, 18), 1) if rng.random() < 0.6 else 0.0
+    blur = 0.6 if rng.random() < 0.25 else 0.0
+    meta = {"format": fmt, "pages": len(pages), "dpi": dpi, "skew": skew, "noise": noise, "blur": blur}
+    if fmt == "text.pdf":
+        name = f"{inv['id']}.text.pdf"
+        write_text_pdf(out / name, pages)
+        meta.update(dpi=None, skew=0.0, noise=0.0, blur=0.0)
+    else:
+        images = [degrade(render_page(p, dpi), rng, skew, noise, blur) for p in pages]
+        name = f"{inv['id']}.{fmt}"
+        if fmt == "pdf":
+            images[0].save(out / name, save_all=True, append_images=images[1:], resolution=dpi)
+        else:
+            images[0].save(out / name, dpi=(dpi, dpi), **({"quality": 80} if fmt == "jpg" else {}))
+    truth = {k: inv[k] for k in ("kind", "ruc", "numero", "fecha", "moneda", "total", "items")}
+    truth.update(meta)
+    (out / name).with_suffix(".json").write_text(json.dumps(truth, indent=2, ensure_ascii=False), encoding="utf-8")
+    return name, truth
+
+
+def build_corpus(out: Path, docs: int, ledger_rows_n: int, seed: int,
+                 formats: Optional[List[str]] = None) -> Dict[str, Any]:
+    out.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    formats = formats or ["png", "jpg", "pdf", "text.pdf"]
+    samples = []
+    for i in range(docs):
+        fmt = formats[i % len(formats)]
+        # una imagen es una sola página: sus ítems tienen que entrar en ella
+        inv = make_invoice(rng, i, max_items=ITEMS_PER_PAGE if fmt in ("png", "jpg") else None)
+        name, truth = write_invoice(out, inv, rng, fmt)
+        samples.append({"file": name, "format": truth["format"], "kind": truth["kind"], "pages": truth["pages"]})
+    if ledger_rows_n:
+        for name in write_ledgers(out, rng, ledger_rows_n):
+            samples.append({"file": name, "format": name.rsplit(".", 1)[1], "kind": "ledger", "pages": None})
+    manifest = {"seed": seed, "docs": docs, "ledger_rows": ledger_rows_n, "formats": formats, "samples": samples}
+    (out / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--out", type=Path, required=True)
+    ap.add_argument("--docs", type=int, default=40, help="facturas/boletas a generar")
+    ap.add_argument("--ledger-rows", type=int, default=2000, help="filas del registro xlsx/csv (0 = sin registro)")
+    ap.add_argument("--formats", nargs="+", default=None, choices=["png", "jpg", "pdf", "text.pdf"])
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    m = build_corpus(args.out, args.docs, args.ledger_rows, args.seed, args.formats)
+    print(f"{len(m['samples'])} archivos -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# bench/early_stop.py
+"""
+Cuántas páginas se salta el early stop de OCR (OCR_EARLY_STOP) y si alguna vez cambia
+un campo. Sin tesseract: el texto de cada página es el que imprime bench.corpus (lo
+que devolvería un OCR perfecto), y se recorre página por página como _ocr_pages,
+cortando en cuanto FieldScanner.settled() da True sobre el prefijo del documento.
+
+Los comprobantes del corpus traen los totales en la última página, así que solo se
+corta antes cuando hay páginas detrás: --annex agrega 0..N páginas anexas al final
+(guía de remisión, condiciones, tipo de cambio), como en los escaneos reales, con RUC,
+números, fechas y montos que no deben ganarle a los del comprobante.
+
+    python -m bench.early_stop --docs 2000 --annex 3
+    python -m bench.early_stop --docs 2000 --annex 0 --out early_stop.json
+
+Reporta páginas totales / procesadas / saltadas, documentos cortados por tipo y moneda,
+campos que cambian respecto de leer todo y aciertos por campo contra la verdad en
+ambos casos. El único cambio esperado es la moneda (ver FieldScanner.settled): un USD
+en un anexo ya no pisa el PEN del IMPORTE TOTAL.
+"""
+import argparse
+import json
+import random
+from collections import Counter
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.field_extract import FieldScanner
+from bench.corpus import invoice_pages, make_invoice
+from bench.field_extract import _ruc
+
+_ANNEX = [
+    lambda rng: [
+        "GUÍA DE REMISIÓN REMITENTE",
+        f"T{rng.randint(1, 9):03d}-{rng.randint(1, 99999):08d}",
+        f"RUC DESTINATARIO: {_ruc(rng)}",
+        f"FECHA DE TRASLADO: {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025",
+        "MOTIVO: VENTA",
+        f"PESO BRUTO TOTAL: {rng.randint(1, 900)}.00 KG",
+    ],
+    lambda rng: [
+        "CONDICIONES DE VENTA",
+        "Los precios incluyen IGV. No se aceptan devoluciones pasados 7 días.",
+        f"Cuenta corriente BCP USD 193-{rng.randint(1000000, 9999999)}-1-{rng.randint(10, 99)}",
+        f"FECHA: {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025",
+    ],
+    lambda rng: [
+        "TIPO DE CAMBIO REFERENCIAL",
+        f"1 USD = S/ 3.{rng.randint(600, 899)}",
+        f"TOTAL DOLARES {rng.randint(10, 9999)}.{rng.randint(0, 99):02d}",
+    ],
+]
+
+
+def document_pages(rng: random.Random, i: int, annex: int) -> Dict[str, Any]:
+    inv = make_invoice(rng, i)
+    pages = ["\n".join("  ".join(cells) for _, cells in page) for page in invoice_pages(inv)]
+    for _ in range(rng.randint(0, annex)):
+        pages.append("\n".join(rng.choice(_ANNEX)(rng)))
+    truth = {"ruc": inv["ruc"], "numero": inv["numero"], "fecha": inv["fecha"],
+             "moneda": inv["moneda"], "total": Decimal(inv["total"])}
+    return {"kind": inv["kind"], "moneda": inv["moneda"], "pages": pages, "truth": truth}
+
+
+def run(doc: Dict[str, Any]) -> Dict[str, Any]:
+    kind, pages = doc["kind"], doc["pages"]
+    done: List[str] = []
+    for page in pages:
+        done.append(page)
+        if FieldScanner("\n".join(done)).settled(kind):
+            break
+    stopped = FieldScanner("\n".join(done)).fields(kind)
+    full = FieldScanner("\n".join(pages)).fields(kind)
+    return {
+        "pages": len(pages),
+        "ocr_pages": len(done),
+        "changed": [k for k in full if stopped[k] != full[k]],
+        "hits": {k: (stopped[k] == v, full[k] == v) for k, v in doc["truth"].items()},
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--docs", type=int, default=1000)
+    ap.add_argument("--annex", type=int, default=2, help="máximo de páginas anexas por documento (0..N al azar)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", type=Path, default=None, help="archivo JSON de salida (por defecto stdout)")
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    stopped: Counter = Counter()
+    docs: Counter = Counter()
+    changed: Counter = Counter()
+    hits_stop: Counter = Counter()
+    hits_full: Counter = Counter()
+    pages = ocr_pages = 0
+    for i in range(args.docs):
+        doc = document_pages(rng, i, args.annex)
+        r = run(doc)
+        group = f"{doc['kind']}/{doc['moneda']}"
+        docs[group] += 1
+        stopped[group] += r["ocr_pages"] < r["pages"]
+        pages += r["pages"]
+        ocr_pages += r["ocr_pages"]
+        changed.update(r["changed"])
+        for k, (on_stop, on_full) in r["hits"].items():
+            hits_stop[k] += on_stop
+            hits_full[k] += on_full
+
+    report = {
+        "docs": args.docs,
+        "annex_max": args.annex,
+        "pages": pages,
+        "ocr_pages": ocr_pages,
+        "pages_skipped": pages - ocr_pages,
+        "pages_skipped_pct": round(100 * (pages - ocr_pages) / pages, 1) if pages else None,
+        "docs_stopped_early": {g: f"{stopped[g]}/{n}" for g, n in sorted(docs.items())},
+        "changed_by_field": dict(changed),
+        "accuracy_by_field": {k: {"early_stop": round(hits_stop[k] / args.docs, 4),
+                                  "full": round(hits_full[k] / args.docs, 4)} for k in sorted(hits_full)},
+    }
+    out = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        args.out.write_text(out, encoding="utf-8")
+        print(f"{report['pages_skipped']}/{pages} páginas saltadas ({report['pages_skipped_pct']}%)  "
+              f"changed={dict(changed)}  -> {args.out}")
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# bench/ocr_backends.py
+"""
+Throughput de OCR por backend: pytesseract (un proceso `tesseract` por página) vs
+tesserocr (motores persistentes en pool).
+
+Usa las imágenes/PDFs de --samples o, si no se pasa, páginas sintéticas tipo
+boleta generadas con PIL. Cada backend procesa las mismas páginas con --threads
+hilos; se reporta páginas/s y latencia por página.
+
+    python -m bench.ocr_backends --samples muestras/ --threads 1 2 4 --repeat 3
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+from PIL import Image, ImageDraw
+
+from app.ocr_backends import PytesseractBackend, TesserocrBackend, tesserocr
+from app.ocr_local import _iter_pdf_pages
+from app.ocr_preprocess import preprocess
+
+
+def synthetic_pages(n: int) -> List[Image.Image]:
+    pages = []
+    for i in range(n):
+        img = Image.new("L", (1240, 1000), 255)
+        d = ImageDraw.Draw(img)
+        lines = [
+            "COMERCIAL EL SOL S.A.C.",
+            f"RUC: 2060{i:07d}",
+            f"BOLETA DE VENTA ELECTRONICA B001-{i:08d}",
+            f"FECHA DE EMISION: {1 + i % 28:02d}/03/2024",
+            "CANT  DESCRIPCION            P.UNIT   IMPORTE",
+            "1     ARROZ EXTRA 5KG         24.90    24.90",
+            "2     ACEITE 1L               9.50     19.00",
+            f"IMPORTE TOTAL: S/ {43.90 + i:.2f}",
+        ]
+        for j, line in enumerate(lines):
+            d.text((60, 60 + j * 40), line, fill=0)
+        pages.append(img.resize((2480, 2000)))
+    return pages
+
+
+def load_pages(samples: Path, tmp: str) -> List[Image.Image]:
+    pages: List[Image.Image] = []
+    for p in sorted(samples.iterdir()):
+        suf = p.suffix.lower()
+        if suf == ".pdf":
+            for path in _iter_pdf_pages(str(p), tmp):
+                with Image.open(path) as im:
+                    pages.append(im.copy())
+        elif suf in (".png", ".jpg", ".jpeg", ".tif", ".tiff"):
+            with Image.open(p) as im:
+                pages.append(im.copy())
+    return pages
+
+
+def run(backend, pages: List[Image.Image], threads: int, repeat: int) -> None:
+    lat: List[float] = []
+
+    def one(img):
+        t0 = time.perf_counter()
+        backend.image_to_string(img, dpi=300)
+        lat.append(time.perf_counter() - t0)
+
+    backend.image_to_string(pages[0], dpi=300)  # calentamiento (carga del traineddata)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        list(ex.map(one, pages * repeat))
+    wall = time.perf_counter() - t0
+    n = len(pages) * repeat
+    lat.sort()
+    print(f"{backend.name:<12} threads={threads:<2} pages={n:<4} {n / wall:7.2f} pág/s  "
+          f"p50={statistics.median(lat) * 1000:7.1f}ms  p95={lat[int(0.95 * (len(lat) - 1))] * 1000:7.1f}ms")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--samples", type=Path, help="carpeta con imágenes/PDFs (por defecto: sintéticas)")
+    ap.add_argument("--pages", type=int, default=8, help="páginas sintéticas si no hay --samples")
+    ap.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    ap.add_argument("--repeat", type=int, default=2)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_ocr_") as tmp:
+        pages = load_pages(args.samples, tmp) if args.samples else synthetic_pages(args.pages)
+    if not pages:
+        raise SystemExit("no hay páginas para procesar")
+    # mismo preprocesamiento que en producción, fuera del tiempo medido
+    pages = [preprocess(p)[0] for p in pages]
+
+    for threads in args.threads:
+        run(PytesseractBackend(), pages, threads, args.repeat)
+        if tesserocr is not None:
+            run(TesserocrBackend(size=threads), pages, threads, args.repeat)
+        else:
+            print("tesserocr     no instalado (pip install tesserocr); solo se midió pytesseract")
+
+
+if __name__ == "__main__":
+    main()
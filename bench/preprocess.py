@@ -0,0 +1,104 @@
+# bench/preprocess.py
+"""
+Modo benchmark del preprocesamiento: tiempo de OCR y tasa de aciertos de campos
+por configuración de OCR_PREPROCESS sobre un set local de muestras.
+
+Cada muestra es una imagen (.png/.jpg) o PDF con un .json al lado (mismo nombre)
+con los valores esperados: {"ruc", "numero", "fecha", "moneda", "total", "kind"}.
+
+    python -m bench.preprocess --samples muestras/ \\
+        --settings "none" "gray" "gray,binarize" "gray,crop,rescale" "gray,binarize,deskew,crop,rescale"
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+import pytesseract
+from PIL import Image
+
+from app.field_extract import FieldScanner
+from app.ocr_local import _iter_pdf_pages
+from app.ocr_preprocess import parse_steps, preprocess
+
+FIELDS = ("ruc", "numero", "fecha", "moneda", "total")
+DEFAULT_SETTINGS = ["none", "gray", "gray,binarize", "gray,crop,rescale", "gray,binarize,deskew,crop,rescale"]
+
+
+def _pages(path: Path, tmp: str) -> List[Image.Image]:
+    if path.suffix.lower() == ".pdf":
+        return [Image.open(p) for p in _iter_pdf_pages(str(path), tmp)]
+    return [Image.open(path)]
+
+
+def field_hits(text: str, truth: Dict) -> Dict[str, bool]:
+    sc = FieldScanner(text)
+    got = sc.fields(truth.get("kind") or sc.kind() or "factura")
+    out = {}
+    for f in FIELDS:
+        if truth.get(f) is None:
+            continue
+        val = got.get(f)
+        if f == "total" and val is not None:
+            out[f] = abs(float(val) - float(truth[f])) < 0.005
+        else:
+            out[f] = val is not None and str(val).upper() == str(truth[f]).upper()
+    return out
+
+
+def run_setting(spec: str, samples: List[Path]) -> Dict:
+    steps = [] if spec == "none" else parse_steps(spec)
+    step_times: Dict[str, List[float]] = defaultdict(list)
+    ocr_times: List[float] = []
+    hits = total = 0
+    per_field: Dict[str, List[bool]] = defaultdict(list)
+    with tempfile.TemporaryDirectory(prefix="bench_pp_") as tmp:
+        for sample in samples:
+            truth = json.loads(sample.with_suffix(".json").read_text(encoding="utf-8"))
+            texts = []
+            for page in _pages(sample, tmp):
+                img, timings, dpi = preprocess(page, steps)
+                for k, v in timings.items():
+                    step_times[k].append(v)
+                t0 = time.perf_counter()
+                texts.append(pytesseract.image_to_string(img, lang="spa+eng", config=f"--dpi {dpi}"))
+                ocr_times.append(time.perf_counter() - t0)
+                page.close()
+            for f, ok in field_hits("\n".join(texts), truth).items():
+                per_field[f].append(ok)
+                hits += ok
+                total += 1
+    return {
+        "setting": spec,
+        "pages": len(ocr_times),
+        "ocr_ms_mean": round(statistics.mean(ocr_times) * 1000, 1) if ocr_times else None,
+        "ocr_ms_total": round(sum(ocr_times) * 1000, 1),
+        "preprocess_ms_mean": {k: round(statistics.mean(v) * 1000, 2) for k, v in step_times.items()},
+        "field_hit_rate": round(hits / total, 4) if total else None,
+        "field_hit_rate_by_field": {f: round(sum(v) / len(v), 4) for f, v in per_field.items()},
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--samples", required=True, help="carpeta con muestras + .json de verdad")
+    ap.add_argument("--settings", nargs="+", default=DEFAULT_SETTINGS)
+    ap.add_argument("--out", default=None, help="archivo JSON de salida (por defecto stdout)")
+    args = ap.parse_args()
+
+    samples = sorted(p for p in Path(args.samples).iterdir()
+                     if p.suffix.lower() in (".png", ".jpg", ".jpeg", ".pdf") and p.with_suffix(".json").exists())
+    report = {"samples": len(samples), "results": [run_setting(s, samples) for s in args.settings]}
+    out = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(out, encoding="utf-8")
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# bench/s3_clients.py
+"""
+Overhead de S3 por documento: cliente nuevo por documento (antes) vs cliente
+cacheado de app.aws (después).
+
+Modo offline (por defecto): mide construcción del cliente + una llamada stubbeada
+(sin red), que es lo que cambia entre ambos esquemas.
+Modo real: con --bucket/--key hace un head_object real por documento, lo que
+incluye el handshake TLS que el cliente cacheado se ahorra.
+
+    python -m bench.s3_clients --docs 200
+    python -m bench.s3_clients --docs 50 --bucket mi-bucket --key uploads/x.pdf
+"""
+import argparse
+import json
+import statistics
+import time
+
+import boto3
+from botocore.stub import Stubber
+
+from app.aws import get_client, reset_clients
+from app.config import settings
+
+
+def _call(client, bucket, key, offline: bool) -> None:
+    if offline:
+        with Stubber(client) as stub:
+            stub.add_response("head_object", {"ContentLength": 1}, {"Bucket": bucket, "Key": key})
+            client.head_object(Bucket=bucket, Key=key)
+    else:
+        client.head_object(Bucket=bucket, Key=key)
+
+
+def _run(label: str, make_client, docs: int, bucket: str, key: str, offline: bool) -> dict:
+    times = []
+    for _ in range(docs):
+        t0 = time.perf_counter()
+        _call(make_client(), bucket, key, offline)
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return {
+        "mode": label,
+        "docs": docs,
+        "mean_ms": round(statistics.mean(times), 3),
+        "p50_ms": round(times[len(times) // 2], 3),
+        "p95_ms": round(times[int(len(times) * 0.95) - 1], 3),
+        "total_s": round(sum(times) / 1000, 3),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--docs", type=int, default=200)
+    ap.add_argument("--bucket", default=None)
+    ap.add_argument("--key", default="bench/object")
+    args = ap.parse_args()
+
+    offline = not args.bucket
+    bucket = args.bucket or "bench-bucket"
+
+    before = _run("new-client-per-doc",
+                  lambda: boto3.client("s3", region_name=settings.AWS_REGION),
+                  args.docs, bucket, args.key, offline)
+    reset_clients()
+    after = _run("cached-client", lambda: get_client("s3"), args.docs, bucket, args.key, offline)
+
+    print(json.dumps({
+        "offline": offline,
+        "results": [before, after],
+        "speedup_mean": round(before["mean_ms"] / after["mean_ms"], 1) if after["mean_ms"] else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+# bench/suite.py
+"""
+Suite de rendimiento y precisión sobre un corpus con verdad (ver bench.corpus).
+
+Por cada archivo corre lo mismo que el pipeline, sin BD ni S3:
+
+  PDF / imagen   extract_text_with_engine -> parse_factura_local / parse_boleta_local
+  xlsx / csv     parse_excel_local (primera fila) + iter_ledger_invoices (todas las filas)
+
+y reporta, por formato y en total: docs/s, percentiles (p50/p95/p99) de cada etapa
+(las de app.metrics: pdftext, rasterize, ocr_page, más text/parse/ledger del runner),
+pico de RSS (proceso y subprocesos: tesseract, pdftoppm) y aciertos por campo.
+
+    python -m bench.corpus --out corpus/ --docs 60
+    python -m bench.suite corpus/ --out results.json
+    python -m bench.suite corpus/ --out new.json --baseline results.json   # compara corridas
+
+La salida JSON incluye la configuración de OCR y el commit, para comparar corridas.
+"""
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app import metrics
+from app.config import settings
+from app.excel_stream import iter_ledger_invoices
+from app.field_extract import FieldScanner
+from app.ocr_local import (
+    PARSER_VERSION,
+    extract_text_with_engine,
+    parse_boleta_local,
+    parse_excel_local,
+    parse_factura_local,
+)
+
+_SUFFIXES = (".png", ".jpg", ".jpeg", ".pdf", ".xlsx", ".csv")
+
+
+def _fmt(path: Path) -> str:
+    name = path.name.lower()
+    return "text.pdf" if name.endswith(".text.pdf") else path.suffix.lower().lstrip(".")
+
+
+def _pct(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    s = sorted(values)
+    return s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
+
+
+def _ms(v: Optional[float]) -> Optional[float]:
+    return round(v * 1000, 2) if v is not None else None
+
+
+def _same_amount(a: Any, b: Any) -> bool:
+    try:
+        return abs(Decimal(str(a)) - Decimal(str(b))) < Decimal("0.005")
+    except Exception:
+        return False
+
+
+def _items_ok(got: List[Dict[str, Any]], want: List[Dict[str, Any]]) -> bool:
+    return len(got) == len(want) and all(_same_amount(g.get("total"), w["total"]) for g, w in zip(got, want))
+
+
+def invoice_hits(result: Dict[str, Any], kind: str, truth: Dict[str, Any]) -> Dict[str, bool]:
+    inv = result["parsed"]["invoice"]
+    got = {
+        "kind": kind,
+        "ruc": result["parsed"]["provider"].get("ruc"),
+        "numero": inv.get("numero"),
+        "fecha": inv.get("fecha"),
+        "moneda": inv.get("moneda"),
+    }
+    hits = {f: got[f] is not None and str(got[f]).upper() == str(truth[f]).upper() for f in got}
+    hits["total"] = _same_amount(inv.get("total"), truth["total"])
+    if truth.get("items"):
+        hits["items"] = _items_ok(result["parsed"].get("items") or [], truth["items"])
+    return hits
+
+
+def run_document(path: Path, truth: Dict[str, Any]) -> Dict[str, Any]:
+    with metrics.document(path.name) as rec:
+        with metrics.stage("text"):
+            raw, engine = extract_text_with_engine(str(path))
+        with metrics.stage("parse"):
+            sc = FieldScanner(raw)
+            kind = (sc.kind() or "factura").lower()
+            result = parse_boleta_local(raw, sc) if kind == "boleta" else parse_factura_local(raw, sc)
+        metrics.set_engine(engine)
+    return {"stages": dict(rec.stages), "pages": rec.pages, "engine": engine,
+            "hits": invoice_hits(result, kind, truth)}
+
+
+def run_ledger(path: Path, truth: Dict[str, Any]) -> Dict[str, Any]:
+    fmt = _fmt(path)
+    with metrics.document(path.name) as rec:
+        first: Optional[Dict[str, Any]] = None
+        if fmt == "xlsx":
+            with metrics.stage("parse"), open(path, "rb") as fh:
+                first = parse_excel_local(fh)
+        rows, total = 0, Decimal(0)
+        with metrics.stage("ledger"), open(path, "rb") as fh:
+            for res in iter_ledger_invoices(fh, fmt):
+                if rows == 0 and first is None:
+                    first = res
+                rows += 1
+                total += Decimal(res["parsed"]["invoice"]["total"])
+        metrics.set_engine("local-excel")
+    want = truth["first"]
+    inv = first["parsed"]["invoice"] if first else {}
+    hits = {
+        "rows": rows == truth["rows"],
+        "total_sum": _same_amount(total, truth["total_sum"]),
+        "ruc": bool(first) and first["parsed"]["provider"].get("ruc") == want["ruc"],
+        "numero": inv.get("numero") == want["numero"],
+        "fecha": inv.get("fecha") == want["fecha"],
+        "moneda": inv.get("moneda") == want["moneda"],
+        "total": _same_amount(inv.get("total"), want["total"]),
+    }
+    return {"stages": dict(rec.stages), "rows": rows, "engine": "local-excel", "hits": hits}
+
+
+def _peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss: KB en Linux, bytes en macOS; 'children' es el mayor subproceso terminado
+    unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 1e6, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 1e6, 1),
+    }
+
+
+def summarize(runs: List[Dict[str, Any]], wall: float) -> Dict[str, Any]:
+    ok = [r for r in runs if "error" not in r]
+    stages: Dict[str, List[float]] = defaultdict(list)
+    hits: Dict[str, List[bool]] = defaultdict(list)
+    for r in ok:
+        for k, v in r["stages"].items():
+            stages[k].append(v)
+        for k, v in r["hits"].items():
+            hits[k].append(v)
+    doc_times = [r["seconds"] for r in ok]
+    all_hits = [h for v in hits.values() for h in v]
+    out = {
+        "docs": len(runs),
+        "errors": len(runs) - len(ok),
+        "docs_per_s": round(len(ok) / wall, 3) if wall else None,
+        "doc_ms": {"p50": _ms(_pct(doc_times, 0.5)), "p95": _ms(_pct(doc_times, 0.95)),
+                   "p99": _ms(_pct(doc_times, 0.99)), "max": _ms(max(doc_times, default=None))},
+        "stage_ms": {k: {"p50": _ms(_pct(v, 0.5)), "p95": _ms(_pct(v, 0.95)), "p99": _ms(_pct(v, 0.99)),
+                         "mean": _ms(sum(v) / len(v))} for k, v in sorted(stages.items())},
+        "accuracy": round(sum(all_hits) / len(all_hits), 4) if all_hits else None,
+        "accuracy_by_field": {k: round(sum(v) / len(v), 4) for k, v in sorted(hits.items())},
+    }
+    pages = sum(r.get("pages") or 0 for r in ok)
+    if pages:
+        out["pages"] = pages
+        out["pages_per_s"] = round(pages / wall, 3)
+    rows = sum(r.get("rows") or 0 for r in ok)
+    if rows:
+        out["rows"] = rows
+        out["rows_per_s"] = round(rows / wall, 1)
+    return out
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5, check=True).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "git": _git_rev(),
+        "parser_version": PARSER_VERSION,
+        "settings": {k: getattr(settings, k, None) for k in (
+            "OCR_BACKEND", "OCR_ENGINE_POOL", "OCR_MODE", "OCR_PREPROCESS", "OCR_PAGE_WORKERS",
+            "OCR_PDFTEXT", "OCR_EARLY_STOP", "OCR_EXTRACT_ITEMS",
+        )},
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Diferencias (nuevo / base) de throughput, latencia p50 y precisión por formato."""
+    out = {}
+    for fmt, cur in report["formats"].items():
+        base = baseline.get("formats", {}).get(fmt)
+        if not base:
+            continue
+        row = {}
+        if cur.get("docs_per_s") and base.get("docs_per_s"):
+            row["docs_per_s_ratio"] = round(cur["docs_per_s"] / base["docs_per_s"], 3)
+        if cur["doc_ms"]["p50"] and base["doc_ms"]["p50"]:
+            row["p50_ratio"] = round(cur["doc_ms"]["p50"] / base["doc_ms"]["p50"], 3)
+        if cur.get("accuracy") is not None and base.get("accuracy") is not None:
+            row["accuracy_delta"] = round(cur["accuracy"] - base["accuracy"], 4)
+        out[fmt] = row
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("corpus", type=Path, help="carpeta generada con bench.corpus (o muestras reales + .json)")
+    ap.add_argument("--out", type=Path, default=None, help="archivo JSON de salida (por defecto stdout)")
+    ap.add_argument("--baseline", type=Path, default=None, help="JSON de una corrida anterior para comparar")
+    ap.add_argument("--formats", nargs="+", default=None, help="solo estos formatos (png jpg pdf text.pdf xlsx csv)")
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--warmup", type=int, default=1, help="documentos OCR sin medir (carga de traineddata)")
+    args = ap.parse_args()
+
+    samples = sorted(p for p in args.corpus.iterdir()
+                     if p.name.lower().endswith(_SUFFIXES) and p.with_suffix(".json").exists())
+    if args.formats:
+        samples = [p for p in samples if _fmt(p) in args.formats]
+    if not samples:
+        raise SystemExit("no hay muestras con .json de verdad en el corpus")
+
+    ocr_samples = [p for p in samples if _fmt(p) not in ("xlsx", "csv")]
+    for p in ocr_samples[:args.warmup]:
+        try:
+            extract_text_with_engine(str(p))
+        except Exception as e:
+            print(f"warmup {p.name}: {e}", file=sys.stderr)
+
+    by_fmt: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    wall: Dict[str, float] = defaultdict(float)
+    for _ in range(args.repeat):
+        for p in samples:
+            fmt = _fmt(p)
+            truth = json.loads(p.with_suffix(".json").read_text(encoding="utf-8"))
+            t0 = time.perf_counter()
+            try:
+                run = run_ledger(p, truth) if fmt in ("xlsx", "csv") else run_document(p, truth)
+            except Exception as e:
+                run = {"file": p.name, "error": f"{type(e).__name__}: {e}"}
+            run["seconds"] = time.perf_counter() - t0
+            wall[fmt] += run["seconds"]
+            by_fmt[fmt].append(run)
+
+    runs = [r for v in by_fmt.values() for r in v]
+    report: Dict[str, Any] = {
+        "env": environment(),
+        "corpus": str(args.corpus),
+        "repeat": args.repeat,
+        "total": summarize(runs, sum(wall.values())),
+        "formats": {fmt: summarize(v, wall[fmt]) for fmt, v in sorted(by_fmt.items())},
+        "peak_rss_mb": _peak_rss_mb(),
+        "errors": sorted({r["error"] for r in runs if "error" in r})[:20],
+    }
+    if args.baseline:
+        report["vs_baseline"] = compare(report, json.loads(args.baseline.read_text(encoding="utf-8")))
+    out = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        args.out.write_text(out, encoding="utf-8")
+        t = report["total"]
+        print(f"{t['docs']} docs  {t['docs_per_s']} docs/s  accuracy={t['accuracy']}  "
+              f"errors={t['errors']}  -> {args.out}")
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
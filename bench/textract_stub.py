@@ -0,0 +1,184 @@
+# bench/textract_stub.py
+"""
+Textract falso, sin red ni credenciales: botocore Stubber sobre el cliente cacheado de
+app.aws, con las respuestas de StartExpenseAnalysis / GetExpenseAnalysis que devuelve
+AWS (IN_PROGRESS mientras corre, SUCCEEDED o PARTIAL_SUCCESS, páginas con NextToken).
+moto no implementa la API de gastos asíncrona, así que TEXTRACT_ENDPOINT_URL no alcanza.
+
+Uso desde código (pruebas manuales, benchmarks):
+
+    docs = [expense_document(fields={"TAX_PAYER_ID": "20100070971", "TOTAL": "1,180.00"},
+                             items=[{"ITEM": "Servicio", "QUANTITY": "1", "PRICE": "1,180.00"}])]
+    with stubbed_expense_analysis("mi-bucket", "uploads/x.pdf", docs, pending=2):
+        result = analyze_expense_async("mi-bucket", "uploads/x.pdf")
+
+CLI: corre el flujo completo (engine "textract" de app.engine_router) contra el stub,
+opcionalmente con la verdad de un corpus (bench.corpus) como respuesta de Textract.
+
+    python -m bench.textract_stub
+    python -m bench.textract_stub --truth corpus/inv_0001.json --pending 3 --page-size 1
+"""
+import argparse
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from botocore.stub import ANY, Stubber
+
+from app.aws import get_client
+from app.config import settings
+
+_SAMPLE_FIELDS = {
+    "VENDOR_NAME": "COMERCIAL ANDINA S.A.C.",
+    "TAX_PAYER_ID": "20100070971",
+    "INVOICE_RECEIPT_ID": "F001-000123",
+    "INVOICE_RECEIPT_DATE": "15/03/2024",
+    "SUBTOTAL": "1,000.00",
+    "TAX": "180.00",
+    "TOTAL": "1,180.00",
+}
+_SAMPLE_ITEMS = [
+    {"ITEM": "Servicio de mantenimiento", "QUANTITY": "1", "UNIT_PRICE": "800.00", "PRICE": "800.00"},
+    {"ITEM": "Repuestos", "QUANTITY": "2", "UNIT_PRICE": "100.00", "PRICE": "200.00"},
+]
+
+
+def _field(ftype: str, value: str, label: Optional[str] = None, confidence: float = 98.0,
+           currency: Optional[str] = None) -> Dict[str, Any]:
+    f: Dict[str, Any] = {
+        "Type": {"Text": ftype, "Confidence": 99.0},
+        "ValueDetection": {"Text": value, "Confidence": confidence},
+    }
+    if label:
+        f["LabelDetection"] = {"Text": label, "Confidence": confidence}
+    if currency:
+        f["Currency"] = {"Code": currency, "Confidence": 99.0}
+    return f
+
+
+def expense_document(fields: Dict[str, str], items: Optional[List[Dict[str, str]]] = None,
+                     index: int = 1, currency: Optional[str] = "PEN", confidence: float = 98.0) -> Dict[str, Any]:
+    """Un ExpenseDocument con SummaryFields {tipo: valor} y líneas [{tipo: valor}]."""
+    summary = [
+        _field(t, v, label=t.replace("_", " "), confidence=confidence,
+               currency=currency if t == "TOTAL" else None)
+        for t, v in fields.items() if v is not None
+    ]
+    lines = [
+        {"LineItemExpenseFields": [_field(t, v, confidence=confidence) for t, v in row.items()]}
+        for row in items or []
+    ]
+    doc: Dict[str, Any] = {"ExpenseIndex": index, "SummaryFields": summary}
+    if lines:
+        doc["LineItemGroups"] = [{"LineItemGroupIndex": 1, "LineItems": lines}]
+    return doc
+
+
+def document_from_truth(truth: Dict[str, Any]) -> Dict[str, Any]:
+    """ExpenseDocument a partir de la verdad de bench.corpus (lo que Textract "leyó" bien)."""
+    inv, prov = truth.get("invoice") or {}, truth.get("provider") or {}
+    fecha = inv.get("fecha")
+    if fecha and len(fecha) == 10 and fecha[4] == "-":
+        fecha = f"{fecha[8:10]}/{fecha[5:7]}/{fecha[0:4]}"  # impreso como dd/mm/aaaa
+    fields = {
+        "VENDOR_NAME": prov.get("razon_social"),
+        "TAX_PAYER_ID": prov.get("ruc"),
+        "INVOICE_RECEIPT_ID": inv.get("numero"),
+        "INVOICE_RECEIPT_DATE": fecha,
+        "TOTAL": inv.get("total"),
+    }
+    items = [
+        {"ITEM": it.get("descripcion"), "QUANTITY": it.get("cantidad"),
+         "UNIT_PRICE": it.get("precio_unit"), "PRICE": it.get("total")}
+        for it in truth.get("items") or []
+    ]
+    items = [{k: str(v) for k, v in row.items() if v is not None} for row in items]
+    return expense_document(fields, items, currency=inv.get("moneda"))
+
+
+def add_expense_analysis(stub: Stubber, bucket: str, key: str, documents: List[Dict[str, Any]],
+                         job_id: str = "stub-job-1", pending: int = 1, page_size: Optional[int] = None,
+                         status: str = "SUCCEEDED") -> None:
+    """
+    Encola en 'stub' las respuestas de un job: el Start, 'pending' sondeos IN_PROGRESS y el
+    resultado en páginas de 'page_size' ExpenseDocuments (NextToken entre páginas).
+    status: SUCCEEDED | PARTIAL_SUCCESS | FAILED.
+    """
+    stub.add_response(
+        "start_expense_analysis", {"JobId": job_id},
+        {"DocumentLocation": {"S3Object": {"Bucket": bucket, "Name": key}}, "ClientRequestToken": ANY},
+    )
+    for _ in range(pending):
+        stub.add_response("get_expense_analysis", {"JobStatus": "IN_PROGRESS"},
+                          {"JobId": job_id, "MaxResults": ANY})
+    if status == "FAILED":
+        stub.add_response("get_expense_analysis",
+                          {"JobStatus": "FAILED", "StatusMessage": "UNSUPPORTED_DOCUMENT"},
+                          {"JobId": job_id, "MaxResults": ANY})
+        return
+    size = page_size or max(1, len(documents))
+    chunks = [documents[i:i + size] for i in range(0, len(documents), size)] or [[]]
+    for n, chunk in enumerate(chunks):
+        resp: Dict[str, Any] = {
+            "JobStatus": status,
+            "DocumentMetadata": {"Pages": max(1, len(documents))},
+            "ExpenseDocuments": chunk,
+        }
+        if status == "PARTIAL_SUCCESS":
+            resp["Warnings"] = [{"ErrorCode": "PAGE_FAILED", "Pages": [2]}]
+        if n + 1 < len(chunks):
+            resp["NextToken"] = f"page-{n + 1}"
+        expected: Dict[str, Any] = {"JobId": job_id, "MaxResults": ANY}
+        if n:
+            expected["NextToken"] = f"page-{n}"
+        stub.add_response("get_expense_analysis", resp, expected)
+
+
+@contextmanager
+def stubbed_expense_analysis(bucket: str, key: str, documents: List[Dict[str, Any]],
+                             **kwargs: Any) -> Iterator[Stubber]:
+    """Activa el stub sobre el cliente cacheado de textract; al salir verifica que se consumió todo."""
+    stub = Stubber(get_client("textract"))
+    add_expense_analysis(stub, bucket, key, documents, **kwargs)
+    with stub:
+        yield stub
+        stub.assert_no_pending_responses()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--truth", type=Path, default=None, help="JSON de verdad de bench.corpus (por defecto, una factura de ejemplo)")
+    ap.add_argument("--bucket", default="bench-bucket")
+    ap.add_argument("--key", default="bench/invoice.pdf")
+    ap.add_argument("--pending", type=int, default=2, help="sondeos IN_PROGRESS antes del resultado")
+    ap.add_argument("--page-size", type=int, default=None, help="ExpenseDocuments por página de resultados")
+    ap.add_argument("--status", default="SUCCEEDED", choices=["SUCCEEDED", "PARTIAL_SUCCESS", "FAILED"])
+    ap.add_argument("--poll", type=float, default=0.01, help="TEXTRACT_POLL_SECONDS para la corrida")
+    args = ap.parse_args()
+
+    from app import engine_router
+
+    settings.TEXTRACT_POLL_SECONDS = args.poll
+    if args.truth:
+        docs = [document_from_truth(json.loads(args.truth.read_text(encoding="utf-8")))]
+    else:
+        docs = [expense_document(_SAMPLE_FIELDS, _SAMPLE_ITEMS)]
+
+    plan = {"doc": {"id": "stub"}, "storage_key": args.key, "kind": None}
+    t0 = time.perf_counter()
+    with stubbed_expense_analysis(args.bucket, args.key, docs, pending=args.pending,
+                                  page_size=args.page_size, status=args.status):
+        try:
+            result = engine_router._ENGINES["textract"](engine_router.EngineInput(plan, args.bucket, lambda: None))
+        except Exception as e:
+            result = {"error": f"{type(e).__name__}: {getattr(e, 'detail', e)}"}
+    print(json.dumps({
+        "ms": round((time.perf_counter() - t0) * 1000, 1),
+        "result": result,
+    }, indent=2, ensure_ascii=False, default=str))
+
+
+if __name__ == "__main__":
+    main()
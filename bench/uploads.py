@@ -0,0 +1,81 @@
+# bench/uploads.py
+"""
+Subidas concurrentes contra /documents/upload: verifica que no se serializan en
+el event loop (antes el INSERT sync y la subida a S3 corrían dentro del handler
+async y bloqueaban al resto de requests del worker).
+
+Mide la latencia de una subida aislada (mediana de --warmup subidas secuenciales)
+y luego lanza --concurrency subidas a la vez. Si se serializan, el tiempo total
+se acerca a concurrency x latencia; si no, a ~1 latencia.
+
+    python -m bench.uploads --url http://localhost:8080 --tenant <uuid> \\
+        --size-kb 512 --concurrency 1 8 32
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+
+def _multipart(fields: Dict[str, str], filename: str, payload: bytes, mime: str):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for k, v in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode())
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: {mime}\r\n\r\n".encode()
+    )
+    parts.append(payload)
+    parts.append(f"\r\n--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def upload_once(url: str, tenant: str, payload: bytes) -> float:
+    body, ctype = _multipart({"tenant_id": tenant, "doc_kind": "boleta"}, "bench.pdf", payload, "application/pdf")
+    req = urllib.request.Request(url.rstrip("/") + "/documents/upload", data=body,
+                                 headers={"Content-Type": ctype}, method="POST")
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=120) as resp:
+        resp.read()
+    return time.perf_counter() - t0
+
+
+def run(url: str, tenant: str, payload: bytes, concurrency: int, solo: float) -> Dict:
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        lat: List[float] = list(ex.map(lambda _: upload_once(url, tenant, payload), range(concurrency)))
+    wall = time.perf_counter() - t0
+    return {
+        "concurrency": concurrency,
+        "wall_s": round(wall, 3),
+        "p50_ms": round(statistics.median(lat) * 1000, 1),
+        "max_ms": round(max(lat) * 1000, 1),
+        # 1.0 = totalmente serializado; concurrency = totalmente en paralelo
+        "parallelism": round(concurrency * solo / wall, 2),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default="http://localhost:8080")
+    ap.add_argument("--tenant", default=str(uuid.uuid4()))
+    ap.add_argument("--size-kb", type=int, default=512)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    ap.add_argument("--warmup", type=int, default=5)
+    args = ap.parse_args()
+
+    payload = b"%PDF-1.4\n" + os.urandom(args.size_kb * 1024)
+    solo = statistics.median(upload_once(args.url, args.tenant, payload) for _ in range(args.warmup))
+    print(json.dumps({"solo_ms": round(solo * 1000, 1)}))
+    for c in args.concurrency:
+        print(json.dumps(run(args.url, args.tenant, payload, c, solo)))
+
+
+if __name__ == "__main__":
+    main()
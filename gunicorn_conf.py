@@ -1,4 +1,49 @@
+import os
+
 bind = "0.0.0.0:8080"
 workers = 2
 worker_class = "uvicorn.workers.UvicornWorker"
 timeout = 120
+
+# La app (y los módulos de los engines de OCR, ver when_ready) se importa una sola vez en
+# el master; cada worker nace por fork con todo cargado: el (re)spawn de un worker no
+# paga los imports y las páginas de código se comparten (copy-on-write).
+# GUNICORN_PRELOAD=0 vuelve a importar en cada worker (útil con --reload en desarrollo).
+preload_app = os.getenv("GUNICORN_PRELOAD", "1").lower() in ("1", "true", "yes")
+
+# Métricas Prometheus multiproceso: cada worker escribe en PROMETHEUS_MULTIPROC_DIR
+# (definido en el entorno antes de arrancar) y /metrics agrega el directorio.
+
+
+def on_starting(server):
+    from app import metrics
+
+    # valores de una ejecución anterior no deben sumarse a los nuevos
+    metrics.reset_multiprocess_dir()
+
+
+def when_ready(server):
+    # corre en el master antes de crear los workers: con preload, los engines de
+    # OCR_ENGINES (pdf2image, PIL, numpy, pytesseract, boto3) y el lector de Excel se
+    # importan aquí una vez en vez de en el primer request de cada worker
+    if not server.cfg.preload_app:
+        return
+    import boto3  # noqa: F401  (S3 en cada subida; el cliente se crea en el worker)
+    from app import engine_router, excel_stream  # noqa: F401
+
+    engine_router.preload()
+
+
+def post_fork(server, worker):
+    from app import aws, db
+
+    # nada de lo abierto en el master sirve en el hijo: ni conexiones de BD ni clientes
+    # boto3 (el master no los crea en el arranque normal; esto cubre hooks o imports que sí)
+    db.dispose_engines()
+    aws.reset_clients()
+
+
+def child_exit(server, worker):
+    from app import metrics
+
+    metrics.mark_process_dead(worker.pid)
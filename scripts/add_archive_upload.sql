@@ -0,0 +1,2 @@
+-- Subida masiva (ZIP): deduplicación por contenido dentro del tenant
+CREATE INDEX IF NOT EXISTS ix_docs_tenant_sha ON documents.documents(tenant_id, sha256);
@@ -0,0 +1,8 @@
+-- Caché de extracciones por contenido (sha256 + engine/tipo/versión de parser)
+ALTER TABLE extractor.extractions
+  ADD COLUMN IF NOT EXISTS sha256 TEXT,
+  ADD COLUMN IF NOT EXISTS cache_key VARCHAR(64);
+
+CREATE INDEX IF NOT EXISTS ix_ext_cache
+  ON extractor.extractions(sha256, cache_key, created_at DESC)
+  WHERE status = 'ok';
@@ -0,0 +1,27 @@
+-- Índices de las APIs de lectura (GET /invoices, GET /documents).
+-- Paginación por keyset: el índice tiene el mismo orden que el ORDER BY, así cada
+-- página es un recorrido de índice desde el cursor (sin sort ni OFFSET).
+-- CONCURRENTLY no bloquea escrituras, pero no corre dentro de una transacción:
+--   psql -v ON_ERROR_STOP=1 -f scripts/add_read_api_indexes.sql   (sin --single-transaction)
+
+-- /invoices?tenant_id=..[&fecha_desde/hasta]: misma expresión que _FECHA en app/routers/invoices.py
+-- (las invoices sin fecha quedan al final). INCLUDE: el listado sale del índice salvo el JOIN al proveedor.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_inv_tenant_fecha_id
+  ON finance.invoices (tenant_id, (COALESCE(fecha, DATE '1900-01-01')) DESC, id DESC)
+  INCLUDE (provider_id, document_id, serie, numero, moneda, total, status, doc_kind);
+
+-- /invoices?ruc=..: proveedor por ux_providers_tenant_ruc y luego sus invoices en orden
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_inv_tenant_provider_fecha_id
+  ON finance.invoices (tenant_id, provider_id, (COALESCE(fecha, DATE '1900-01-01')) DESC, id DESC);
+
+-- /documents?tenant_id=..
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_docs_tenant_created_id
+  ON documents.documents (tenant_id, created_at DESC, id DESC)
+  INCLUDE (status, doc_kind, source_format, filename, mime, size);
+
+-- ix_invoice_tenant_fecha (tenant_id, fecha) se mantiene: los índices de arriba son
+-- sobre la expresión COALESCE(fecha, ...) y no sirven a los filtros por rango de la
+-- columna fecha a secas que usan los dashboards.
+
+ANALYZE finance.invoices;
+ANALYZE documents.documents;
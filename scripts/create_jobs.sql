@@ -0,0 +1,18 @@
+-- Cola de jobs de OCR (POST /ocr/process/{id}?async=true, drenada por `python -m app.worker`)
+CREATE TABLE IF NOT EXISTS extractor.jobs(
+  id UUID PRIMARY KEY,
+  document_id UUID NOT NULL REFERENCES documents.documents(id),
+  status VARCHAR(16) NOT NULL DEFAULT 'queued',   -- queued | running | done | error
+  attempts INT NOT NULL DEFAULT 0,
+  result JSONB,
+  error_message TEXT,
+  run_after timestamptz NOT NULL DEFAULT now(),
+  created_at timestamptz NOT NULL DEFAULT now(),
+  started_at timestamptz,
+  finished_at timestamptz
+);
+
+-- índice parcial para el claim (solo filas en cola, ordenadas por antigüedad)
+CREATE INDEX IF NOT EXISTS ix_jobs_queued  ON extractor.jobs(created_at) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS ix_jobs_running ON extractor.jobs(started_at) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS ix_jobs_doc     ON extractor.jobs(document_id);
@@ -0,0 +1,38 @@
+-- Proveedores únicos por (tenant_id, ruc): lo necesita el INSERT ... ON CONFLICT
+-- de finance_mapper.materialize_invoices. Antes se creaban duplicados con carreras.
+
+BEGIN;
+
+-- 1) De cada par se conserva el proveedor con más invoices (la tabla no tiene fecha de
+--    alta y los ids son UUIDv4: "el más antiguo" no se puede saber); a igual cantidad,
+--    el que tiene razón social y, por último, el menor id, solo para que sea determinista
+CREATE TEMP TABLE provider_dups ON COMMIT DROP AS
+SELECT id, keep_id
+FROM (
+  SELECT p.id,
+         first_value(p.id) OVER (
+           PARTITION BY p.tenant_id, p.ruc
+           ORDER BY (SELECT count(*) FROM finance.invoices i WHERE i.provider_id = p.id) DESC,
+                    (p.razon_social IS NULL), p.id
+         ) AS keep_id
+  FROM finance.providers p
+  WHERE p.ruc IS NOT NULL
+) t
+WHERE id <> keep_id;
+
+-- 2) Re-apuntar las invoices de los duplicados al proveedor que se conserva
+UPDATE finance.invoices i
+SET provider_id = d.keep_id
+FROM provider_dups d
+WHERE i.provider_id = d.id;
+
+-- 3) Borrar los duplicados
+DELETE FROM finance.providers p
+USING provider_dups d
+WHERE p.id = d.id;
+
+COMMIT;
+
+-- 4) Índice único (ruc NULL no choca: esos proveedores se siguen creando uno por invoice)
+CREATE UNIQUE INDEX IF NOT EXISTS ux_providers_tenant_ruc
+  ON finance.providers(tenant_id, ruc);